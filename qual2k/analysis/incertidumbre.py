@@ -0,0 +1,488 @@
+"""
+Propagación de incertidumbre de entradas por Monte Carlo.
+
+Las concentraciones de cabecera y las cargas de las fuentes puntuales provienen
+de muestras puntuales, por lo que su incertidumbre es grande. Este módulo
+perturba esos bloques de q2k_data con factores multiplicativos muestreados por
+hipercubo latino (LHS), ejecuta el ensamble con Q2KPipeline y acumula los
+percentiles del perfil longitudinal con el algoritmo P² (Jain y Chlamtac,
+1985): cada corrida actualiza los estimadores y se descarta, de modo que el
+ensamble completo nunca está en memoria.
+
+Ejemplo:
+    factores = [
+        {'bloque': 'headwaters', 'campo': 'NH4', 'distribucion': 'lognormal', 'cv': 0.3},
+        {'bloque': 'point_sources', 'campo': 'CBODf', 'cv': 0.4, 'independiente': True},
+    ]
+    analisis = AnalisisIncertidumbre(filepath, header_dict, factores, n_simulaciones=1000)
+    analisis.ejecutar()
+    bandas = analisis.resumen()   # media, P5, P50 y P95 por distancia y variable
+"""
+import math
+from statistics import NormalDist
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from qual2k.core.escenarios import CONSTITUYENTES_CABECERA, _seleccionar
+from qual2k.core.pipeline import Q2KPipeline
+
+DISTRIBUCIONES = ['normal', 'lognormal', 'uniforme', 'triangular']
+
+# Campos que se pueden perturbar por bloque (además de los constituyentes)
+CAMPOS_CABECERA = ['QHw', 'TeHw', 'pHHw']
+CAMPOS_FUENTE = ['Qptt', 'Qptta', 'TepttMean']
+
+PROBABILIDADES_DEFAULT = (0.05, 0.5, 0.95)
+
+COLUMNA_DISTANCIA = 'Distancia Longitudinal (km)'
+
+
+class CuantilesP2:
+    """
+    Estimador P² de varios cuantiles sobre muchos flujos de datos a la vez.
+
+    Cada posición de un arreglo de forma `forma` es un flujo independiente
+    (p.ej. una variable en una distancia del perfil). La memoria es de 5
+    marcadores por cuantil y por flujo, sin importar el número de valores.
+    Los valores no finitos se ignoran en su flujo.
+    """
+
+    def __init__(self, probabilidades: Sequence[float], forma: tuple):
+        """
+        Args:
+            probabilidades: Cuantiles a estimar, en (0, 1)
+            forma: Forma del arreglo de valores de cada actualización
+        """
+        self.probabilidades = np.asarray(probabilidades, dtype=float)
+        if np.any((self.probabilidades <= 0) | (self.probabilidades >= 1)):
+            raise ValueError("Las probabilidades deben estar en (0, 1)")
+
+        self.forma = tuple(forma)
+        n_flujos = int(np.prod(self.forma))
+        m = len(self.probabilidades)
+        p = self.probabilidades[:, None]
+
+        # Alturas y posiciones de los 5 marcadores: (cuantil, flujo, marcador)
+        self.q = np.full((m, n_flujos, 5), np.nan)
+        self.pos = np.tile(np.arange(1.0, 6.0), (m, n_flujos, 1))
+        self.deseada = np.broadcast_to(
+            np.hstack([np.ones_like(p), 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5 * np.ones_like(p)])[:, None, :],
+            (m, n_flujos, 5)).copy()
+        self.incremento = np.hstack([np.zeros_like(p), p / 2, p, (1 + p) / 2, np.ones_like(p)])[:, None, :]
+        self.n = np.zeros(n_flujos, dtype=np.int64)
+
+    def actualizar(self, valores) -> None:
+        """
+        Agrega un valor a cada flujo.
+
+        Args:
+            valores: Arreglo con la forma del estimador
+        """
+        x = np.asarray(valores, dtype=float).reshape(-1)
+        if x.size != self.n.size:
+            raise ValueError(f"Se esperaban {self.n.size} valores, se recibieron {x.size}")
+        validos = np.isfinite(x)
+
+        # Primeros 5 valores de cada flujo: se guardan directamente
+        iniciales = validos & (self.n < 5)
+        if iniciales.any():
+            idx = np.flatnonzero(iniciales)
+            self.q[:, idx, self.n[idx]] = x[idx]
+            completos = idx[self.n[idx] == 4]
+            if completos.size:
+                self.q[:, completos, :] = np.sort(self.q[:, completos, :], axis=-1)
+
+        activos = np.flatnonzero(validos & (self.n >= 5))
+        if activos.size:
+            self._actualizar_marcadores(activos, x[activos])
+
+        self.n[validos] += 1
+
+    def _actualizar_marcadores(self, idx: np.ndarray, x: np.ndarray) -> None:
+        """Paso P² para los flujos idx (ya inicializados)."""
+        q = self.q[:, idx, :]
+        pos = self.pos[:, idx, :]
+        deseada = self.deseada[:, idx, :] + self.incremento
+
+        # Celda k del valor (0..3) y ajuste de los extremos
+        q[..., 0] = np.minimum(q[..., 0], x)
+        q[..., 4] = np.maximum(q[..., 4], x)
+        k = np.sum(x[None, :, None] >= q[..., 1:4], axis=-1)
+        pos += np.arange(5) > k[..., None]
+
+        for i in (1, 2, 3):
+            d = deseada[..., i] - pos[..., i]
+            ajustar = (((d >= 1) & (pos[..., i + 1] - pos[..., i] > 1))
+                       | ((d <= -1) & (pos[..., i - 1] - pos[..., i] < -1)))
+            if not ajustar.any():
+                continue
+            s = np.sign(d)
+            qi, qa, qs = q[..., i], q[..., i - 1], q[..., i + 1]
+            ni, na, ns = pos[..., i], pos[..., i - 1], pos[..., i + 1]
+
+            # Predicción parabólica; si sale del intervalo se usa la lineal
+            with np.errstate(divide='ignore', invalid='ignore'):
+                parabolica = qi + s / (ns - na) * ((ni - na + s) * (qs - qi) / (ns - ni)
+                                                   + (ns - ni - s) * (qi - qa) / (ni - na))
+                vecino_q = np.where(s > 0, qs, qa)
+                vecino_n = np.where(s > 0, ns, na)
+                lineal = qi + s * (vecino_q - qi) / (vecino_n - ni)
+            nueva = np.where((qa < parabolica) & (parabolica < qs), parabolica, lineal)
+
+            q[..., i] = np.where(ajustar, nueva, qi)
+            pos[..., i] = np.where(ajustar, ni + s, ni)
+
+        self.q[:, idx, :] = q
+        self.pos[:, idx, :] = pos
+        self.deseada[:, idx, :] = deseada
+
+    def cuantiles(self) -> np.ndarray:
+        """
+        Estimación actual de los cuantiles.
+
+        Con 5 valores o menos en un flujo se usa el cuantil empírico de los
+        valores disponibles; sin valores el resultado es NaN.
+
+        Returns:
+            Arreglo de forma (n_probabilidades,) + forma
+        """
+        resultado = self.q[:, :, 2].copy()
+        pocos = np.flatnonzero((self.n > 0) & (self.n <= 5))
+        for j in pocos:
+            resultado[:, j] = np.quantile(self.q[0, j, :self.n[j]], self.probabilidades)
+        resultado[:, self.n == 0] = np.nan
+        return resultado.reshape((len(self.probabilidades),) + self.forma)
+
+
+def muestreo_lhs(n: int, dimensiones: int,
+                 rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Muestra de hipercubo latino en (0, 1).
+
+    Cada dimensión se divide en n estratos equiprobables con un valor por
+    estrato, y los estratos se permutan de forma independiente.
+
+    Args:
+        n: Número de muestras
+        dimensiones: Número de dimensiones
+        rng: Generador aleatorio
+
+    Returns:
+        Arreglo (n, dimensiones)
+    """
+    rng = rng or np.random.default_rng()
+    u = (np.arange(n)[:, None] + rng.random((n, dimensiones))) / n
+    for j in range(dimensiones):
+        u[:, j] = u[rng.permutation(n), j]
+    return u
+
+
+def cuantil_factor(u: np.ndarray, factor: Dict[str, Any]) -> np.ndarray:
+    """
+    Transforma probabilidades en factores multiplicativos según la distribución.
+
+    Distribuciones (todas en términos del factor aplicado al valor base):
+        normal:     media 1 y desviación cv, truncada en 0
+        lognormal:  media 1 y coeficiente de variación cv
+        uniforme:   entre min y max
+        triangular: entre min y max con moda modo (por defecto 1)
+
+    Args:
+        u: Probabilidades en (0, 1)
+        factor: Especificación del factor incierto
+
+    Returns:
+        Factores multiplicativos
+    """
+    distribucion = factor.get('distribucion', 'lognormal')
+    u = np.clip(np.asarray(u, dtype=float), 1e-12, 1 - 1e-12)
+
+    if distribucion in ('normal', 'lognormal'):
+        cv = factor.get('cv', 0.2)
+        z = np.array([NormalDist().inv_cdf(v) for v in u])
+        if distribucion == 'normal':
+            return np.maximum(1 + cv * z, 0.0)
+        sigma = math.sqrt(math.log(1 + cv ** 2))
+        return np.exp(-sigma ** 2 / 2 + sigma * z)
+
+    a, b = factor['min'], factor['max']
+    if distribucion == 'uniforme':
+        return a + (b - a) * u
+    if distribucion == 'triangular':
+        c = factor.get('modo', 1.0)
+        corte = (c - a) / (b - a)
+        return np.where(u < corte,
+                        a + np.sqrt(u * (b - a) * (c - a)),
+                        b - np.sqrt((1 - u) * (b - a) * (b - c)))
+
+    raise ValueError(f"Distribución no soportada: {distribucion} (use {DISTRIBUCIONES})")
+
+
+class AnalisisIncertidumbre:
+    """
+    Ensamble Monte Carlo (LHS) sobre cabeceras y fuentes puntuales con
+    percentiles del perfil acumulados en línea.
+    """
+
+    def __init__(self, filepath: str, header_dict: Dict[str, Any],
+                 factores: List[Dict[str, Any]],
+                 n_simulaciones: int = 1000,
+                 probabilidades: Sequence[float] = PROBABILIDADES_DEFAULT,
+                 variables: Optional[List[str]] = None,
+                 semilla: Optional[int] = None,
+                 plantilla: str = 'PlantillaBaseQ2K.xlsx',
+                 q_cabecera: float = 1.06007E-06,
+                 workspace_root: Optional[str] = None,
+                 n_simuladores: Optional[int] = None):
+        """
+        Inicializa el análisis.
+
+        Cada factor es un diccionario con:
+            bloque: 'headwaters' o 'point_sources'
+            campo: constituyente (NH4, CBODf, ...) o QHw/TeHw/pHHw, Qptt/Qptta/TepttMean
+            elemento: índice (base 0), nombre o '*' (por defecto todos)
+            distribucion, cv, min, max, modo: ver cuantil_factor
+            independiente: si True cada elemento seleccionado recibe su propio
+                           factor; si False (defecto) comparten el mismo
+
+        Args:
+            filepath: Directorio con la plantilla y el ejecutable
+            header_dict: Diccionario con configuración del header
+            factores: Lista de factores inciertos
+            n_simulaciones: Tamaño del ensamble
+            probabilidades: Cuantiles a estimar del perfil
+            variables: Columnas del perfil a resumir (None = todas)
+            semilla: Semilla del muestreo LHS
+            plantilla: Nombre del archivo Excel
+            q_cabecera: Caudal de cabecera
+            workspace_root: Raíz de los workspaces (None = automática)
+            n_simuladores: Simulaciones FORTRAN simultáneas (None = CPUs disponibles)
+        """
+        for factor in factores:
+            self._validar_factor(factor)
+
+        self.factores = factores
+        self.n_simulaciones = n_simulaciones
+        self.probabilidades = tuple(probabilidades)
+        self.variables = variables
+        self.semilla = semilla
+
+        self.pipeline = Q2KPipeline(filepath, header_dict, plantilla=plantilla,
+                                    q_cabecera=q_cabecera, workspace_root=workspace_root,
+                                    n_simuladores=n_simuladores, devolver_perfil=True)
+
+        self.dimensiones = []       # (factor, índice del elemento) por columna LHS
+        self.muestras = None        # DataFrame n_simulaciones × dimensiones
+        self.corridas = None        # Factores, KGE y error de cada corrida
+        self.distancias = None
+        self.estimador = None
+        self.media = None
+
+    @staticmethod
+    def _validar_factor(factor: Dict[str, Any]) -> None:
+        """
+        Valida bloque, campo y parámetros de la distribución de un factor.
+
+        Los constituyentes de las fuentes puntuales dependen de la plantilla y
+        se validan al expandir las dimensiones (generar_muestras).
+        """
+        bloque = factor.get('bloque')
+        if bloque not in ('headwaters', 'point_sources'):
+            raise ValueError(f"Bloque no soportado en factor {factor}")
+        if 'campo' not in factor:
+            raise ValueError(f"Falta el campo en factor {factor}")
+        if bloque == 'headwaters' and factor['campo'] not in CONSTITUYENTES_CABECERA + CAMPOS_CABECERA:
+            raise ValueError(f"Campo de cabecera no soportado en factor {factor} "
+                             f"(use {CONSTITUYENTES_CABECERA + CAMPOS_CABECERA})")
+
+        distribucion = factor.get('distribucion', 'lognormal')
+        if distribucion not in DISTRIBUCIONES:
+            raise ValueError(f"Distribución no soportada en factor {factor}")
+        if distribucion in ('uniforme', 'triangular'):
+            if 'min' not in factor or 'max' not in factor:
+                raise ValueError(f"La distribución {distribucion} requiere min y max: {factor}")
+            if not factor['min'] < factor['max']:
+                raise ValueError(f"Se requiere min < max en factor {factor}")
+            if (distribucion == 'triangular'
+                    and not factor['min'] <= factor.get('modo', 1.0) <= factor['max']):
+                raise ValueError(f"Se requiere min <= modo <= max en factor {factor}")
+
+    def _expandir_dimensiones(self) -> None:
+        """Una dimensión LHS por factor, o por elemento si el factor es independiente."""
+        data = self.pipeline.modelo_base.q2k_data
+        self.dimensiones = []
+        for factor in self.factores:
+            bloque = data[factor['bloque']]
+            lista, campo_nombre = ((bloque['headwaters'], 'NameHw')
+                                   if factor['bloque'] == 'headwaters'
+                                   else (bloque['sources'], 'PtName'))
+            seleccion = _seleccionar(lista, factor.get('elemento', '*'), campo_nombre)
+            if factor['bloque'] == 'point_sources':
+                for fuente in seleccion:
+                    if (factor['campo'] not in CAMPOS_FUENTE
+                            and factor['campo'] not in {c['name'] for c in fuente['constituents']}):
+                        raise ValueError(f"Campo de fuente puntual no soportado en factor {factor} "
+                                         f"(fuente {fuente['PtName']})")
+            indices = [next(i for i, e in enumerate(lista) if e is s) for s in seleccion]
+            if factor.get('independiente', False):
+                self.dimensiones.extend((factor, [i]) for i in indices)
+            else:
+                self.dimensiones.append((factor, indices))
+
+    def _nombre_dimension(self, factor: Dict[str, Any], indices: List[int]) -> str:
+        """Nombre legible de una columna de la muestra."""
+        sufijo = f'_{indices[0]}' if len(indices) == 1 and factor.get('independiente') else ''
+        prefijo = 'hw' if factor['bloque'] == 'headwaters' else 'ps'
+        return f"{prefijo}_{factor['campo']}{sufijo}"
+
+    def generar_muestras(self) -> pd.DataFrame:
+        """
+        Genera los factores multiplicativos del ensamble por LHS.
+
+        Returns:
+            DataFrame n_simulaciones × dimensiones
+        """
+        self.pipeline.configurar_base()
+        self._expandir_dimensiones()
+
+        rng = np.random.default_rng(self.semilla)
+        u = muestreo_lhs(self.n_simulaciones, len(self.dimensiones), rng)
+        columnas = {}
+        for j, (factor, indices) in enumerate(self.dimensiones):
+            nombre = self._nombre_dimension(factor, indices)
+            if nombre in columnas:
+                nombre = f'{nombre}_{j}'
+            columnas[nombre] = cuantil_factor(u[:, j], factor)
+
+        self.muestras = pd.DataFrame(columnas)
+        return self.muestras
+
+    @staticmethod
+    def _escalar(valor, f: float):
+        """Multiplica un valor escalar u horario (lista) por un factor."""
+        if isinstance(valor, list):
+            return [v * f for v in valor]
+        return valor * f
+
+    def construir_escenario(self, fila: Sequence[float]) -> Dict[str, Any]:
+        """
+        Escenario (ver escenarios.aplicar_escenario) de una fila de la muestra.
+
+        Args:
+            fila: Factores de una corrida, en el orden de las dimensiones
+
+        Returns:
+            Diccionario con los bloques headwaters y/o point_sources
+        """
+        data = self.pipeline.modelo_base.q2k_data
+        escenario = {'headwaters': {}, 'point_sources': {}}
+
+        for f, (factor, indices) in zip(fila, self.dimensiones):
+            campo = factor['campo']
+            for i in indices:
+                cambios = escenario[factor['bloque']].setdefault(i, {})
+                if factor['bloque'] == 'headwaters':
+                    hw = data['headwaters']['headwaters'][i]
+                    if campo in CONSTITUYENTES_CABECERA:
+                        base = cambios.get(campo, hw['cHw'][CONSTITUYENTES_CABECERA.index(campo)])
+                    elif campo in CAMPOS_CABECERA:
+                        base = cambios.get(campo, hw[campo])
+                    else:
+                        raise KeyError(f"Campo de cabecera no soportado: {campo}")
+                else:
+                    fuente = data['point_sources']['sources'][i]
+                    constituyentes = {c['name']: c['mean'] for c in fuente['constituents']}
+                    if campo in constituyentes:
+                        base = cambios.get(campo, constituyentes[campo])
+                    elif campo in CAMPOS_FUENTE:
+                        base = cambios.get(campo, fuente[campo])
+                    else:
+                        raise KeyError(f"Campo de fuente puntual no soportado: {campo}")
+                cambios[campo] = self._escalar(base, float(f))
+
+        return {k: v for k, v in escenario.items() if v}
+
+    def _acumular(self, perfil: pd.DataFrame) -> None:
+        """Actualiza los estimadores con el perfil de una corrida."""
+        if self.estimador is None:
+            self.variables = self.variables or [c for c in perfil.columns if c != COLUMNA_DISTANCIA]
+            self.distancias = perfil[COLUMNA_DISTANCIA].to_numpy()
+            forma = (len(self.distancias), len(self.variables))
+            self.estimador = CuantilesP2(self.probabilidades, forma)
+            self.media = np.zeros(forma)
+            self._n_media = np.zeros(forma)
+        elif not np.array_equal(perfil[COLUMNA_DISTANCIA].to_numpy(), self.distancias):
+            raise ValueError("El perfil de la corrida no tiene las distancias del ensamble")
+
+        valores = perfil[self.variables].to_numpy(dtype=float)
+        self.estimador.actualizar(valores)
+
+        validos = np.isfinite(valores)
+        self._n_media += validos
+        delta = np.where(validos, valores - self.media, 0.0)
+        self.media += np.divide(delta, self._n_media, out=np.zeros_like(delta),
+                                where=self._n_media > 0)
+
+    def ejecutar(self) -> 'AnalisisIncertidumbre':
+        """
+        Ejecuta el ensamble y acumula los percentiles en línea.
+
+        Returns:
+            self (para encadenar con resumen())
+        """
+        print("=" * 70)
+        print(f'ANÁLISIS DE INCERTIDUMBRE: {self.n_simulaciones} SIMULACIONES')
+        print("=" * 70)
+
+        if self.muestras is None:
+            self.generar_muestras()
+        print(f'Factores inciertos: {len(self.dimensiones)} dimensiones LHS')
+
+        filas = self.muestras.to_numpy()
+        conjuntos = (self.construir_escenario(fila) for fila in filas)
+        kge = np.full(len(filas), np.nan)
+        errores = [None] * len(filas)
+        paso = max(1, len(filas) // 10)
+
+        for completadas, r in enumerate(self.pipeline.evaluate_many(conjuntos), start=1):
+            errores[r['indice']] = r['error']
+            if r['error'] is None:
+                kge[r['indice']] = r['kge']
+                try:
+                    self._acumular(r['perfil'])
+                except ValueError as e:
+                    errores[r['indice']] = str(e)
+            if completadas % paso == 0:
+                print(f'  {completadas}/{len(filas)} simulaciones')
+
+        self.corridas = self.muestras.assign(kge_global=kge, error=errores)
+        fallidas = sum(e is not None for e in errores)
+        if fallidas:
+            print(f'⚠️ {fallidas} simulaciones fallaron')
+        print(f'✅ {len(filas) - fallidas} simulaciones acumuladas')
+        return self
+
+    def resumen(self) -> pd.DataFrame:
+        """
+        Bandas de incertidumbre del perfil.
+
+        Returns:
+            DataFrame largo con columnas 'Distancia Longitudinal (km)', variable,
+            n, media y una columna P<k> por probabilidad (P5, P50, P95)
+        """
+        if self.estimador is None:
+            raise RuntimeError("Debe ejecutar ejecutar() antes de resumen()")
+
+        cuantiles = self.estimador.cuantiles()
+        n_dist, n_var = len(self.distancias), len(self.variables)
+        tabla = pd.DataFrame({
+            COLUMNA_DISTANCIA: np.repeat(self.distancias, n_var),
+            'variable': np.tile(self.variables, n_dist),
+            'n': self._n_media.reshape(-1).astype(int),
+            'media': np.where(self._n_media > 0, self.media, np.nan).reshape(-1),
+        })
+        for p, valores in zip(self.probabilidades, cuantiles):
+            tabla[f'P{100 * p:g}'] = valores.reshape(-1)
+        return tabla
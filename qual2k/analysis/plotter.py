@@ -1,18 +1,80 @@
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use("Agg")
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.ticker import MaxNLocator
+import io
 import re
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+COLUMNA_DISTANCIA = 'Distancia Longitudinal (km)'
+
+# Paneles por página del reporte consolidado (filas, columnas)
+GRILLA_REPORTE = (3, 4)
+
+# Número de puntos a partir del cual se rasterizan los marcadores del reporte
+UMBRAL_RASTERIZAR = 500
+
+PARES_CAL_OBS = [
+    ("flow", "flow_obs"),
+    ("water_temp_c", "water_temp_c_obs"),
+    ("total_suspended_solids", "total_suspended_solids_obs"),
+    ("dissolved_oxygen", "dissolved_oxygen_obs"),
+    ("carbonaceous_bod_fast", "carbonaceous_bod_fast_obs"),
+    ("total_kjeldahl_nitrogen", "total_kjeldahl_nitrogen_obs"),
+    ("ammonium", "ammonium_obs"),
+    ("total_phosphorus", "total_phosphorus_obs"),
+    ("conductivity", 'conductivity_obs'),
+    ("nitrate", "nitrate_obs"),
+    ("inorganic_phosphorus", "inorganic_phosphorus_obs"),
+    ("pathogen", "pathogen_obs"),
+    ("pH", "pH_obs"),
+    ("alkalinity", "alkalinity_obs"),
+]
+
+
+def _nombre_archivo(col: str) -> str:
+    """Convierte un nombre de columna en un nombre de archivo seguro."""
+    nombre = re.sub(r'[^A-Za-z0-9áéíóúÁÉÍÓÚñÑ]+', '_', col)
+    return re.sub(r'_+', '_', nombre).strip('_')
+
+
+def _renderizar_en_proceso(args: Tuple) -> None:
+    """
+    Renderiza un lote de gráficas en un proceso del pool (serializable).
+
+    Recibe el graficador completo del proceso principal, de modo que sus
+    atributos (colores, etiquetas, estilo, ...) se respetan en el worker.
+    """
+    plotter, tipo, df, tareas, rutaGuardado = args
+    plt.rcParams.update(plotter.estilo)
+    plotter._renderizar(tipo, df, tareas, rutaGuardado)
+
 
 class Q2KPlotter:
     """
     Genera gráficas de resultados de QUAL2K.
     """
 
-    def __init__(self):
-        """Inicializa configuración de matplotlib"""
-        plt.rcParams.update({
+    def __init__(self, dpi: int = 300, formato: str = 'png', num_workers: int = 0):
+        """
+        Inicializa configuración de matplotlib.
+
+        Args:
+            dpi: Resolución de las gráficas en lote
+            formato: Formato de archivo ('png', 'svg', 'pdf', 'jpg', ...)
+            num_workers: Procesos para renderizar en paralelo (0 = en serie)
+        """
+        self.dpi = dpi
+        self.formato = formato
+        self.num_workers = num_workers
+
+        # Estilo de matplotlib (se reaplica en los procesos de renderizado)
+        self.estilo = {
             "font.size": 12,
             "axes.titlesize": 16,
             "axes.labelsize": 13,
@@ -23,7 +85,8 @@ class Q2KPlotter:
             "grid.alpha": 0.7,
             "figure.figsize": (9, 5),
             "axes.facecolor": "white"
-        })
+        }
+        plt.rcParams.update(self.estilo)
 
         self.colores_elegantes = [
             '#0077b6', '#2a9d8f', '#e9c46a', '#f4a261', '#e76f51',
@@ -126,30 +189,130 @@ class Q2KPlotter:
         plt.savefig(os.path.join(rutaGuardado, f'{nombre_archivo}.png'), bbox_inches='tight', dpi=300)
         plt.close()
 
-    def plot_all_params(self, wq: pd.DataFrame, rutaGuardado: str) -> None:
+    def _configurar_ejes(self, ax, x: pd.Series, xlabel: str) -> None:
+        """Aplica el estilo común de los perfiles longitudinales a unos ejes."""
+        ax.set_xlabel(xlabel, fontweight="bold", fontsize=10)
+        ax.invert_xaxis()
+        ax.set_xlim(x.max(), 0)
+
+        ax.minorticks_on()
+        ax.grid(which='major', linestyle='--', color='lightgray', linewidth=0.9, alpha=0.8)
+        ax.grid(which='minor', linestyle=':', color='lightgray', linewidth=0.6, alpha=0.6)
+
+        ax.tick_params(axis='both', which='major', length=6, width=1.2, direction='inout')
+        ax.tick_params(axis='both', which='minor', length=3, width=0.8, direction='inout')
+
+    def _guardar(self, fig, rutaGuardado: str, col: str) -> None:
+        """Guarda la figura con el formato y resolución configurados."""
+        fig.savefig(os.path.join(rutaGuardado, f'{_nombre_archivo(col)}.{self.formato}'),
+                    bbox_inches='tight', dpi=self.dpi, format=self.formato)
+
+    def _renderizar_perfiles(self, df: pd.DataFrame, tareas: List[Tuple[str, str]],
+                             rutaGuardado: str) -> None:
+        """
+        Renderiza varios perfiles reutilizando una sola figura y una sola línea.
+
+        Args:
+            df: DataFrame con datos
+            tareas: Lista de (columna, color)
+            rutaGuardado: Ruta donde guardar las gráficas
+        """
+        x = df[COLUMNA_DISTANCIA]
+        fig, ax = plt.subplots()
+        linea, = ax.plot([], [], marker="o", markersize=6, linewidth=2)
+        self._configurar_ejes(ax, x, 'Distancia [km]')
+        titulo = ax.set_title("", fontweight="bold", fontstyle="italic", fontsize=12, pad=15)
+        ylabel = ax.set_ylabel("", fontsize=10, fontweight="bold")
+
+        for col, color in tareas:
+            label_y = self.get_label(col)
+            linea.set_data(x, df[col])
+            linea.set_color(color)
+            titulo.set_text(f"Perfil Longitudinal de {label_y}")
+            ylabel.set_text(label_y)
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+            self._guardar(fig, rutaGuardado, col)
+
+        plt.close(fig)
+
+    def _renderizar_cal_obs(self, df: pd.DataFrame, tareas: List[Tuple[str, str, str]],
+                            rutaGuardado: str) -> None:
+        """
+        Renderiza varias comparaciones modelado vs observado reutilizando la figura.
+
+        Args:
+            df: DataFrame con datos modelados y observados
+            tareas: Lista de (columna_sim, columna_obs, color)
+            rutaGuardado: Ruta donde guardar las gráficas
+        """
+        x = df[COLUMNA_DISTANCIA]
+        fig, ax = plt.subplots()
+        linea, = ax.plot([], [], linewidth=2, label="Simulado")
+        puntos = ax.scatter([], [], color="black", marker="o", s=40, label="Observado")
+        self._configurar_ejes(ax, x, "Distancia [km]")
+        ax.legend(loc='best', framealpha=0.9)
+        titulo = ax.set_title("", fontweight="bold", fontstyle="italic", fontsize=12, pad=15)
+        ylabel = ax.set_ylabel("", fontsize=10, fontweight="bold")
+
+        for sim_col, obs_col, color in tareas:
+            label_sim = self.get_label(sim_col)
+            obs = np.column_stack([x, df[obs_col]]).astype(float)
+            obs = obs[np.isfinite(obs).all(axis=1)]
+
+            linea.set_data(x, df[sim_col])
+            linea.set_color(color)
+            puntos.set_offsets(obs if len(obs) else np.empty((0, 2)))
+            titulo.set_text(f"Calibración: {label_sim}")
+            ylabel.set_text(label_sim)
+
+            ax.relim()
+            if len(obs):
+                ax.update_datalim(obs)
+            ax.autoscale_view(scalex=False)
+            self._guardar(fig, rutaGuardado, sim_col)
+
+        plt.close(fig)
+
+    def _ejecutar_lotes(self, tipo: str, df: pd.DataFrame, tareas: List[Tuple],
+                        rutaGuardado: str, num_workers: int) -> None:
+        """Reparte las tareas de renderizado entre procesos o las ejecuta en serie."""
+        if num_workers <= 1 or len(tareas) <= 1:
+            self._renderizar(tipo, df, tareas, rutaGuardado)
+            return
+
+        num_workers = min(num_workers, len(tareas))
+        lotes = [tareas[i::num_workers] for i in range(num_workers)]
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            list(executor.map(_renderizar_en_proceso,
+                              [(self, tipo, df, lote, rutaGuardado) for lote in lotes]))
+
+    def _renderizar(self, tipo: str, df: pd.DataFrame, tareas: List[Tuple],
+                    rutaGuardado: str) -> None:
+        """Renderiza un lote de gráficas de perfil o de calibración en este proceso."""
+        if tipo == 'perfil':
+            self._renderizar_perfiles(df, tareas, rutaGuardado)
+        else:
+            self._renderizar_cal_obs(df, tareas, rutaGuardado)
+
+    def plot_all_params(self, wq: pd.DataFrame, rutaGuardado: str,
+                        num_workers: Optional[int] = None) -> None:
         """
         Genera gráficas de todos los parámetros modelados.
 
         Args:
             wq: DataFrame con datos de calidad de agua
             rutaGuardado: Ruta donde guardar las gráficas
+            num_workers: Procesos de renderizado (None = valor del constructor)
         """
         columnas_graficas = list(wq.columns)
-        columnas_graficas.remove('Distancia Longitudinal (km)')
-        x = 'Distancia Longitudinal (km)'
-
-        for i in range(len(columnas_graficas)):
-            color = self.colores_elegantes[i % len(self.colores_elegantes)]
-            self.plot_parametro(
-                wq,
-                x_col=x,
-                y_col=columnas_graficas[i],
-                rutaGuardado=rutaGuardado,
-                titulo='',
-                xlabel='Distancia [km]',
-                ylabel=None,
-                color=color
-            )
+        columnas_graficas.remove(COLUMNA_DISTANCIA)
+
+        tareas = [(col, self.colores_elegantes[i % len(self.colores_elegantes)])
+                  for i, col in enumerate(columnas_graficas)]
+
+        self._ejecutar_lotes('perfil', wq, tareas, rutaGuardado,
+                             self.num_workers if num_workers is None else num_workers)
 
     def plot_parametro_cal_obs(self, df: pd.DataFrame, x_col: str,
                                sim_col: str, obs_col: str,
@@ -216,44 +379,124 @@ class Q2KPlotter:
         plt.savefig(os.path.join(rutaGuardado, f'{nombre_archivo}.png'), bbox_inches='tight', dpi=300)
         plt.close()
 
-    def plot_all_params_cal_obs(self, df: pd.DataFrame, rutaGuardado: str) -> None:
+    def plot_all_params_cal_obs(self, df: pd.DataFrame, rutaGuardado: str,
+                                num_workers: Optional[int] = None) -> None:
         """
         Genera todas las gráficas comparativas modelado vs observado.
 
         Args:
             df: DataFrame con datos modelados y observados
             rutaGuardado: Ruta donde guardar las gráficas
+            num_workers: Procesos de renderizado (None = valor del constructor)
         """
-        x = 'Distancia Longitudinal (km)'
-
-        pares = [
-            ("flow","flow_obs"),
-            ("water_temp_c", "water_temp_c_obs"),
-            ("total_suspended_solids", "total_suspended_solids_obs"),
-            ("dissolved_oxygen", "dissolved_oxygen_obs"),
-            ("carbonaceous_bod_fast", "carbonaceous_bod_fast_obs"),
-            ("total_kjeldahl_nitrogen", "total_kjeldahl_nitrogen_obs"),
-            ("ammonium", "ammonium_obs"),
-            ("total_phosphorus", "total_phosphorus_obs"),
-            ("conductivity",'conductivity_obs'),
-            ("nitrate", "nitrate_obs"),
-            ("inorganic_phosphorus","inorganic_phosphorus_obs"),
-            ("pathogen", "pathogen_obs"),
-            ("pH", "pH_obs"),
-            ("alkalinity", "alkalinity_obs"),
-        ]
+        tareas = [(sim_col, obs_col, self.colores_elegantes[i % len(self.colores_elegantes)])
+                  for i, (sim_col, obs_col) in enumerate(PARES_CAL_OBS)]
+
+        self._ejecutar_lotes('cal_obs', df, tareas, rutaGuardado,
+                             self.num_workers if num_workers is None else num_workers)
+
+    def _panel_reporte(self, ax, x: pd.Series, y: pd.Series, color: str, titulo: str,
+                       obs: Optional[pd.Series] = None, rasterizar: bool = False) -> None:
+        """Dibuja un panel compacto del reporte (línea vectorial, marcadores opcionalmente rasterizados)."""
+        if rasterizar:
+            ax.plot(x, y, color=color, linewidth=1.2)
+            ax.plot(x, y, color=color, linestyle='none', marker='o', markersize=2,
+                    rasterized=True)
+        else:
+            ax.plot(x, y, color=color, linewidth=1.2, marker='o', markersize=2)
+        if obs is not None:
+            ax.plot(x, obs, color='black', linestyle='none', marker='o', markersize=3,
+                    rasterized=rasterizar)
+
+        ax.set_title(titulo, fontsize=7, fontweight='bold', pad=3)
+        ax.set_xlim(x.max(), 0)
+        ax.yaxis.set_major_locator(MaxNLocator(4))
+        ax.xaxis.set_major_locator(MaxNLocator(5))
+        ax.tick_params(axis='both', labelsize=6, length=3, direction='inout')
+        ax.grid(linestyle='--', color='lightgray', linewidth=0.5, alpha=0.8)
+
+    def _paginas_reporte(self, wq: pd.DataFrame, df_cal_obs: Optional[pd.DataFrame],
+                         rasterizar: Optional[bool]):
+        """Genera las figuras (páginas) del reporte consolidado una a una."""
+        paneles = [(wq, col, None, self.get_label(col))
+                   for col in wq.columns if col != COLUMNA_DISTANCIA]
+        if df_cal_obs is not None:
+            paneles += [(df_cal_obs, sim, obs, f"Calibración: {self.get_label(sim)}")
+                        for sim, obs in PARES_CAL_OBS
+                        if sim in df_cal_obs.columns and obs in df_cal_obs.columns]
+
+        if rasterizar is None:
+            rasterizar = len(wq) >= UMBRAL_RASTERIZAR
+
+        filas, columnas = GRILLA_REPORTE
+        por_pagina = filas * columnas
+        for inicio in range(0, len(paneles), por_pagina):
+            fig, axes = plt.subplots(filas, columnas, figsize=(11.69, 8.27), sharex=True)
+            axes = axes.ravel()
+            for k, (df, col, obs_col, titulo) in enumerate(paneles[inicio:inicio + por_pagina]):
+                color = self.colores_elegantes[(inicio + k) % len(self.colores_elegantes)]
+                obs = df[obs_col] if obs_col else None
+                self._panel_reporte(axes[k], df[COLUMNA_DISTANCIA], df[col], color,
+                                    titulo, obs, rasterizar)
+            for ax in axes[len(paneles[inicio:inicio + por_pagina]):]:
+                ax.set_visible(False)
+            # Espaciado fijo: tight_layout domina el tiempo de renderizado
+            fig.subplots_adjust(left=0.05, right=0.98, bottom=0.07, top=0.96,
+                                wspace=0.25, hspace=0.35)
+            fig.supxlabel('Distancia [km]', fontsize=8, fontweight='bold')
+            yield fig
+
+    def generar_reporte(self, wq: pd.DataFrame, ruta_archivo: str,
+                        df_cal_obs: Optional[pd.DataFrame] = None,
+                        rasterizar: Optional[bool] = None) -> str:
+        """
+        Genera un reporte consolidado con todos los perfiles en cuadrículas.
 
-        for i, (sim_col, obs_col) in enumerate(pares):
-            color = self.colores_elegantes[i % len(self.colores_elegantes)]
-            self.plot_parametro_cal_obs(
-                df,
-                x_col=x,
-                sim_col=sim_col,
-                obs_col=obs_col,
-                rutaGuardado=rutaGuardado,
-                titulo='',
-                xlabel="Distancia [km]",
-                ylabel=None,
-                color=color,
-                color_obs="black"
-            )
\ No newline at end of file
+        El formato se determina por la extensión: '.pdf' produce un PDF de varias
+        páginas y '.html' un archivo autocontenido con las páginas en SVG.
+
+        Args:
+            wq: DataFrame con datos de calidad de agua modelados
+            ruta_archivo: Ruta del archivo de salida (.pdf o .html)
+            df_cal_obs: DataFrame modelado + observado (None = sin comparaciones)
+            rasterizar: Rasterizar los marcadores para reducir el tamaño
+                        (None = solo con UMBRAL_RASTERIZAR puntos o más)
+
+        Returns:
+            Ruta del reporte generado
+        """
+        extension = os.path.splitext(ruta_archivo)[1].lower()
+        if extension not in ('.pdf', '.html'):
+            raise ValueError(f"Formato de reporte no soportado: {extension} (use .pdf o .html)")
+
+        paginas = self._paginas_reporte(wq, df_cal_obs, rasterizar)
+
+        if extension == '.pdf':
+            with PdfPages(ruta_archivo) as pdf:
+                for fig in paginas:
+                    pdf.savefig(fig, dpi=self.dpi)
+                    plt.close(fig)
+            return ruta_archivo
+
+        svgs = []
+        # Texto como <text> en lugar de trazos: SVG más liviano y rápido
+        with plt.rc_context({'svg.fonttype': 'none'}):
+            for fig in paginas:
+                buffer = io.StringIO()
+                fig.savefig(buffer, format='svg', dpi=self.dpi)
+                plt.close(fig)
+                svg = buffer.getvalue()
+                svgs.append(svg[svg.index('<svg'):])
+
+        titulo = os.path.splitext(os.path.basename(ruta_archivo))[0]
+        with open(ruta_archivo, 'w', encoding='utf-8') as f:
+            f.write('<!DOCTYPE html>\n<html lang="es">\n<head><meta charset="utf-8">'
+                    f'<title>{titulo}</title>'
+                    '<style>body{margin:0;background:#f4f4f4}'
+                    'div.pagina{background:#fff;margin:12px auto;max-width:1200px}'
+                    'svg{width:100%;height:auto}</style></head>\n<body>\n')
+            for svg in svgs:
+                f.write(f'<div class="pagina">{svg}</div>\n')
+            f.write('</body>\n</html>\n')
+
+        return ruta_archivo
@@ -0,0 +1,228 @@
+"""
+Almacén columnar de resultados de múltiples simulaciones.
+
+Guarda los perfiles longitudinales (distancia × variable) y el vector de
+parámetros de cada corrida en archivos Parquet comprimidos, organizados en
+grupos de filas, para consultarlos después sin volver a parsear archivos .out.
+Requiere pyarrow.
+"""
+import glob
+import os
+from typing import Dict, Any, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+COLUMNA_DISTANCIA = 'Distancia Longitudinal (km)'
+
+
+def _importar_pyarrow():
+    """Importa pyarrow bajo demanda con un mensaje claro si no está instalado."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            "Q2KResultStore requiere pyarrow (pip install pyarrow)"
+        ) from e
+    return pa, pq
+
+
+class Q2KResultStore:
+    """
+    Almacén de perfiles y parámetros de muchas corridas en formato Parquet.
+
+    Estructura en disco:
+        ruta/perfiles/part-00000.parquet    (run_id, distancia, variables...)
+        ruta/parametros/part-00000.parquet  (run_id, parámetros..., métricas...)
+
+    Las corridas se acumulan en memoria y se escriben en un nuevo archivo cada
+    runs_por_archivo corridas (o al llamar a flush). Las lecturas usan mapeo
+    de memoria y solo cargan las columnas solicitadas.
+
+    Uso básico:
+        with Q2KResultStore('resultados_sobol') as store:
+            store.agregar(model.wq_data_model, {'kn': 0.1, 'kdc': 0.3})
+
+        store = Q2KResultStore('resultados_sobol')
+        od_180 = store.consultar('dissolved_oxygen', distancia=180)
+    """
+
+    def __init__(self, ruta: str, runs_por_archivo: int = 256,
+                 filas_por_grupo: int = 65536, compresion: str = 'zstd'):
+        """
+        Inicializa el almacén (lo crea si no existe).
+
+        Args:
+            ruta: Directorio del almacén
+            runs_por_archivo: Corridas acumuladas antes de escribir un archivo
+            filas_por_grupo: Filas por grupo de filas Parquet
+            compresion: Códec de compresión ('zstd', 'snappy', 'gzip', ...)
+        """
+        self.ruta = ruta
+        self.runs_por_archivo = runs_por_archivo
+        self.filas_por_grupo = filas_por_grupo
+        self.compresion = compresion
+
+        self.dir_perfiles = os.path.join(ruta, 'perfiles')
+        self.dir_parametros = os.path.join(ruta, 'parametros')
+        os.makedirs(self.dir_perfiles, exist_ok=True)
+        os.makedirs(self.dir_parametros, exist_ok=True)
+
+        self._buffer_perfiles: List[pd.DataFrame] = []
+        self._buffer_parametros: List[Dict[str, Any]] = []
+        self._siguiente_id = self._ultimo_run_id() + 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def _archivos(self, directorio: str) -> List[str]:
+        """Lista los archivos Parquet de un subdirectorio en orden."""
+        return sorted(glob.glob(os.path.join(directorio, 'part-*.parquet')))
+
+    def _ultimo_run_id(self) -> int:
+        """Obtiene el mayor run_id almacenado (-1 si el almacén está vacío)."""
+        archivos = self._archivos(self.dir_parametros)
+        if not archivos:
+            return -1
+        _, pq = _importar_pyarrow()
+        return max(
+            int(np.max(pq.read_table(a, columns=['run_id'], memory_map=True)
+                       .column('run_id').to_numpy()))
+            for a in archivos
+        )
+
+    def agregar(self, perfil: pd.DataFrame,
+                parametros: Optional[Dict[str, float]] = None,
+                run_id: Optional[int] = None) -> int:
+        """
+        Agrega los resultados de una corrida.
+
+        Args:
+            perfil: DataFrame del perfil longitudinal (p.ej. procesar_out_file)
+            parametros: Diccionario {nombre: valor} de parámetros y métricas
+            run_id: Identificador de la corrida (None = autoincremental); debe
+                    ser mayor que los ya almacenados
+
+        Returns:
+            run_id asignado
+
+        Raises:
+            ValueError: Si run_id no es mayor que los ya almacenados
+        """
+        if run_id is None:
+            run_id = self._siguiente_id
+        elif run_id < self._siguiente_id:
+            raise ValueError(f"run_id {run_id} ya usado: el siguiente libre es {self._siguiente_id}")
+        self._siguiente_id = max(self._siguiente_id, run_id + 1)
+
+        numericas = perfil.select_dtypes(include='number')
+        tabla = numericas.astype('float64').copy()
+        tabla.insert(0, 'run_id', np.int64(run_id))
+        self._buffer_perfiles.append(tabla)
+
+        fila = {'run_id': np.int64(run_id)}
+        fila.update({k: float(v) for k, v in (parametros or {}).items()})
+        self._buffer_parametros.append(fila)
+
+        if len(self._buffer_parametros) >= self.runs_por_archivo:
+            self.flush()
+
+        return run_id
+
+    def flush(self) -> None:
+        """Escribe las corridas acumuladas en un nuevo archivo Parquet."""
+        if not self._buffer_parametros:
+            return
+
+        pa, pq = _importar_pyarrow()
+        indice = len(self._archivos(self.dir_parametros))
+        nombre = f'part-{indice:05d}.parquet'
+
+        perfiles = pd.concat(self._buffer_perfiles, ignore_index=True)
+        parametros = pd.DataFrame(self._buffer_parametros)
+
+        pq.write_table(pa.Table.from_pandas(perfiles, preserve_index=False),
+                       os.path.join(self.dir_perfiles, nombre),
+                       row_group_size=self.filas_por_grupo,
+                       compression=self.compresion)
+        pq.write_table(pa.Table.from_pandas(parametros, preserve_index=False),
+                       os.path.join(self.dir_parametros, nombre),
+                       compression=self.compresion)
+
+        self._buffer_perfiles = []
+        self._buffer_parametros = []
+
+    def _leer(self, directorio: str, columnas: Optional[Sequence[str]] = None,
+              filtros: Optional[List] = None) -> pd.DataFrame:
+        """Lee columnas seleccionadas de todos los archivos de un subdirectorio."""
+        self.flush()
+        archivos = self._archivos(directorio)
+        if not archivos:
+            return pd.DataFrame(columns=list(columnas or []))
+
+        _, pq = _importar_pyarrow()
+        tablas = [
+            pq.read_table(a, columns=list(columnas) if columnas else None,
+                          filters=filtros, memory_map=True).to_pandas()
+            for a in archivos
+        ]
+        return pd.concat(tablas, ignore_index=True)
+
+    def perfiles(self, variables: Optional[Sequence[str]] = None,
+                 runs: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        """
+        Lee perfiles longitudinales.
+
+        Args:
+            variables: Variables a leer (None = todas)
+            runs: run_id a incluir (None = todos)
+
+        Returns:
+            DataFrame con run_id, distancia y las variables solicitadas
+        """
+        columnas = None
+        if variables is not None:
+            columnas = ['run_id', COLUMNA_DISTANCIA] + list(variables)
+        filtros = [('run_id', 'in', list(runs))] if runs is not None else None
+        return self._leer(self.dir_perfiles, columnas, filtros)
+
+    def parametros(self, runs: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        """
+        Lee la tabla de parámetros y métricas por corrida.
+
+        Args:
+            runs: run_id a incluir (None = todos)
+
+        Returns:
+            DataFrame indexado por run_id
+        """
+        filtros = [('run_id', 'in', list(runs))] if runs is not None else None
+        return self._leer(self.dir_parametros, None, filtros).set_index('run_id')
+
+    def consultar(self, variable: str,
+                  distancia: Optional[float] = None,
+                  runs: Optional[Sequence[int]] = None) -> Union[pd.Series, pd.DataFrame]:
+        """
+        Consulta una variable en todas las corridas.
+
+        Args:
+            variable: Nombre de la variable (p.ej. 'dissolved_oxygen')
+            distancia: Distancia en km; se toma el elemento más cercano de cada
+                       corrida (None = perfil completo)
+            runs: run_id a incluir (None = todos)
+
+        Returns:
+            Serie indexada por run_id si se indica distancia; en otro caso
+            DataFrame con run_id, distancia y la variable
+        """
+        df = self.perfiles([variable], runs)
+        if distancia is None:
+            return df
+
+        df = df.assign(_dist=(df[COLUMNA_DISTANCIA] - distancia).abs())
+        idx = df.groupby('run_id')['_dist'].idxmin()
+        return df.loc[idx].set_index('run_id')[variable]
@@ -1,8 +1,132 @@
 import pandas as pd
 import numpy as np
 import re
-from typing import Dict, Any, List, Tuple
+from array import array
+from typing import Dict, Any, List, Tuple, Iterator, Optional, Iterable
 from qual2k.analysis import metricas
+from qual2k.processing.data_processor import COLUMNA_HW, hw_ids
+
+# Patrones compilados una sola vez para el lector por líneas
+_PATRON_TITULO = re.compile(r'^\s*\*\*(.*?)\*\*\s*$')
+_PATRON_GUIONES = re.compile(r'-+')
+_PATRON_CERO_TEXTO = re.compile(r'0(?=[A-Za-z_])')
+_PATRON_SEPARADOR = re.compile(r"\s{2,}")
+_PATRON_BLOQUE_NUMERICO = re.compile(
+    r'(?:[-+]?\d*\.?\d+(?:[Ee][-+]?\d+)?)(?:\s+[-+]?\d*\.?\d+(?:[Ee][-+]?\d+)?)+'
+)
+
+# Secciones del archivo .out usadas por procesar_out_file
+SECCIONES_RESUMEN = ('Hydraulics Summary', 'Temperature Summary', 'Water Quality Summary')
+
+# Secciones de resultados subdiarios (bloque diel del .q2k): su título empieza así
+PREFIJO_DIEL = 'Diel'
+
+# Columnas índice de las secciones diel; el resto son variables
+COLUMNAS_INDICE_DIEL = {
+    'Time': 'tiempo',
+    'Trib': 'tributario',
+    'Reach': 'elemento',
+    'x': 'distancia',
+    'Distance': 'distancia',
+}
+
+
+class ConstructorSeccion:
+    """
+    Construye incrementalmente la tabla de una sección del archivo .out.
+
+    Recibe las líneas una a una y aplica la misma limpieza y partición que
+    clean_text + parse_section, guardando directamente los valores por
+    columna sin construir el texto completo de la sección.
+    """
+
+    def __init__(self):
+        self.columnas: Optional[List[str]] = None
+        self.valores: List[List[Optional[str]]] = []
+        self.n_filas = 0
+        self._n_lineas = 0
+        self._unidades_leidas = False
+        self._guiones_pendiente: Optional[str] = None
+        self._ancho_max = 0
+
+    def agregar_linea(self, linea: str) -> None:
+        """
+        Procesa una línea (ya sin espacios finales) de la sección.
+
+        Una línea formada solo por guiones se descarta salvo que sea la
+        primera o la última de la sección, o que siga a otra línea de guiones
+        descartada (mismo comportamiento que clean_text).
+        """
+        if self._guiones_pendiente is not None:
+            self._guiones_pendiente = None
+            descartar = False
+        else:
+            descartar = self._n_lineas > 0 and _PATRON_GUIONES.fullmatch(linea) is not None
+
+        self._n_lineas += 1
+        if descartar:
+            self._guiones_pendiente = linea
+            return
+
+        self._agregar_fila(linea)
+
+    def _agregar_fila(self, linea: str) -> None:
+        """Divide una línea en celdas y la agrega como encabezado o datos."""
+        l = _PATRON_CERO_TEXTO.sub('0  ', linea).strip()
+        if not l:
+            return
+
+        fila = []
+        for c in _PATRON_SEPARADOR.split(l):
+            c = c.strip()
+            if not c:
+                continue
+            # Un bloque numérico requiere espacios internos: las celdas simples se omiten
+            if (' ' in c or '\t' in c) and _PATRON_BLOQUE_NUMERICO.fullmatch(c) is not None:
+                fila.extend(c.split())
+            else:
+                fila.append(c)
+
+        if self.columnas is None:
+            self.columnas = fila
+            self.valores = [[] for _ in fila]
+            return
+        if not self._unidades_leidas:
+            self._unidades_leidas = True
+            return
+
+        self._ancho_max = max(self._ancho_max, len(fila))
+        if len(fila) > len(self.columnas):
+            return
+        for i, columna in enumerate(self.valores):
+            columna.append(fila[i] if i < len(fila) else None)
+        self.n_filas += 1
+
+    def construir(self) -> pd.DataFrame:
+        """
+        Finaliza la sección y genera el DataFrame con conversión numérica.
+
+        Returns:
+            DataFrame equivalente al de parse_section
+        """
+        if self._guiones_pendiente is not None:
+            # La última línea de la sección nunca se descarta
+            self._agregar_fila(self._guiones_pendiente)
+            self._guiones_pendiente = None
+
+        if self.columnas is None:
+            raise IndexError("list index out of range")
+        if self._ancho_max and self._ancho_max != len(self.columnas):
+            # Mismo criterio que pd.DataFrame(filas, columns=columnas)
+            raise ValueError(f"{len(self.columnas)} columns passed, "
+                             f"passed data had {self._ancho_max} columns")
+
+        df = pd.DataFrame({i: pd.Series(col, dtype=object)
+                           for i, col in enumerate(self.valores)})
+        df.columns = self.columnas
+        df = df.apply(pd.to_numeric, errors="ignore").reset_index(drop=True)
+        return df
+
 
 class Q2KResultsAnalyzer:
     """
@@ -44,6 +168,60 @@ class Q2KResultsAnalyzer:
 
         return secciones
 
+    @staticmethod
+    def iterar_lineas(ruta_out: str) -> Iterator[Tuple[str, str]]:
+        """
+        Recorre el archivo .out entregando cada línea junto con su sección.
+
+        Args:
+            ruta_out: Ruta del archivo .out
+
+        Yields:
+            Tuplas (nombre_seccion, linea) sin espacios finales; los títulos
+            de sección no se entregan
+        """
+        seccion_actual = None
+
+        with open(ruta_out, "r", encoding="utf-8") as f:
+            for linea in f:
+                l = linea.rstrip()
+                match = _PATRON_TITULO.match(l)
+
+                if match:
+                    seccion_actual = match.group(1).strip()
+                elif seccion_actual:
+                    yield seccion_actual, l
+
+    def leer_tablas(self, ruta_out: str,
+                    nombres: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Lee y parsea secciones del archivo .out en una sola pasada por líneas.
+
+        Solo se construyen las secciones solicitadas; el resto del archivo se
+        descarta línea a línea sin almacenarse.
+
+        Args:
+            ruta_out: Ruta del archivo .out
+            nombres: Secciones a extraer (None = todas)
+
+        Returns:
+            Diccionario {titulo: DataFrame}
+        """
+        buscadas = set(nombres) if nombres is not None else None
+        constructores: Dict[str, ConstructorSeccion] = {}
+        seccion_previa = None
+
+        for seccion, linea in self.iterar_lineas(ruta_out):
+            if seccion != seccion_previa:
+                seccion_previa = seccion
+                if buscadas is None or seccion in buscadas:
+                    # Una sección repetida reemplaza a la anterior (como leer_secciones)
+                    constructores[seccion] = ConstructorSeccion()
+            if seccion in constructores and (buscadas is None or seccion in buscadas):
+                constructores[seccion].agregar_linea(linea)
+
+        return {nombre: c.construir() for nombre, c in constructores.items()}
+
     @staticmethod
     def clean_text(txt: str) -> str:
         """Limpia texto del archivo .out"""
@@ -98,17 +276,15 @@ class Q2KResultsAnalyzer:
         df = df.apply(pd.to_numeric, errors="ignore").reset_index(drop=True)
         return df
 
-    def procesar_out_file(self, ruta_out: str) -> pd.DataFrame:
+    def _tablas_resumen(self, ruta_out: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
         """
-        Procesa un archivo .out completo de QUAL2K.
-
-        Args:
-            ruta_out: Ruta del archivo .out
+        Lee las tablas resumen del .out con nombres de columna normalizados y
+        la columna tributary en las tres tablas.
 
         Returns:
-            DataFrame consolidado con resultados
+            Tupla (hidráulica, temperatura, calidad de agua)
         """
-        secciones = self.leer_secciones(ruta_out)
+        tablas = self.leer_tablas(ruta_out, SECCIONES_RESUMEN)
 
         # Mapeos de columnas
         hyd_map = {
@@ -129,6 +305,7 @@ class Q2KResultsAnalyzer:
         }
 
         temps_map = {
+            'Trib': 'tributary',
             'Reach': 'river_reach',
             'Distance': 'Distancia Longitudinal (km)',
             'Temp(C)': 'water_temp_c'
@@ -172,24 +349,41 @@ class Q2KResultsAnalyzer:
             'pH sat': 'ph_saturation'
         }
 
+        hyd = tablas['Hydraulics Summary'].rename(columns=hyd_map)
+        temps = tablas['Temperature Summary'].rename(columns=temps_map)
+        wq = tablas['Water Quality Summary'].rename(columns=wq_map)
+
+        # Salidas sin columna Trib: un solo cauce
+        for tabla in (wq, hyd):
+            if 'tributary' not in tabla.columns:
+                tabla.insert(0, 'tributary', 0)
+
+        # La tabla de temperatura no siempre trae Trib: sus filas siguen el
+        # orden de la de calidad de agua, y si no coinciden se asigna por tramo
+        if 'tributary' not in temps.columns:
+            if len(temps) == len(wq):
+                temps.insert(0, 'tributary', wq['tributary'].to_numpy())
+            else:
+                por_tramo = wq.drop_duplicates('river_reach').set_index('river_reach')['tributary']
+                temps.insert(0, 'tributary', temps['river_reach'].map(por_tramo).fillna(0).astype(int))
+
+        return hyd, temps, wq
+
+    @staticmethod
+    def _combinar_perfil(hyd: pd.DataFrame, temps: pd.DataFrame, wq: pd.DataFrame) -> pd.DataFrame:
+        """Combina hidráulica, temperatura y calidad de agua de un cauce por distancia."""
         # Procesar hidráulica
-        hyd = self.parse_section(secciones, 'Hydraulics Summary')
-        hyd = hyd.rename(columns=hyd_map)
         hyd = hyd[['Distancia Longitudinal (km)', 'flow', 'hydraulic_head',
                    'channel_top_width', 'cross_section_area',
                    'flow_velocity', 'travel_time']]
         hyd = hyd.sort_values('Distancia Longitudinal (km)')
 
         # Procesar temperatura
-        temps = self.parse_section(secciones, 'Temperature Summary')
-        temps = temps.rename(columns=temps_map)
         temps = temps[['Distancia Longitudinal (km)', 'water_temp_c']]
         temps = temps.sort_values('Distancia Longitudinal (km)')
         temps = temps.iloc[:, 0:2]
 
         # Procesar calidad de agua
-        wq = self.parse_section(secciones, 'Water Quality Summary')
-        wq = wq.rename(columns=wq_map)
         wq = wq[['Distancia Longitudinal (km)', 'conductivity',
                  'inorganic_suspended_solids', 'dissolved_oxygen',
                  'carbonaceous_bod_slow', 'carbonaceous_bod_fast', 'nitrite',
@@ -208,17 +402,259 @@ class Q2KResultsAnalyzer:
 
         return merged.sort_values('Distancia Longitudinal (km)', ascending=False).reset_index(drop=True)
 
+    def procesar_out_file(self, ruta_out: str, tributario: Optional[int] = None) -> pd.DataFrame:
+        """
+        Procesa un archivo .out completo de QUAL2K.
+
+        En una red con tributarios cada cauce tiene su propio eje de
+        distancias, por lo que el perfil se construye para un solo cauce.
+
+        Args:
+            ruta_out: Ruta del archivo .out
+            tributario: Valor de la columna Trib del cauce a extraer
+                        (None = cauce principal, el primero del archivo)
+
+        Returns:
+            DataFrame consolidado con resultados
+        """
+        hyd, temps, wq = self._tablas_resumen(ruta_out)
+        if tributario is None:
+            tributario = wq['tributary'].iloc[0]
+        elif tributario not in set(wq['tributary']):
+            raise KeyError(f"El archivo .out no tiene el tributario {tributario} "
+                           f"(disponibles: {sorted(set(wq['tributary']))})")
+
+        return self._combinar_perfil(hyd[hyd['tributary'] == tributario],
+                                     temps[temps['tributary'] == tributario],
+                                     wq[wq['tributary'] == tributario])
+
+    def procesar_red(self, ruta_out: str) -> pd.DataFrame:
+        """
+        Procesa los perfiles de todos los cauces de una red (cauce principal y tributarios).
+
+        Args:
+            ruta_out: Ruta del archivo .out
+
+        Returns:
+            DataFrame con la columna tributary seguida de las columnas de
+            procesar_out_file, ordenado por tributario y distancia descendente
+        """
+        hyd, temps, wq = self._tablas_resumen(ruta_out)
+        perfiles = []
+        for tributario in wq['tributary'].drop_duplicates():
+            perfil = self._combinar_perfil(hyd[hyd['tributary'] == tributario],
+                                           temps[temps['tributary'] == tributario],
+                                           wq[wq['tributary'] == tributario])
+            perfil.insert(0, 'tributary', tributario)
+            perfiles.append(perfil)
+        return pd.concat(perfiles, ignore_index=True)
+
+    def leer_diel(self, ruta_out: str) -> Dict[str, Any]:
+        """
+        Extrae las secciones diel del archivo .out en un arreglo (tiempo, elemento, variable).
+
+        El archivo se recorre una sola vez; los valores de cada fila se
+        acumulan en un buffer plano de floats sin construir DataFrames por
+        línea. Varias secciones diel (p. ej. hidráulica y calidad) se unen en
+        el eje de variables sobre una misma malla de tiempos y elementos.
+
+        Args:
+            ruta_out: Ruta del archivo .out
+
+        Returns:
+            Diccionario con:
+            - tiempos: (T,) tiempo de cada salida en días, ordenado
+            - tributarios: (E,) columna Trib de cada elemento (0 sin red)
+            - elementos: (E,) número de elemento (columna Reach)
+            - distancias: (E,) distancia de cada elemento en km (NaN si no se reporta)
+            - variables: nombres de las variables
+            - valores: (T, E, V) float, NaN donde una sección no reporta
+        """
+        bloques: Dict[str, Dict[str, Any]] = {}
+
+        for seccion, linea in self.iterar_lineas(ruta_out):
+            if not seccion.startswith(PREFIJO_DIEL):
+                continue
+            l = linea.strip()
+            if not l or _PATRON_GUIONES.fullmatch(l):
+                continue
+
+            bloque = bloques.get(seccion)
+            if bloque is None:
+                columnas = [c.strip() for c in _PATRON_SEPARADOR.split(l) if c.strip()]
+                bloques[seccion] = {'columnas': columnas, 'unidades': False,
+                                    'datos': array('d')}
+                continue
+            if not bloque['unidades']:
+                bloque['unidades'] = True
+                continue
+
+            partes = l.split()
+            if len(partes) != len(bloque['columnas']):
+                raise ValueError(f"Fila de '{seccion}' con {len(partes)} valores; "
+                                 f"se esperaban {len(bloque['columnas'])}: {l}")
+            bloque['datos'].extend(map(float, partes))
+
+        if not bloques:
+            raise KeyError(f"El archivo .out no tiene secciones '{PREFIJO_DIEL} ...' "
+                           f"(revise el bloque diel del .q2k)")
+
+        # Tablas (filas, columnas) y separación índice / variables
+        tablas = []
+        for seccion, bloque in bloques.items():
+            columnas = bloque['columnas']
+            tabla = np.asarray(bloque['datos'], dtype=float).reshape(-1, len(columnas))
+            indices = {COLUMNAS_INDICE_DIEL[c]: i for i, c in enumerate(columnas)
+                       if c in COLUMNAS_INDICE_DIEL}
+            if 'tiempo' not in indices or 'elemento' not in indices:
+                raise ValueError(f"La sección '{seccion}' no tiene columnas Time y Reach: {columnas}")
+            variables = [(c, i) for i, c in enumerate(columnas) if c not in COLUMNAS_INDICE_DIEL]
+            tablas.append((tabla, indices, variables))
+
+        # Malla común: tiempos (redondeados para unir formatos distintos) y elementos (Trib, Reach)
+        t_todos = np.concatenate([np.round(t[:, ix['tiempo']], 6) for t, ix, _ in tablas])
+        tiempos, i_tiempo = np.unique(t_todos, return_inverse=True)
+
+        claves = np.concatenate([
+            np.column_stack([t[:, ix['tributario']] if 'tributario' in ix else np.zeros(len(t)),
+                             t[:, ix['elemento']]])
+            for t, ix, _ in tablas
+        ]).astype(int)
+        claves_unicas, i_elemento = np.unique(claves, axis=0, return_inverse=True)
+        i_elemento = i_elemento.ravel()
+
+        variables: List[str] = []
+        for _, _, vars_tabla in tablas:
+            variables.extend(c for c, _ in vars_tabla if c not in variables)
+
+        valores = np.full((len(tiempos), len(claves_unicas), len(variables)), np.nan)
+        distancias = np.full(len(claves_unicas), np.nan)
+
+        inicio = 0
+        for tabla, indices, vars_tabla in tablas:
+            fin = inicio + len(tabla)
+            ti, ei = i_tiempo[inicio:fin], i_elemento[inicio:fin]
+            for nombre, col in vars_tabla:
+                valores[ti, ei, variables.index(nombre)] = tabla[:, col]
+            if 'distancia' in indices:
+                distancias[ei] = tabla[:, indices['distancia']]
+            inicio = fin
+
+        return {
+            'tiempos': tiempos,
+            'tributarios': claves_unicas[:, 0],
+            'elementos': claves_unicas[:, 1],
+            'distancias': distancias,
+            'variables': variables,
+            'valores': valores,
+        }
+
     @staticmethod
-    def preparar_datos_observados(dataWQ: pd.DataFrame) -> pd.DataFrame:
+    def _horas(serie: pd.Series) -> np.ndarray:
+        """Convierte una columna de hora (número, 'HH:MM' o fecha-hora) a horas decimales del día."""
+        if pd.api.types.is_numeric_dtype(serie):
+            return serie.to_numpy(dtype=float) % 24.0
+        fechas = pd.to_datetime(serie.astype(str), format='mixed')
+        return (fechas.dt.hour + fechas.dt.minute / 60.0 + fechas.dt.second / 3600.0).to_numpy()
+
+    def emparejar_diel(self, diel: Dict[str, Any], observados: pd.DataFrame,
+                       pares: List[Tuple[str, str]]) -> pd.DataFrame:
+        """
+        Empareja observaciones horarias con la serie diel modelada.
+
+        Cada observación se asigna al elemento más cercano en distancia (dentro
+        de su cauce según HW_ID, por defecto el principal) y el valor modelado
+        se interpola en el tiempo sobre el último día de la serie, tratado
+        como periódico.
+
+        Args:
+            diel: Resultado de leer_diel
+            observados: DataFrame con X_QUAL2K, HORA y las columnas observadas
+            pares: Lista de tuplas (variable_diel, columna_observada)
+
+        Returns:
+            DataFrame con X_QUAL2K, HORA, elemento y, por par, la columna
+            observada y la modelada ({variable_diel}_sim)
+        """
+        pares = [(v, o) for v, o in pares if v in diel['variables'] and o in observados.columns]
+        if not pares:
+            raise KeyError("Ningún par (variable diel, columna observada) está disponible")
+
+        tiempos = diel['tiempos']
+        ultimo_dia = tiempos > tiempos.max() - 1.0 + 1e-9
+        fraccion = tiempos[ultimo_dia] % 1.0
+        valores = diel['valores'][ultimo_dia]
+
+        horas = self._horas(observados['HORA'])
+        distancias = observados['X_QUAL2K'].to_numpy(dtype=float)
+        # Trib del .out numera los cauces desde 0 (HW_ID 1 = Trib 0)
+        if COLUMNA_HW in observados.columns:
+            tribs = np.asarray(hw_ids(observados)) - 1
+        else:
+            tribs = np.full(len(observados), diel['tributarios'][0])
+
+        elementos = np.empty(len(observados), dtype=int)
+        for trib in np.unique(tribs):
+            candidatos = np.flatnonzero(diel['tributarios'] == trib)
+            if len(candidatos) == 0:
+                raise KeyError(f"La serie diel no tiene el tributario {trib}")
+            filas = tribs == trib
+            cercano = np.abs(diel['distancias'][candidatos][None, :] - distancias[filas][:, None])
+            elementos[filas] = candidatos[np.nanargmin(cercano, axis=1)]
+
+        resultado = pd.DataFrame({'X_QUAL2K': distancias, 'HORA': horas,
+                                  'elemento': diel['elementos'][elementos]})
+        for variable, col_obs in pares:
+            v = diel['variables'].index(variable)
+            sim = np.empty(len(observados))
+            for e in np.unique(elementos):
+                filas = elementos == e
+                sim[filas] = np.interp(horas[filas] / 24.0, fraccion, valores[:, e, v], period=1.0)
+            resultado[col_obs] = observados[col_obs].to_numpy(dtype=float)
+            resultado[f'{variable}_sim'] = sim
+        return resultado
+
+    def calcular_kge_diel(self, diel: Dict[str, Any], observados: pd.DataFrame,
+                          pares: List[Tuple[str, str]],
+                          pesos: Dict[str, float]) -> Tuple[Dict[str, float], float]:
+        """
+        Calcula KGE por variable y global ponderado contra observaciones horarias.
+
+        Los pares sin datos en la serie diel o en las observaciones se omiten.
+
+        Args:
+            diel: Resultado de leer_diel
+            observados: DataFrame con X_QUAL2K, HORA y las columnas observadas
+            pares: Lista de tuplas (variable_diel, columna_observada)
+            pesos: Diccionario con pesos por variable diel
+
+        Returns:
+            Tuple con (resultados_por_variable, kge_global)
+        """
+        emparejados = self.emparejar_diel(diel, observados, pares)
+        resultados = {
+            variable: metricas.kge(emparejados[col_obs], emparejados[f'{variable}_sim'])
+            for variable, col_obs in pares if f'{variable}_sim' in emparejados.columns
+        }
+        global_kge = sum(resultados[var] * pesos[var] for var in resultados)
+        return resultados, global_kge
+
+    @staticmethod
+    def preparar_datos_observados(dataWQ: pd.DataFrame, hw_id: int = 1) -> pd.DataFrame:
         """
         Prepara los datos observados desde el DataFrame de calidad de agua.
 
         Args:
             dataWQ: DataFrame con datos de calidad de agua observados
+            hw_id: Cabecera (columna HW_ID) cuyas estaciones se usan; sin la
+                   columna se usan todas
 
         Returns:
             DataFrame con datos observados formateados
         """
+        if COLUMNA_HW in dataWQ.columns:
+            dataWQ = dataWQ[[i == hw_id for i in hw_ids(dataWQ)]]
+
         mapeoObservados = {
             'X_QUAL2K': 'Distancia Longitudinal (km)',
             'CAUDAL': 'flow',
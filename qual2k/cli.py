@@ -0,0 +1,584 @@
+"""
+Interfaz de línea de comandos para ejecuciones por lotes sin interfaz gráfica.
+
+Uso:
+    python -m qual2k run caso.toml [--workspace /dev/shm] [--no-plots]
+    python -m qual2k calibrate caso.toml --workers 8
+    python -m qual2k sensitivity caso.yaml --workers 8
+    python -m qual2k bench caso.toml --workers 4
+    python -m qual2k reduce caso.toml --workers 8
+    python -m qual2k mesh caso.toml --workers 8
+    python -m qual2k tune caso.toml --workers 8
+    python -m qual2k worker host:50000 --filepath data/templates/Chicamocha --procesos 8
+
+Los mensajes de avance se escriben en stderr y el resumen final en stdout como
+JSON (o en el archivo indicado con --salida), para poder integrarlo en
+planificadores de trabajos.
+
+Formato del archivo de caso (TOML; YAML con las mismas claves):
+
+    [caso]
+    filepath = "data/templates/Chicamocha"   # relativo al archivo de caso
+    plantilla = "PlantillaBaseQ2K.xlsx"
+    q_cabecera = 1.06007e-06
+    numelem = 10                             # o una lista por tramo
+    longitud_elemento = 2.0                  # km por elemento (opcional)
+    ajuste_numerico = true                   # aplicar ajuste_numerico.json (tune)
+    estacion_cabecera = "CABECERA"
+
+    [header]            # header_dict (filedir = filepath por defecto)
+    rivname = "Chicamocha"
+    xmon = 6
+    ...
+
+    [rates]             # tasas generales a modificar
+    kn = 0.1
+
+    [reach_rates]       # tasas por tramo: valor único o lista por tramo
+    kn_rch = 0.2
+
+    [pesos]             # pesos del KGE (se combinan con PESOS_DEFAULT)
+    dissolved_oxygen = 0.3
+
+    [calibracion]       # argumentos de Calibracion
+    num_generations = 50
+    broker = "10.0.0.5:50000"                 # evaluación distribuida (opcional; clave en QUAL2K_AUTHKEY)
+    semilla = "checkpoint_calibracion.json"   # arranque en caliente (opcional)
+    reducir_espacio = 0.2
+    agregacion = "media"                      # KGE de las campañas: media o minimo
+    [calibracion.parametros]
+    kaaa = [0.1, 3, false]
+    [[calibracion.campanas]]                  # calibración conjunta (opcional)
+    filepath = "data/templates/Chicamocha"    # relativo al archivo de caso
+    [[calibracion.campanas]]
+    filepath = "data/templates/Chicamocha_2013"
+    header_dict = {xmon = 2, xday = 14, xyear = 2013}
+    peso = 0.5
+    [[calibracion.fidelidades]]               # multi-fidelidad, de gruesa a fina (opcional)
+    numelem = 2
+    tf = 2
+    dtuser = 0.0166667
+    [[calibracion.fidelidades]]
+    longitud_elemento = 2.0
+
+    [sensibilidad]
+    n = 128
+    [sensibilidad.parametros]
+    kn = [0.0005, 0.05]
+
+    [bench]
+    repeticiones = 3
+    escenarios = 8
+
+    [reduccion]         # argumentos de OptimizadorCargas
+    od_minimo = 4.0
+    contaminantes = ["DBO5", "NITROGENO_AMONIACAL"]
+    fuentes = ["PTAR TUNJA", 12]              # nombres o índices (opcional)
+    reduccion_maxima = 0.9
+    [reduccion.costos]
+    DBO5 = 1.0
+
+    [malla]             # argumentos de EstudioMalla
+    tolerancia_kge = 0.01
+    tolerancia_perfil = 0.05
+
+    [ajuste]            # argumentos de AjustePasoTiempo
+    dtusers = [0.0041667, 0.0083333, 0.0166667]
+    tfs = [1, 2, 3, 5]
+    metodos = ["Euler", "Runge-Kutta"]
+
+El comando tune guarda dtuser, tf e IMeth recomendados en
+ajuste_numerico.json junto a la plantilla; los demás comandos los aplican al
+[header] salvo que el caso indique ajuste_numerico = false.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from qual2k.core.model import Q2KModel, PESOS_DEFAULT
+from qual2k.core.escenarios import aplicar_escenario
+from qual2k.core.recursos import cpus_disponibles
+
+COLUMNA_DISTANCIA = 'Distancia Longitudinal (km)'
+
+COMANDOS = ['run', 'calibrate', 'sensitivity', 'bench', 'reduce', 'mesh', 'tune']
+
+
+def cargar_caso(ruta: str, aplicar_ajuste: bool = True) -> Dict[str, Any]:
+    """
+    Lee un archivo de caso TOML o YAML y normaliza rutas y header.
+
+    Args:
+        ruta: Ruta del archivo de caso (.toml, .yaml o .yml)
+        aplicar_ajuste: Si aplicar al header el ajuste_numerico.json de la
+                        plantilla (salvo ajuste_numerico = false en [caso])
+
+    Returns:
+        Diccionario del caso con filepath absoluto y header completo
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+
+    if extension == '.toml':
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+        with open(ruta, 'rb') as f:
+            caso = tomllib.load(f)
+    elif extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("Los casos YAML requieren PyYAML (pip install pyyaml)") from e
+        with open(ruta, 'r', encoding='utf-8') as f:
+            caso = yaml.safe_load(f) or {}
+    else:
+        raise ValueError(f"Formato de caso no soportado: {extension} (use .toml o .yaml)")
+
+    general = caso.setdefault('caso', {})
+    if 'filepath' not in general:
+        raise KeyError("El caso debe definir [caso] filepath")
+
+    base = os.path.dirname(os.path.abspath(ruta))
+    general['filepath'] = os.path.normpath(os.path.join(base, general['filepath']))
+    general.setdefault('plantilla', 'PlantillaBaseQ2K.xlsx')
+
+    header = caso.setdefault('header', {})
+    if 'rivname' not in header:
+        raise KeyError("El caso debe definir [header] rivname")
+    header.setdefault('version', 'v2.12')
+    header.setdefault('filename', header['rivname'])
+    header.setdefault('applabel', header['rivname'])
+    header['filedir'] = general['filepath']
+
+    if aplicar_ajuste and general.get('ajuste_numerico', True):
+        from qual2k.core.paso_tiempo import cargar_ajuste_numerico
+        ajuste = cargar_ajuste_numerico(general['filepath'])
+        if ajuste:
+            header.update(ajuste)
+            print(f'Ajuste numérico aplicado: {ajuste}')
+
+    campanas = caso.get('calibracion', {}).get('campanas', [])
+    for i, campana in enumerate(campanas):
+        if isinstance(campana, str):
+            campanas[i] = os.path.normpath(os.path.join(base, campana))
+        else:
+            campana['filepath'] = os.path.normpath(os.path.join(base, campana['filepath']))
+
+    return caso
+
+
+def _pesos(caso: Dict[str, Any]) -> Dict[str, float]:
+    """Pesos del KGE del caso combinados con los pesos por defecto."""
+    return {**PESOS_DEFAULT, **caso.get('pesos', {})}
+
+
+def _clave_reach_rate(nombre: str) -> str:
+    """Convierte un nombre de parámetro (kn, kdc...) en su clave de reach_rates."""
+    return nombre if nombre == 'kaaa' or nombre.endswith('_rch') else f'{nombre}_rch'
+
+
+def _modelo_configurado(caso: Dict[str, Any], workspace: Optional[str]) -> Q2KModel:
+    """Crea, carga y configura el modelo del caso con sus modificaciones."""
+    general = caso['caso']
+    model = Q2KModel(general['filepath'], dict(caso['header']),
+                     usar_workspace=workspace is not None,
+                     workspace_root=workspace)
+    model.cargar_plantillas(general['plantilla'])
+    model.config.actualizar_rates(**caso.get('rates', {}))
+    numelem = general.get('numelem', 10)
+    model.configurar_modelo(
+        numelem_default=numelem if isinstance(numelem, int) else 10,
+        q_cabecera=general.get('q_cabecera', 1.06574E-06),
+        estacion_cabecera=general.get('estacion_cabecera', 'CABECERA'),
+        longitud_elemento=general.get('longitud_elemento'),
+        numelem=None if isinstance(numelem, int) else list(numelem)
+    )
+
+    reach_rates = {_clave_reach_rate(k): v for k, v in caso.get('reach_rates', {}).items()}
+    if reach_rates:
+        model.q2k_data = aplicar_escenario(model.q2k_data, {'reach_rates': reach_rates})
+    return model
+
+
+def _kge_perfil(model: Q2KModel, perfil: pd.DataFrame, pesos: Dict[str, float]):
+    """Calcula el KGE de un perfil modelado contra las observaciones del modelo."""
+    data_obs = model.results_analyzer.preparar_datos_observados(model.data_wq)
+    model.wq_data_model = perfil
+    model.data_exp = model.results_analyzer.combinar_modelados_observados(perfil, data_obs)
+    return model.calcular_metricas_calibracion(pesos=pesos)
+
+
+def _perfil_ancho(largo: pd.DataFrame) -> pd.DataFrame:
+    """Convierte el perfil largo de un escenario (run_scenarios) a formato ancho."""
+    largo = largo.assign(_fila=largo.groupby('variable').cumcount())
+    ancho = largo.pivot(index='_fila', columns='variable', values='valor')
+    distancias = largo.drop_duplicates('_fila').set_index('_fila')[COLUMNA_DISTANCIA]
+    ancho.insert(0, COLUMNA_DISTANCIA, distancias)
+    return ancho.reset_index(drop=True).rename_axis(columns=None)
+
+
+def comando_run(caso: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    """Ejecuta una simulación del caso y calcula sus métricas."""
+    model = _modelo_configurado(caso, args.workspace)
+    try:
+        model.generar_archivo_q2k()
+        model.ejecutar_simulacion()
+        model.analizar_resultados(generar_graficas=not args.no_plots)
+        resultados, kge_global = model.calcular_metricas_calibracion(pesos=_pesos(caso))
+    finally:
+        model.liberar_workspace()
+
+    filedir = model.config.header_dict['filedir']
+    return {
+        'kge_global': kge_global,
+        'kge_por_variable': resultados,
+        'resultados_csv': os.path.join(filedir, 'resultados',
+                                       f"{model.config.header_dict['filename']}.csv"),
+    }
+
+
+def comando_calibrate(caso: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    """Ejecuta la calibración con algoritmo genético definida en [calibracion]."""
+    from qual2k.core.calibrator import Calibracion
+
+    opciones = dict(caso.get('calibracion', {}))
+    parametros = {k: tuple(v) for k, v in opciones.pop('parametros', {}).items()}
+    if not parametros:
+        raise KeyError("El caso debe definir [calibracion.parametros]")
+
+    general = caso['caso']
+    if args.workers is not None:
+        opciones['num_workers'] = args.workers
+        opciones['usar_paralelo'] = args.workers > 1
+    # cargar_caso ya aplicó (o no, según el caso) ajuste_numerico.json
+    opciones['ajuste_numerico'] = False
+
+    calibracion = Calibracion(
+        general['filepath'], dict(caso['header']), parametros,
+        workspace_root=args.workspace,
+        pesos=_pesos(caso),
+        q_cabecera=general.get('q_cabecera', 1.06007E-06),
+        **opciones
+    )
+    resultado = calibracion.ejecutar(generar_graficas=not args.no_plots)
+    if resultado is None:
+        return {'estado': 'interrumpido'}
+
+    _, kge_final = resultado
+    return {
+        'kge_final': kge_final,
+        'evaluaciones': calibracion.contador_evaluaciones,
+        'generaciones': len(calibracion.historial_generaciones),
+        'kge_por_campana': calibracion.kge_por_campana,
+        'costo_fidelidad': calibracion.costo_calibracion,
+        'parametros_calibrados': {
+            nombre: valores
+            for nombre, valores in calibracion.get_parametros_calibrados().items()
+            if any(v is not None for v in valores)
+        },
+    }
+
+
+def comando_worker(args: argparse.Namespace) -> Dict[str, Any]:
+    """Conecta procesos worker a un broker de evaluación distribuida."""
+    from qual2k.core.distribuido import ejecutar_worker, _clave
+    import multiprocessing as mp
+
+    filepath = os.path.abspath(args.filepath)
+    authkey = _clave(args.authkey).decode()  # falla antes de lanzar procesos si no hay clave
+    worker_args = (args.broker, authkey, filepath, args.workspace, args.max_tareas)
+    if args.procesos <= 1:
+        return {'evaluadas': ejecutar_worker(*worker_args)}
+
+    with mp.Pool(args.procesos) as pool:
+        evaluadas = pool.starmap(ejecutar_worker, [worker_args] * args.procesos)
+    return {'evaluadas': sum(evaluadas), 'procesos': args.procesos}
+
+
+def comando_sensitivity(caso: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    """Análisis de sensibilidad de Sobol del KGE a las tasas por tramo (requiere SALib)."""
+    try:
+        from SALib.sample import saltelli
+        from SALib.analyze import sobol
+    except ImportError as e:
+        raise ImportError("El análisis de sensibilidad requiere SALib (pip install SALib)") from e
+
+    opciones = caso.get('sensibilidad', {})
+    rangos = opciones.get('parametros', {})
+    if not rangos:
+        raise KeyError("El caso debe definir [sensibilidad.parametros]")
+
+    problem = {
+        'num_vars': len(rangos),
+        'names': list(rangos),
+        'bounds': [list(v) for v in rangos.values()],
+    }
+    muestras = saltelli.sample(problem, opciones.get('n', 128))
+
+    model = _modelo_configurado(caso, args.workspace)
+    escenarios = {
+        f'm{i}': {'reach_rates': {_clave_reach_rate(n): float(v)
+                                  for n, v in zip(problem['names'], fila)}}
+        for i, fila in enumerate(muestras)
+    }
+    tabla = model.run_scenarios(escenarios, max_concurrentes=args.workers)
+
+    pesos = _pesos(caso)
+    kge = dict.fromkeys(escenarios, np.nan)
+    for nombre, grupo in tabla.groupby('escenario', sort=False):
+        kge[nombre] = _kge_perfil(model, _perfil_ancho(grupo), pesos)[1]
+
+    # Las corridas fallidas se reemplazan por la media para no invalidar Sobol
+    Y = np.array(list(kge.values()), dtype=float)
+    fallidas = int(np.isnan(Y).sum())
+    Y[np.isnan(Y)] = np.nanmean(Y)
+    Si = sobol.analyze(problem, Y)
+
+    return {
+        'simulaciones': len(muestras),
+        'fallidas': fallidas,
+        'indices': {
+            nombre: {'S1': Si['S1'][i], 'S1_conf': Si['S1_conf'][i],
+                     'ST': Si['ST'][i], 'ST_conf': Si['ST_conf'][i]}
+            for i, nombre in enumerate(problem['names'])
+        },
+    }
+
+
+def comando_bench(caso: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    """Mide el tiempo de cada etapa del flujo y el rendimiento de escenarios en paralelo."""
+    opciones = caso.get('bench', {})
+    repeticiones = opciones.get('repeticiones', 3)
+    tiempos = {etapa: [] for etapa in
+               ('cargar_configurar', 'generar_q2k', 'simular', 'analizar')}
+
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        model = _modelo_configurado(caso, args.workspace)
+        tiempos['cargar_configurar'].append(time.perf_counter() - inicio)
+        try:
+            for etapa, paso in (('generar_q2k', model.generar_archivo_q2k),
+                                ('simular', model.ejecutar_simulacion),
+                                ('analizar', lambda: model.analizar_resultados(
+                                    generar_graficas=not args.no_plots))):
+                inicio = time.perf_counter()
+                paso()
+                tiempos[etapa].append(time.perf_counter() - inicio)
+        finally:
+            model.liberar_workspace()
+
+    resumen = {
+        'repeticiones': repeticiones,
+        'etapas_s': {etapa: {'mediana': float(np.median(v)), 'minimo': float(np.min(v))}
+                     for etapa, v in tiempos.items()},
+    }
+
+    n_escenarios = opciones.get('escenarios', 2 * (args.workers or cpus_disponibles()))
+    if n_escenarios:
+        inicio = time.perf_counter()
+        tabla = model.run_scenarios([{}] * n_escenarios, max_concurrentes=args.workers)
+        duracion = time.perf_counter() - inicio
+        resumen['escenarios'] = {
+            'n': n_escenarios,
+            'completados': int(tabla['escenario'].nunique()),
+            'duracion_s': duracion,
+            'simulaciones_por_s': n_escenarios / duracion,
+        }
+
+    return resumen
+
+
+def comando_reduce(caso: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    """Busca la menor reducción de cargas que cumple el OD mínimo ([reduccion])."""
+    from qual2k.core.reduccion_cargas import OptimizadorCargas
+
+    opciones = dict(caso.get('reduccion', {}))
+    if 'rango_distancias' in opciones:
+        opciones['rango_distancias'] = tuple(opciones['rango_distancias'])
+
+    general = caso['caso']
+    optimizador = OptimizadorCargas(
+        general['filepath'], dict(caso['header']),
+        workspace_root=args.workspace,
+        n_simuladores=args.workers,
+        modelo=_modelo_configurado(caso, None),
+        **opciones
+    )
+    mejor = optimizador.optimizar()
+    if mejor is None:
+        raise RuntimeError('Ninguna simulación de la optimización terminó')
+
+    asignacion = optimizador.reporte()
+    return {
+        'factible': mejor['factible'],
+        'costo': mejor['costo'],
+        'od_min': mejor['od_min'],
+        'deficit_od': mejor['deficit'],
+        'simulaciones': len(optimizador.evaluaciones),
+        'asignacion': asignacion.to_dict(orient='records'),
+    }
+
+
+def comando_mesh(caso: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    """Estudio de convergencia de malla ([malla]): elementos recomendados por tramo."""
+    from qual2k.core.malla import EstudioMalla
+
+    general = caso['caso']
+    estudio = EstudioMalla(
+        general['filepath'], dict(caso['header']),
+        workspace_root=args.workspace,
+        n_simuladores=args.workers,
+        pesos=_pesos(caso),
+        modelo=_modelo_configurado(caso, None),
+        **caso.get('malla', {})
+    )
+    recomendacion = estudio.ejecutar()
+    return {
+        **recomendacion,
+        'niveles': estudio.resultados.to_dict(orient='records'),
+    }
+
+
+def comando_tune(caso: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    """Ajusta dtuser, tf e IMeth ([ajuste]) y guarda la recomendación junto a la plantilla."""
+    from qual2k.core.paso_tiempo import AjustePasoTiempo, ARCHIVO_AJUSTE
+
+    general = caso['caso']
+    ajuste = AjustePasoTiempo(
+        general['filepath'], dict(caso['header']),
+        workspace_root=args.workspace,
+        n_simuladores=args.workers,
+        pesos=_pesos(caso),
+        modelo=_modelo_configurado(caso, None),
+        **caso.get('ajuste', {})
+    )
+    recomendacion = ajuste.ejecutar(guardar=True)
+    return {
+        **recomendacion,
+        'archivo': os.path.join(general['filepath'], ARCHIVO_AJUSTE),
+        'combinaciones': ajuste.resultados.to_dict(orient='records'),
+    }
+
+
+def _a_json(valor: Any) -> Any:
+    """Convierte tipos numpy/pandas y NaN a tipos serializables en JSON."""
+    if isinstance(valor, dict):
+        return {str(k): _a_json(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple, np.ndarray)):
+        return [_a_json(v) for v in valor]
+    if isinstance(valor, (np.integer,)):
+        return int(valor)
+    if isinstance(valor, (float, np.floating)):
+        return None if math.isnan(valor) or math.isinf(valor) else float(valor)
+    return valor
+
+
+def crear_parser() -> argparse.ArgumentParser:
+    """Construye el parser de argumentos de la línea de comandos."""
+    parser = argparse.ArgumentParser(
+        prog='python -m qual2k',
+        description='Ejecución por lotes de modelos QUAL2K'
+    )
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    ayudas = {
+        'run': 'Ejecuta una simulación y calcula el KGE',
+        'calibrate': 'Calibra tasas por tramo con algoritmo genético',
+        'sensitivity': 'Análisis de sensibilidad de Sobol (requiere SALib)',
+        'bench': 'Mide tiempos por etapa y rendimiento en paralelo',
+        'reduce': 'Optimiza la reducción de cargas de vertimientos (OD mínimo)',
+        'mesh': 'Estudio de convergencia de malla (elementos por tramo)',
+        'tune': 'Ajusta paso de tiempo, duración y método de integración',
+    }
+    for comando in COMANDOS:
+        sub = subparsers.add_parser(comando, help=ayudas[comando])
+        sub.add_argument('caso', help='Archivo de caso (.toml, .yaml o .yml)')
+        sub.add_argument('--workers', type=int, default=None,
+                         help='Procesos o simulaciones simultáneas (por defecto: automático)')
+        sub.add_argument('--workspace', default=None,
+                         help='Raíz de los workspaces de simulación (p.ej. /dev/shm)')
+        sub.add_argument('--no-plots', action='store_true',
+                         help='No generar gráficas')
+        sub.add_argument('--salida', default=None,
+                         help='Archivo JSON de resumen (por defecto: stdout)')
+
+    worker = subparsers.add_parser('worker', help='Evalúa soluciones publicadas por un broker')
+    worker.add_argument('broker', help='Dirección del broker (host:puerto)')
+    worker.add_argument('--filepath', required=True,
+                        help='Directorio local de la plantilla (igual a la del coordinador)')
+    worker.add_argument('--procesos', type=int, default=1,
+                        help='Procesos worker en este nodo')
+    worker.add_argument('--authkey', default=None,
+                        help='Clave compartida con el coordinador (por defecto: QUAL2K_AUTHKEY)')
+    worker.add_argument('--workspace', default=None,
+                        help='Raíz de los workspaces de simulación (p.ej. /dev/shm)')
+    worker.add_argument('--max-tareas', type=int, default=None,
+                        help='Terminar tras evaluar este número de tareas por proceso')
+    worker.add_argument('--salida', default=None,
+                        help='Archivo JSON de resumen (por defecto: stdout)')
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Punto de entrada de la línea de comandos.
+
+    Args:
+        argv: Argumentos (None = sys.argv[1:])
+
+    Returns:
+        Código de salida (0 = éxito, 1 = error)
+    """
+    args = crear_parser().parse_args(argv)
+    comandos = {
+        'run': comando_run,
+        'calibrate': comando_calibrate,
+        'sensitivity': comando_sensitivity,
+        'bench': comando_bench,
+        'reduce': comando_reduce,
+        'mesh': comando_mesh,
+        'tune': comando_tune,
+    }
+
+    inicio = time.perf_counter()
+    if args.comando == 'worker':
+        resumen = {'comando': args.comando, 'broker': args.broker}
+    else:
+        resumen = {'comando': args.comando, 'caso': os.path.abspath(args.caso)}
+    codigo = 0
+
+    # Los mensajes de avance van a stderr; stdout queda reservado para el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            resumen['estado'] = 'ok'
+            if args.comando == 'worker':
+                resumen.update(comando_worker(args))
+            else:
+                # tune parte del header del caso, sin un ajuste anterior
+                caso = cargar_caso(args.caso, aplicar_ajuste=args.comando != 'tune')
+                resumen.update(comandos[args.comando](caso, args))
+        except Exception as e:
+            resumen['estado'] = 'error'
+            resumen['error'] = f'{type(e).__name__}: {e}'
+            codigo = 1
+
+    resumen['duracion_s'] = time.perf_counter() - inicio
+    texto = json.dumps(_a_json(resumen), ensure_ascii=False, indent=2)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+    return codigo
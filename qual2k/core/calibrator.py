@@ -1,31 +1,122 @@
 from qual2k.core.model import Q2KModel
+from qual2k.core import workspace as ws
+from qual2k.core import recursos
+from qual2k.core.paso_tiempo import CLAVES_AJUSTE, EVALUACIONES_METODO
+from qual2k.processing.data_processor import elementos_por_tramo
+from qual2k.analysis.result_store import Q2KResultStore
+from qual2k.processing.file_writer import escribir_atomico
 from pathlib import Path
-import pygad
 import warnings
+import json
 import os
-import glob
-import shutil
-import tempfile
+import queue
+import re
+import time
 import multiprocessing as mp
 from typing import Dict, List, Tuple, Optional, Any, Union
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
-from matplotlib.gridspec import GridSpec
 import pandas as pd
 
 warnings.filterwarnings('ignore')
 
-# Configuración de estilo para publicación
-plt.rcParams['font.family'] = 'serif'
-plt.rcParams['font.serif'] = ['Times New Roman', 'DejaVu Serif']
-plt.rcParams['font.size'] = 10
-plt.rcParams['axes.labelsize'] = 11
-plt.rcParams['axes.titlesize'] = 12
-plt.rcParams['xtick.labelsize'] = 9
-plt.rcParams['ytick.labelsize'] = 9
-plt.rcParams['legend.fontsize'] = 9
-plt.rcParams['figure.titlesize'] = 13
+# Tiempo máximo de espera por una evaluación en el pool (s)
+TIMEOUT_EVALUACION = 300
+
+# Claves de un nivel de fidelidad que se pasan a configurar_modelo (el resto
+# de las admitidas, CLAVES_AJUSTE, reemplazan las del header)
+CLAVES_MALLA = ('numelem', 'longitud_elemento')
+
+# Mejora mínima del mejor KGE para que una generación no cuente como estancada
+MEJORA_MINIMA_FIDELIDAD = 1e-4
+
+# Configuración de estilo para publicación (se aplica al primer gráfico)
+ESTILO_PUBLICACION = {
+    'font.family': 'serif',
+    'font.serif': ['Times New Roman', 'DejaVu Serif'],
+    'font.size': 10,
+    'axes.labelsize': 11,
+    'axes.titlesize': 12,
+    'xtick.labelsize': 9,
+    'ytick.labelsize': 9,
+    'legend.fontsize': 9,
+    'figure.titlesize': 13,
+}
+
+_estilo_aplicado = False
+
+
+def _importar_graficos():
+    """
+    Importa matplotlib bajo demanda y aplica el estilo de publicación una vez.
+
+    Los procesos worker y las ejecuciones sin gráficas no pagan el costo de
+    importar matplotlib.
+
+    Returns:
+        Tuple (pyplot, GridSpec)
+    """
+    global _estilo_aplicado
+    import matplotlib.pyplot as plt
+    from matplotlib.gridspec import GridSpec
+
+    if not _estilo_aplicado:
+        plt.rcParams.update(ESTILO_PUBLICACION)
+        _estilo_aplicado = True
+    return plt, GridSpec
+
+
+def leer_parametros_calibrados(ruta: str) -> Dict[str, float]:
+    """
+    Lee la sección PARÁMETROS ÓPTIMOS de un parametros_calibrados.txt.
+
+    Args:
+        ruta: Ruta del archivo escrito por Calibracion._guardar_resultados
+
+    Returns:
+        Diccionario {gen: valor}; los parámetros por tramo se nombran
+        parametro_tramo (p.ej. 'kdc_3'), igual que en el result_store
+    """
+    valores = {}
+    en_seccion = False
+    parametro_tramo = None
+
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            if linea.startswith('PARÁMETROS ÓPTIMOS'):
+                en_seccion = True
+                continue
+            if not en_seccion:
+                continue
+            if linea.startswith('HISTORIAL'):
+                break
+
+            global_ = re.match(r'^(\S+)\s+\(global\):\s+(\S+)', linea)
+            tramo = re.match(r'^\s+Reach (\d+):\s+(\S+)', linea)
+            if global_:
+                valores[global_.group(1)] = float(global_.group(2))
+                parametro_tramo = None
+            elif re.match(r'^(\S+)\s+\(por tramo\):', linea):
+                parametro_tramo = linea.split()[0]
+            elif tramo and parametro_tramo:
+                valores[f'{parametro_tramo}_{tramo.group(1)}'] = float(tramo.group(2))
+
+    return valores
+
+
+def leer_checkpoint(ruta: str) -> List[Dict[str, float]]:
+    """
+    Lee la población de un checkpoint_calibracion.json.
+
+    Args:
+        ruta: Ruta del checkpoint escrito por Calibracion en cada generación
+
+    Returns:
+        Lista de soluciones {gen: valor}, de mayor a menor fitness
+    """
+    with open(ruta, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    nombres = checkpoint['nombres_genes']
+    return [dict(zip(nombres, fila)) for fila in checkpoint['poblacion']]
 
 
 class Calibracion:
@@ -67,6 +158,35 @@ class Calibracion:
             # Parámetros de paralelismo
             num_workers: Optional[int] = None,
             usar_paralelo: bool = True,
+            fijar_cpu: bool = False,
+            concurrencia_adaptativa: bool = True,
+            fitness_batch_size: Optional[int] = None,
+            # Evaluación distribuida en varios nodos
+            broker: Optional[str] = None,
+            authkey: Optional[str] = None,
+            workers_locales: int = 0,
+            # Directorio raíz de los workspaces temporales
+            workspace_root: Optional[str] = None,
+            # Almacén columnar de perfiles de todas las evaluaciones
+            result_store: Optional[str] = None,
+            # Pesos de las variables en el KGE global
+            pesos: Optional[Dict[str, float]] = None,
+            # Arranque en caliente desde una calibración anterior
+            semilla: Optional[str] = None,
+            perturbacion: float = 0.05,
+            fraccion_semilla: float = 0.75,
+            reducir_espacio: Optional[float] = None,
+            guardar_checkpoint: bool = True,
+            # Calibración conjunta de varias campañas
+            campanas: Optional[List[Union[str, Dict[str, Any]]]] = None,
+            agregacion: str = 'media',
+            # Calibración multi-fidelidad
+            fidelidades: Optional[List[Dict[str, Any]]] = None,
+            umbral_fidelidad: float = 0.02,
+            paciencia_fidelidad: int = 5,
+            max_generaciones_fidelidad: Optional[int] = None,
+            # Ajuste numérico guardado por AjustePasoTiempo
+            ajuste_numerico: bool = True,
             # Parámetros adicionales de Q2K
             q_cabecera: float = 1.06007E-06
     ):
@@ -114,18 +234,131 @@ class Calibracion:
             random_seed: Semilla para reproducibilidad (None = aleatorio)
 
             # Parámetros de paralelismo
-            num_workers: Número de workers paralelos (None = auto)
+            num_workers: Número de workers paralelos (None = CPUs disponibles
+                         según la afinidad del proceso y la cuota del cgroup)
             usar_paralelo: Si usar procesamiento paralelo
+            fijar_cpu: Si fijar cada worker (y su proceso FORTRAN) a una CPU
+            concurrencia_adaptativa: Si medir el rendimiento (simulaciones/s) con
+                                     distintas concurrencias (hasta num_workers)
+                                     en las primeras generaciones y usar la
+                                     mejor en adelante
+            fitness_batch_size: Soluciones evaluadas en paralelo por lote
+                                (None = toda la población)
+
+            # Evaluación distribuida
+            broker: 'host:puerto' donde publicar las evaluaciones para workers
+                    remotos (python -m qual2k worker ...); reemplaza al pool local
+            authkey: Clave compartida con los workers (None = QUAL2K_AUTHKEY o una
+                     clave aleatoria que se imprime al iniciar el broker)
+            workers_locales: Workers conectados al broker a lanzar en esta máquina
+
+            # Workspaces
+            workspace_root: Raíz de los workspaces de evaluación
+                            (None = /dev/shm si está disponible, si no el temporal del sistema)
+
+            # Almacén de resultados
+            result_store: Directorio de un Q2KResultStore donde guardar el perfil
+                          y los parámetros de cada evaluación, con su eval_id
+                          (None = no guardar)
+
+            # Pesos del KGE
+            pesos: Diccionario {variable: peso} del KGE global ponderado
+                   (None = pesos por defecto de calcular_metricas_calibracion)
+
+            # Arranque en caliente
+            semilla: parametros_calibrados.txt o checkpoint_calibracion.json de
+                     una calibración anterior (relativo a filepath) con el que
+                     sembrar la población inicial (None = población aleatoria)
+            perturbacion: Desviación estándar del ruido gaussiano aplicado a las
+                          semillas, como fracción del rango de cada gen
+            fraccion_semilla: Fracción de la población derivada de las semillas
+                              (el resto es aleatoria para mantener diversidad)
+            reducir_espacio: Si se indica, acota cada gen a la mejor semilla ±
+                             reducir_espacio/2 del rango original (p.ej. 0.2)
+            guardar_checkpoint: Si guardar checkpoint_calibracion.json (población
+                                ordenada por fitness) al final de cada generación
+
+            # Calibración multicampaña
+            campanas: Plantillas de varias campañas de muestreo del mismo río
+                      (mismos tramos) a calibrar con un único juego de
+                      parámetros. Cada elemento es la ruta del directorio de la
+                      campaña o un dict con 'filepath' y opcionalmente 'nombre',
+                      'header_dict' (claves que reemplazan las de header_dict,
+                      p.ej. la fecha), 'q_cabecera' y 'peso'.
+                      None = solo la campaña de filepath
+            agregacion: Cómo combinar el KGE de las campañas: 'media' (ponderada
+                        por peso) o 'minimo' (la peor campaña)
+
+            # Calibración multi-fidelidad
+            fidelidades: Niveles de fidelidad reducida para las primeras
+                         generaciones, del más grueso al más fino. Cada uno es
+                         un dict con 'numelem' (entero o lista por tramo) o
+                         'longitud_elemento' (km) y/o 'dtuser', 'tf' e 'IMeth'
+                         que reemplazan los del header (p.ej. las
+                         recomendaciones de EstudioMalla y AjustePasoTiempo),
+                         más un 'nombre' opcional. La fidelidad completa es
+                         siempre el último nivel. None = siempre completa
+            umbral_fidelidad: Se pasa al siguiente nivel cuando el rango
+                              intercuartil del fitness de la población baja de
+                              este valor (población convergida)
+            paciencia_fidelidad: ... o tras estas generaciones sin mejorar el
+                                 mejor KGE del nivel
+            max_generaciones_fidelidad: ... o tras estas generaciones en el
+                                        nivel (None = num_generations / número
+                                        de niveles)
+
+            # Ajuste numérico guardado por AjustePasoTiempo
+            ajuste_numerico: Si aplicar al header el dtuser, tf e IMeth de
+                             ajuste_numerico.json de filepath (si existe)
 
             # Parámetros adicionales de Q2K
             q_cabecera: Caudal de cabecera para el modelo
         """
         # Configuración del modelo
+        if ajuste_numerico:
+            from qual2k.core.paso_tiempo import cargar_ajuste_numerico
+            ajuste = cargar_ajuste_numerico(filepath)
+            if ajuste:
+                header_dict = {**header_dict, **ajuste}
+                print(f'Ajuste numérico aplicado: {ajuste}')
         self.filepath = filepath
         self.header_dict = header_dict
         self.parametros = parametros
+        self.pesos = pesos
         self.q_cabecera = q_cabecera
 
+        # Campañas evaluadas por cada cromosoma
+        if agregacion not in ('media', 'minimo'):
+            raise ValueError(f"agregacion debe ser 'media' o 'minimo', no '{agregacion}'")
+        self.agregacion = agregacion
+        self.campanas = self._normalizar_campanas(campanas)
+        self._indice_campana = {c['filepath']: k for k, c in enumerate(self.campanas)}
+        self._parciales: Dict[int, List[Optional[float]]] = {}
+        self.kge_por_campana: Dict[str, float] = {}
+
+        # Niveles de fidelidad (el último es la fidelidad completa)
+        self.fidelidades = self._normalizar_fidelidades(fidelidades)
+        self.umbral_fidelidad = umbral_fidelidad
+        self.paciencia_fidelidad = paciencia_fidelidad
+        self.max_generaciones_fidelidad = (max_generaciones_fidelidad or
+                                           max(1, num_generations // len(self.fidelidades)))
+        self.nivel_fidelidad = 0
+        self.cambios_fidelidad: List[Dict[str, Any]] = []
+        self.costo_calibracion: Dict[str, Any] = {}
+        self._evaluaciones_nivel = [0] * len(self.fidelidades)
+        self._costos_nivel: List[float] = []
+        self._inicio_nivel = 0
+        self._mejor_nivel = -np.inf
+        self._generacion_mejora = 0
+        self._fitness_aproximado = set()
+
+        # Arranque en caliente
+        self.semilla = semilla
+        self.perturbacion = perturbacion
+        self.fraccion_semilla = fraccion_semilla
+        self.reducir_espacio = reducir_espacio
+        self.guardar_checkpoint = guardar_checkpoint
+
         # Parámetros básicos del GA
         self.num_generations = num_generations
         self.population_size = population_size
@@ -162,9 +395,31 @@ class Calibracion:
 
         # Configuración de paralelismo
         self.usar_paralelo = usar_paralelo
-        self.num_workers = num_workers or min(4, mp.cpu_count() - 1)
+        self.num_workers = num_workers or recursos.workers_recomendados()
+        self.fijar_cpu = fijar_cpu
+        self.concurrencia_adaptativa = concurrencia_adaptativa
+        self.fitness_batch_size = fitness_batch_size
+        self.concurrencia = self.num_workers
+        self.rendimientos = {}
+        self._pool_calentado = False
+        self._niveles_pendientes: Optional[List[int]] = None
         self.pool = None
 
+        # Evaluación distribuida
+        if broker and len(self.campanas) > 1:
+            raise ValueError("La calibración multicampaña no admite broker: los workers "
+                             "remotos solo tienen la plantilla de una campaña")
+        self.broker = broker
+        self.authkey = authkey
+        self.workers_locales = workers_locales
+        self._broker = None
+
+        # Raíz de los workspaces de evaluación
+        self.workspace_root = ws.resolver_raiz_workspace(workspace_root)
+
+        # Almacén de perfiles por evaluación
+        self.store = Q2KResultStore(result_store) if result_store else None
+
         # Estado de la calibración
         self.contador_evaluaciones = 0
         self.mejor_kge = -999.0
@@ -183,6 +438,109 @@ class Calibracion:
         model.cargar_plantillas(plantilla)
         return model
 
+    def _normalizar_campanas(self, campanas: Optional[List[Union[str, Dict[str, Any]]]]
+                             ) -> List[Dict[str, Any]]:
+        """
+        Completa la definición de cada campaña con los valores de la calibración.
+
+        Returns:
+            Lista de dicts con nombre, filepath, header_dict, q_cabecera y peso
+        """
+        if not campanas:
+            campanas = [{'filepath': self.filepath, 'header_dict': self.header_dict}]
+
+        normalizadas = []
+        for campana in campanas:
+            if isinstance(campana, str):
+                campana = {'filepath': campana}
+            filepath = campana['filepath']
+            nombre = campana.get('nombre', os.path.basename(os.path.normpath(filepath)))
+            header_dict = {**self.header_dict, 'filedir': filepath,
+                           **campana.get('header_dict', {})}
+            normalizadas.append({
+                'nombre': nombre,
+                'filepath': filepath,
+                'header_dict': header_dict,
+                'q_cabecera': campana.get('q_cabecera', self.q_cabecera),
+                'peso': float(campana.get('peso', 1.0)),
+            })
+
+        rutas = [c['filepath'] for c in normalizadas]
+        if len(set(rutas)) != len(rutas):
+            raise ValueError("Cada campaña debe tener su propio directorio de plantilla")
+        return normalizadas
+
+    def _validar_campanas(self):
+        """Verifica que todas las campañas tengan los mismos tramos que la principal."""
+        for campana in self.campanas:
+            if campana['filepath'] == self.filepath:
+                continue
+            model = Q2KModel(campana['filepath'], campana['header_dict'])
+            model.cargar_plantillas(os.path.join(campana['filepath'], 'PlantillaBaseQ2K.xlsx'))
+            if len(model.data_reaches) != self.n_reaches:
+                raise ValueError(f"La campaña '{campana['nombre']}' tiene {len(model.data_reaches)} "
+                                 f"tramos; se esperaban {self.n_reaches}")
+
+    def _agregar_kge(self, kges: List[float]) -> float:
+        """Combina el KGE de cada campaña (en el orden de self.campanas) en un valor."""
+        if self.agregacion == 'minimo':
+            return float(min(kges))
+        pesos = [c['peso'] for c in self.campanas]
+        return float(np.dot(pesos, kges) / sum(pesos))
+
+    @staticmethod
+    def _normalizar_fidelidades(fidelidades: Optional[List[Dict[str, Any]]]
+                                ) -> List[Dict[str, Any]]:
+        """
+        Separa cada nivel de fidelidad en cambios del header y de la malla.
+
+        Returns:
+            Lista de dicts con nombre, header (claves de CLAVES_AJUSTE) y malla
+            (argumentos de configurar_modelo); el último es la fidelidad completa
+        """
+        niveles = []
+        for i, fidelidad in enumerate(fidelidades or []):
+            desconocidas = set(fidelidad) - set(CLAVES_AJUSTE) - set(CLAVES_MALLA) - {'nombre'}
+            if desconocidas:
+                raise KeyError(f"Claves de fidelidad no soportadas: {sorted(desconocidas)} "
+                               f"(use {list(CLAVES_AJUSTE + CLAVES_MALLA)})")
+            if fidelidad.get('IMeth', 'Euler') not in EVALUACIONES_METODO:
+                raise KeyError(f"Método de integración no soportado: {fidelidad['IMeth']}")
+            niveles.append({
+                'nombre': fidelidad.get('nombre', f'nivel {i + 1}'),
+                'header': {k: fidelidad[k] for k in CLAVES_AJUSTE if k in fidelidad},
+                'malla': {k: fidelidad[k] for k in CLAVES_MALLA if k in fidelidad},
+            })
+        niveles.append({'nombre': 'completa', 'header': {}, 'malla': {}})
+        return niveles
+
+    def _configurar_fidelidades(self, data_reaches: pd.DataFrame):
+        """
+        Expande numelem a una lista por tramo y calcula el costo de cada nivel.
+
+        El costo de una simulación es elementos × pasos de tiempo ×
+        evaluaciones por paso del método; se guarda relativo al de la
+        fidelidad completa.
+        """
+        costos = []
+        for fidelidad in self.fidelidades:
+            malla = fidelidad['malla']
+            if isinstance(malla.get('numelem'), (int, float)):
+                malla['numelem'] = [int(malla['numelem'])] * self.n_reaches
+            if 'numelem' in malla:
+                if len(malla['numelem']) != self.n_reaches:
+                    raise ValueError(f"numelem del nivel '{fidelidad['nombre']}' tiene "
+                                     f"{len(malla['numelem'])} valores para {self.n_reaches} tramos")
+                ne = sum(malla['numelem'])
+            else:
+                # 10 = numelem_default de configurar_modelo, usado por los workers
+                ne = sum(elementos_por_tramo(data_reaches, 10, malla.get('longitud_elemento')))
+            header = {**self.header_dict, **fidelidad['header']}
+            costos.append(ne * float(header['tf']) / float(header['dtuser'])
+                          * EVALUACIONES_METODO.get(header.get('IMeth'), 1))
+        self._costos_nivel = [c / costos[-1] for c in costos]
+        self.nivel_fidelidad = 0
+
     def _configurar_genes(self):
         """Configura el espacio de genes y el mapeo de parámetros."""
         self.gene_space = []
@@ -231,36 +589,66 @@ class Calibracion:
         return params
 
     @staticmethod
-    def _evaluar_solucion_worker(args: Tuple) -> Tuple[int, float]:
+    def argumentos_worker(solution, eval_id: int, filepath: str, header_dict: Dict[str, Any],
+                          param_map: List[Tuple[str, Optional[int]]], n_reaches: int,
+                          q_cabecera: float = 1.06007E-06,
+                          workspace_root: Optional[str] = None,
+                          devolver_perfil: bool = False,
+                          pesos: Optional[Dict[str, float]] = None,
+                          malla: Optional[Dict[str, Any]] = None) -> Tuple:
+        """
+        Arma la tupla de argumentos de _evaluar_solucion_worker.
+
+        Los scripts que publican evaluaciones en un Q2KBroker deben usar este
+        método en lugar de escribir la tupla a mano.
+
+        Args:
+            solution: Valores de los genes
+            eval_id: Identificador de la evaluación
+            filepath: Directorio de la plantilla
+            header_dict: Diccionario con configuración del header
+            param_map: (parámetro, índice de tramo o None si es global) de cada gen
+            n_reaches: Número de tramos
+            q_cabecera: Caudal de cabecera
+            workspace_root: Raíz de los workspaces (None = automática)
+            devolver_perfil: Si devolver el perfil longitudinal
+            pesos: Pesos del KGE global (None = PESOS_DEFAULT)
+            malla: Argumentos de malla de configurar_modelo (numelem o
+                   longitud_elemento; None = malla por defecto)
+
+        Returns:
+            Tupla de argumentos
+        """
+        return (solution, eval_id, filepath, header_dict, param_map, n_reaches,
+                q_cabecera, workspace_root, devolver_perfil, pesos, malla or {})
+
+    @staticmethod
+    def _evaluar_solucion_worker(args: Tuple) -> Tuple[int, float, Optional[pd.DataFrame]]:
         """
         Evalúa una solución en un worker paralelo.
         Esta función debe ser estática para ser serializable.
+
+        Returns:
+            Tupla (eval_id, kge_global, perfil); perfil es None salvo que se
+            solicite devolver el perfil longitudinal
         """
-        solution, eval_id, filepath, header_dict, param_map, n_reaches, q_cabecera = args
+        (solution, eval_id, filepath, header_dict, param_map, n_reaches,
+         q_cabecera, workspace_root, devolver_perfil, pesos, malla) = args
 
-        temp_dir = tempfile.mkdtemp(prefix=f'q2k_eval_{eval_id}_')
+        # Workspace aislado (en RAM cuando es posible) con el ejecutable enlazado
+        temp_dir = ws.crear_workspace(filepath, workspace_root,
+                                      prefijo=f'q2k_eval_{eval_id}_')
 
         try:
-            # Copiar plantilla y archivos necesarios
+            # La plantilla se lee directamente desde el directorio original
             plantilla_origen = os.path.join(filepath, 'PlantillaBaseQ2K.xlsx')
-            plantilla_destino = os.path.join(temp_dir, 'PlantillaBaseQ2K.xlsx')
-            shutil.copy2(plantilla_origen, plantilla_destino)
-
-            for archivo in glob.glob(os.path.join(filepath, '*')):
-                if os.path.isfile(archivo):
-                    nombre = os.path.basename(archivo)
-                    if not any(nombre.endswith(ext) for ext in ['.out', '.txt', '.dat', '.q2k']):
-                        try:
-                            shutil.copy2(archivo, os.path.join(temp_dir, nombre))
-                        except:
-                            pass
 
             # Configurar y ejecutar modelo
             header_dict_temp = header_dict.copy()
             header_dict_temp['filedir'] = temp_dir
 
             model = Q2KModel(temp_dir, header_dict_temp)
-            model.cargar_plantillas(plantilla_destino)
+            model.cargar_plantillas(plantilla_origen)
 
             # Decodificar parámetros
             params = {
@@ -295,49 +683,179 @@ class Calibracion:
                 kdt_list=params['kdt']
             )
 
-            model.configurar_modelo(reach_rates_custom=reach_rates_custom, q_cabecera=q_cabecera)
+            model.configurar_modelo(reach_rates_custom=reach_rates_custom, q_cabecera=q_cabecera,
+                                    **malla)
             model.generar_archivo_q2k()
             model.ejecutar_simulacion()
             model.analizar_resultados(generar_graficas=False)
-            resultados, kge_global = model.calcular_metricas_calibracion(pesos = {
-                "water_temp_c": 0.05,
-                "conductivity": 0.05,
-                "nitrate": 0.05,
-                "pathogen": 0.10,
-                "pH": 0.05,
-                "total_suspended_solids": 0.05,
-                "dissolved_oxygen": 0.30,
-                "carbonaceous_bod_fast": 0.30,
-                "total_kjeldahl_nitrogen": 0.02,
-                "ammonium": 0.02,
-                "total_phosphorus": 0.01
-            })
+            resultados, kge_global = model.calcular_metricas_calibracion(pesos=pesos)
 
-            return (eval_id, kge_global)
+            perfil = model.wq_data_model if devolver_perfil else None
+            return (eval_id, kge_global, perfil)
 
         except Exception as e:
             print(f'Error en evaluación {eval_id}: {e}')
-            return (eval_id, -999)
+            return (eval_id, -999, None)
 
         finally:
-            try:
-                shutil.rmtree(temp_dir)
-            except:
-                pass
+            ws.eliminar_workspace(temp_dir)
 
-    def _fitness_function(self, ga, solution, solution_idx):
-        """Función de fitness para el algoritmo genético."""
-        self.contador_evaluaciones += 1
-        eval_id = self.contador_evaluaciones
+    def _nombres_genes(self) -> List[str]:
+        """Nombres legibles de cada gen (parámetro global o parámetro_tramo)."""
+        return [nombre if tramo is None else f'{nombre}_{tramo + 1}'
+                for nombre, tramo in self.param_map]
 
-        args = (solution, eval_id, self.filepath, self.header_dict,
-                self.param_map, self.n_reaches, self.q_cabecera)
+    def _guardar_en_store(self, eval_id: int, solution, kge: float,
+                          perfil: pd.DataFrame, campana: Optional[int] = None) -> None:
+        """
+        Guarda el perfil y el vector de parámetros de una evaluación.
+
+        El almacén asigna el run_id (continúa los ya guardados, de modo que
+        varias calibraciones pueden compartirlo); eval_id se guarda como una
+        columna más, y con varias campañas también la columna campana.
+        """
+        parametros = dict(zip(self._nombres_genes(), map(float, solution)))
+        parametros['kge_global'] = kge
+        parametros['eval_id'] = eval_id
+        if len(self.fidelidades) > 1:
+            parametros['fidelidad'] = self.nivel_fidelidad
+        if campana is not None:
+            parametros['campana'] = campana
+        self.store.agregar(perfil, parametros)
+
+    def _alinear_semilla(self, valores: Dict[str, float]) -> np.ndarray:
+        """
+        Ordena una solución {gen: valor} según los genes actuales.
+
+        Si un parámetro cambió de global a por tramo (o al revés) se replica el
+        valor global o se promedian los valores por tramo. Los genes sin valor
+        quedan como NaN.
+        """
+        fila = np.full(len(self.param_map), np.nan)
+        for i, (nombre, gen) in enumerate(zip(self._nombres_genes(), self.param_map)):
+            param_name, tramo = gen
+            if nombre in valores:
+                fila[i] = valores[nombre]
+            elif tramo is not None and param_name in valores:
+                fila[i] = valores[param_name]
+            elif tramo is None:
+                por_tramo = [v for k, v in valores.items()
+                             if re.fullmatch(rf'{re.escape(param_name)}_\d+', k)]
+                if por_tramo:
+                    fila[i] = np.mean(por_tramo)
+        return fila
+
+    def _cargar_semillas(self) -> np.ndarray:
+        """
+        Lee las soluciones de la calibración anterior (mejor primero).
 
-        if self.usar_paralelo and self.pool is not None:
-            resultado = self.pool.apply_async(self._evaluar_solucion_worker, (args,))
-            eval_id_result, kge = resultado.get(timeout=300)
+        Returns:
+            Array (n_semillas, n_genes) con NaN en los genes sin valor previo
+        """
+        ruta = os.path.join(self.filepath, self.semilla)
+        if ruta.endswith('.json'):
+            soluciones = leer_checkpoint(ruta)
         else:
-            eval_id_result, kge = self._evaluar_solucion_worker(args)
+            soluciones = [leer_parametros_calibrados(ruta)]
+        return np.array([self._alinear_semilla(s) for s in soluciones])
+
+    def _reducir_gene_space(self, mejor: np.ndarray):
+        """Acota cada gen alrededor de la mejor semilla (ver reducir_espacio)."""
+        for i, espacio in enumerate(self.gene_space):
+            if np.isnan(mejor[i]):
+                continue
+            medio_ancho = self.reducir_espacio * (espacio['high'] - espacio['low']) / 2
+            self.gene_space[i] = {
+                'low': max(espacio['low'], mejor[i] - medio_ancho),
+                'high': min(espacio['high'], mejor[i] + medio_ancho),
+            }
+
+    def _poblacion_inicial(self, semillas: np.ndarray) -> np.ndarray:
+        """
+        Construye la población inicial a partir de las semillas.
+
+        Las mejores semillas se copian sin cambios (hasta keep_elitism), luego
+        se agregan copias perturbadas hasta fraccion_semilla de la población y
+        el resto se muestrea uniforme en gene_space.
+
+        Args:
+            semillas: Array (n_semillas, n_genes), mejor primero
+
+        Returns:
+            Array (population_size, n_genes)
+        """
+        rng = np.random.default_rng(self.random_seed)
+        low = np.array([g['low'] for g in self.gene_space])
+        high = np.array([g['high'] for g in self.gene_space])
+        n_genes = len(self.gene_space)
+
+        poblacion = rng.uniform(low, high, size=(self.population_size, n_genes))
+        n_semilla = min(self.population_size,
+                        max(1, int(round(self.fraccion_semilla * self.population_size))))
+        n_exactas = min(len(semillas), max(1, self.keep_elitism), n_semilla)
+
+        for i in range(n_semilla):
+            base = semillas[i % len(semillas)]
+            if i >= n_exactas:
+                base = base + rng.normal(0, self.perturbacion * (high - low))
+            poblacion[i] = np.where(np.isnan(base), poblacion[i], np.clip(base, low, high))
+
+        return poblacion
+
+    def _guardar_checkpoint(self, ga):
+        """Guarda la población actual ordenada por fitness (para arranque en caliente)."""
+        orden = np.argsort(ga.last_generation_fitness)[::-1]
+        checkpoint = {
+            'generacion': ga.generations_completed,
+            'mejor_kge': self.mejor_kge,
+            'nombres_genes': self._nombres_genes(),
+            'gene_space': self.gene_space,
+            'fitness': [float(ga.last_generation_fitness[i]) for i in orden],
+            'poblacion': [[float(v) for v in ga.population[i]] for i in orden],
+        }
+        escribir_atomico(os.path.join(self.filepath, 'checkpoint_calibracion.json'),
+                         json.dumps(checkpoint, indent=1))
+
+    def _argumentos_evaluacion(self, solution) -> List[Tuple]:
+        """
+        Asigna un eval_id y arma los argumentos del worker para una solución
+        en el nivel de fidelidad actual.
+
+        Returns:
+            Una tupla de argumentos por campaña, en el orden de self.campanas
+        """
+        self.contador_evaluaciones += 1
+        fidelidad = self.fidelidades[self.nivel_fidelidad]
+        self._evaluaciones_nivel[self.nivel_fidelidad] += len(self.campanas)
+        return [self.argumentos_worker(solution, self.contador_evaluaciones, c['filepath'],
+                                       {**c['header_dict'], **fidelidad['header']},
+                                       self.param_map, self.n_reaches, c['q_cabecera'],
+                                       self.workspace_root, self.store is not None,
+                                       self.pesos, fidelidad['malla'])
+                for c in self.campanas]
+
+    def _registrar_tarea(self, args: Tuple, resultado: Tuple) -> None:
+        """
+        Registra el resultado de una campaña; al completarse todas las campañas
+        de la solución registra el KGE agregado.
+        """
+        eval_id, kge, perfil = resultado
+        campana = self._indice_campana[args[2]]
+        if self.store is not None and perfil is not None:
+            self._guardar_en_store(eval_id, args[0], kge, perfil,
+                                   campana if len(self.campanas) > 1 else None)
+
+        parciales = self._parciales.setdefault(eval_id, [None] * len(self.campanas))
+        parciales[campana] = kge
+        if all(k is not None for k in parciales):
+            del self._parciales[eval_id]
+            self._registrar_resultado(eval_id, args[0], self._agregar_kge(parciales), None)
+
+    def _registrar_resultado(self, eval_id: int, solution, kge: float,
+                             perfil: Optional[pd.DataFrame]) -> None:
+        """Guarda el perfil (si aplica) e informa el avance de una evaluación."""
+        if self.store is not None and perfil is not None:
+            self._guardar_en_store(eval_id, solution, kge, perfil)
 
         if kge > self.mejor_kge:
             self.mejor_kge = kge
@@ -345,15 +863,244 @@ class Calibracion:
         elif eval_id % 5 == 0:
             print(f"Eval {eval_id} | KGE: {kge:.4f}")
 
-        return kge
+    def _fitness_function(self, ga, solution, solution_idx):
+        """Función de fitness para el algoritmo genético (una solución, en serie)."""
+        kges = []
+        for args in self._argumentos_evaluacion(solution):
+            resultado = self._evaluar_solucion_worker(args)
+            self._registrar_tarea(args, resultado)
+            kges.append(resultado[1])
+        return self._agregar_kge(kges)
+
+    def _evaluar_lote(self, lista_args: List[Tuple], concurrencia: int) -> List[Tuple]:
+        """
+        Evalúa un lote en el pool con a lo sumo `concurrencia` evaluaciones en curso.
+
+        Args:
+            lista_args: Argumentos de _evaluar_solucion_worker de cada
+                        solución y campaña
+            concurrencia: Máximo de evaluaciones simultáneas
+
+        Returns:
+            Resultados (eval_id, kge, perfil) en el orden de lista_args
+        """
+        terminados = queue.Queue()
+        resultados = [None] * len(lista_args)
+        siguiente = 0
+        en_curso = 0
+
+        while siguiente < len(lista_args) or en_curso:
+            while en_curso < concurrencia and siguiente < len(lista_args):
+                i = siguiente
+                self.pool.apply_async(
+                    self._evaluar_solucion_worker, (lista_args[i],),
+                    callback=lambda r, i=i: terminados.put((i, r)),
+                    error_callback=lambda e, i=i: terminados.put(
+                        (i, (lista_args[i][1], -999, None)))
+                )
+                siguiente += 1
+                en_curso += 1
+
+            try:
+                i, resultado = terminados.get(timeout=TIMEOUT_EVALUACION)
+            except queue.Empty:
+                raise TimeoutError(f"Ninguna evaluación terminó en {TIMEOUT_EVALUACION} s")
+            resultados[i] = resultado
+            en_curso -= 1
+            self._registrar_tarea(lista_args[i], resultado)
+
+        return resultados
+
+    def _medir_concurrencia(self, lista_args: List[Tuple]) -> List[Tuple]:
+        """
+        Evalúa el lote midiendo el rendimiento de varios niveles de concurrencia.
+
+        La primera ronda (una tarea por worker) no se mide: incluye el arranque
+        de los procesos del pool y la primera lectura de la plantilla. Luego
+        cada nivel, del mayor (num_workers, o el lote si es menor) al menor,
+        evalúa min(2 × nivel, lote) tareas; los niveles que no caben en lo que
+        queda del lote se miden en la siguiente generación. Medidos todos, la
+        concurrencia de mejor rendimiento queda en self.concurrencia; mientras
+        tanto el resto del lote se evalúa con num_workers.
+
+        Returns:
+            Resultados en el orden de lista_args
+        """
+        resultados = []
+        if not self._pool_calentado:
+            n = min(self.num_workers, len(lista_args))
+            resultados += self._evaluar_lote(lista_args[:n], n)
+            self._pool_calentado = True
+
+        if self._niveles_pendientes is None:
+            self._niveles_pendientes = recursos.niveles_concurrencia(
+                min(self.num_workers, len(lista_args)))
+
+        while self._niveles_pendientes:
+            nivel = self._niveles_pendientes[-1]
+            n = min(2 * nivel, len(lista_args))
+            tramo = lista_args[len(resultados):len(resultados) + n]
+            if len(tramo) < n:
+                break
+            inicio = time.perf_counter()
+            resultados += self._evaluar_lote(tramo, nivel)
+            self.rendimientos[nivel] = len(tramo) / (time.perf_counter() - inicio)
+            self._niveles_pendientes.pop()
+
+        if not self._niveles_pendientes:
+            self.concurrencia = recursos.elegir_concurrencia(self.rendimientos)
+            detalle = ', '.join(f'{n}: {r:.2f}/s' for n, r in sorted(self.rendimientos.items()))
+            print(f'\nRendimiento por concurrencia ({detalle}) → {self.concurrencia} workers\n')
+
+        return resultados + self._evaluar_lote(lista_args[len(resultados):], self.concurrencia)
+
+    def _en_lotes(self) -> bool:
+        """Indica si la fitness se evalúa por lotes (pool paralelo o broker)."""
+        return self._broker is not None or (self.usar_paralelo and self.pool is not None)
+
+    def _fitness_lote(self, ga, soluciones, indices):
+        """
+        Función de fitness por lotes: evalúa las soluciones en paralelo (pool o broker).
+
+        Cada solución se evalúa en todas las campañas a la vez (una tarea por
+        campaña) y su fitness es el KGE agregado.
+        """
+        lista_args = [args for sol in soluciones for args in self._argumentos_evaluacion(sol)]
+
+        if self._broker is not None:
+            resultados = self._broker.evaluar(
+                lista_args,
+                callback=lambda i, r: self._registrar_tarea(lista_args[i], r)
+            )
+        elif self.concurrencia_adaptativa and self._niveles_pendientes != []:
+            resultados = self._medir_concurrencia(lista_args)
+        else:
+            resultados = self._evaluar_lote(lista_args, self.concurrencia)
+
+        kges = np.array([kge for _, kge, _ in resultados]).reshape(len(soluciones), -1)
+        return [self._agregar_kge(fila) for fila in kges]
+
+    def _evaluar_soluciones(self, ga, soluciones) -> np.ndarray:
+        """Evalúa soluciones fuera del ciclo del GA (en lote o en serie)."""
+        if self._en_lotes():
+            return np.array(self._fitness_lote(ga, soluciones, None))
+        return np.array([self._fitness_function(ga, sol, None) for sol in soluciones])
+
+    def _reevaluar_aproximadas(self, ga) -> None:
+        """
+        Reevalúa las soluciones cuyo fitness viene corregido de un nivel anterior.
+
+        pygad reutiliza el fitness de élites y padres que pasan a la siguiente
+        generación; los que sobrevivieron a un cambio de fidelidad sin ser
+        reevaluados se evalúan aquí, así toda la población queda en el nivel actual.
+        """
+        indices = [i for i, sol in enumerate(ga.population)
+                   if tuple(sol) in self._fitness_aproximado]
+        self._fitness_aproximado = set()
+        if indices:
+            ga.last_generation_fitness[indices] = self._evaluar_soluciones(
+                ga, ga.population[indices])
+
+    def _debe_cambiar_fidelidad(self, ga) -> bool:
+        """
+        Indica si la población convergió en el nivel actual: rango intercuartil
+        del fitness bajo umbral_fidelidad, paciencia_fidelidad generaciones sin
+        mejora o max_generaciones_fidelidad generaciones en el nivel.
+        """
+        if self.nivel_fidelidad == len(self.fidelidades) - 1:
+            return False
+
+        gen = ga.generations_completed
+        fitness = ga.last_generation_fitness
+        validos = fitness[fitness > -999]
+        if validos.size and validos.max() > self._mejor_nivel + MEJORA_MINIMA_FIDELIDAD:
+            self._mejor_nivel = validos.max()
+            self._generacion_mejora = gen
+
+        dispersion = (np.percentile(validos, 75) - np.percentile(validos, 25)
+                      if validos.size else np.inf)
+        return (dispersion < self.umbral_fidelidad
+                or gen - self._generacion_mejora >= self.paciencia_fidelidad
+                or gen - self._inicio_nivel >= self.max_generaciones_fidelidad)
+
+    def _cambiar_fidelidad(self, ga, todas: bool = False) -> None:
+        """
+        Pasa al siguiente nivel de fidelidad reevaluando la élite.
+
+        Las keep_elitism mejores soluciones (toda la población si todas=True)
+        se evalúan en el nuevo nivel. El fitness del resto se desplaza por la
+        diferencia mediana observada en la élite para que la selección compare
+        valores en la misma escala; esas soluciones se reevalúan si sobreviven
+        a la siguiente generación (ver _reevaluar_aproximadas).
+        """
+        self.nivel_fidelidad += 1
+        fidelidad = self.fidelidades[self.nivel_fidelidad]
+        fitness = ga.last_generation_fitness
+        orden = np.argsort(fitness)[::-1]
+        elite = orden if todas else orden[:max(1, self.keep_elitism)]
+        resto = orden[len(elite):]
+
+        print(f'\n{"=" * 60}')
+        print(f'CAMBIO DE FIDELIDAD → {fidelidad["nombre"]} '
+              f'(costo ×{self._costos_nivel[self.nivel_fidelidad]:.3f} de la completa)')
+        print(f'Reevaluando {len(elite)} soluciones de la {"población" if todas else "élite"}')
+        print("=" * 60 + '\n')
+
+        anteriores = fitness[elite].copy()
+        self.mejor_kge = -999.0
+        nuevos = self._evaluar_soluciones(ga, ga.population[elite])
+        fitness[elite] = nuevos
+
+        validos = (anteriores > -999) & (nuevos > -999)
+        desplazamiento = float(np.median(nuevos[validos] - anteriores[validos])) if validos.any() else 0.0
+        if len(resto):
+            fitness[resto] = np.where(fitness[resto] > -999, fitness[resto] + desplazamiento, -999)
+            self._fitness_aproximado = {tuple(ga.population[i]) for i in resto}
+
+        self.cambios_fidelidad.append({
+            'generacion': ga.generations_completed,
+            'nivel': self.nivel_fidelidad,
+            'nombre': fidelidad['nombre'],
+            'reevaluadas': len(elite),
+            'desplazamiento': desplazamiento,
+            'mejor_kge': float(nuevos.max()),
+        })
+        self._inicio_nivel = self._generacion_mejora = ga.generations_completed
+        self._mejor_nivel = -np.inf
+
+    def _resumir_costo(self) -> Dict[str, Any]:
+        """
+        Costo del solucionador de la calibración por nivel de fidelidad.
+
+        Returns:
+            Diccionario con simulaciones y costo relativo por nivel y
+            costo_relativo total (1 = todas las simulaciones en fidelidad completa)
+        """
+        por_nivel = [{'nombre': f['nombre'], 'simulaciones': n, 'costo_relativo': c}
+                     for f, n, c in zip(self.fidelidades, self._evaluaciones_nivel,
+                                        self._costos_nivel)]
+        total = sum(self._evaluaciones_nivel)
+        costo = sum(n * c for n, c in zip(self._evaluaciones_nivel, self._costos_nivel))
+        return {
+            'por_nivel': por_nivel,
+            'cambios': self.cambios_fidelidad,
+            'costo_relativo': costo / total if total else np.nan,
+        }
 
     def _on_generation(self, ga):
         """Callback ejecutado al completar cada generación."""
         gen = ga.generations_completed
 
+        # Fidelidad: completar la reevaluación del último cambio y decidir el siguiente
+        if len(self.fidelidades) > 1:
+            if self._fitness_aproximado:
+                self._reevaluar_aproximadas(ga)
+            if self._debe_cambiar_fidelidad(ga):
+                self._cambiar_fidelidad(ga)
+
         # Obtener estadísticas de la población actual
         population_fitness = ga.last_generation_fitness
-        best_solution, best_fitness, _ = ga.best_solution()
+        best_solution, best_fitness, _ = ga.best_solution(pop_fitness=population_fitness)
 
         # Calcular estadísticas
         stats = {
@@ -367,6 +1114,7 @@ class Calibracion:
             'max': np.max(population_fitness),
             'q25': np.percentile(population_fitness, 25),
             'q75': np.percentile(population_fitness, 75),
+            'fidelidad': self.nivel_fidelidad,
         }
 
         # Guardar historial
@@ -375,11 +1123,16 @@ class Calibracion:
 
         print(f'\n{"=" * 60}')
         print(f'GENERACIÓN {gen} COMPLETADA')
+        if len(self.fidelidades) > 1:
+            print(f'Fidelidad: {self.fidelidades[self.nivel_fidelidad]["nombre"]}')
         print(f'Mejor KGE de esta generación: {best_fitness:.4f}')
         print(f'Promedio poblacional: {stats["promedio"]:.4f} ± {stats["std"]:.4f}')
         print(f'Mejor KGE global: {self.mejor_kge:.4f}')
         print("=" * 60 + '\n')
 
+        if self.guardar_checkpoint:
+            self._guardar_checkpoint(ga)
+
     def plotear_evolucion_fitness(
             self,
             filename: str = 'evolucion_fitness.png',
@@ -402,6 +1155,8 @@ class Calibracion:
             print("No hay datos de calibración disponibles para graficar.")
             return
 
+        plt, GridSpec = _importar_graficos()
+
         # Convertir historial a DataFrame
         df = pd.DataFrame(self.historial_generaciones)
 
@@ -607,6 +1362,8 @@ class Calibracion:
             print("No hay datos de calibración disponibles para graficar.")
             return
 
+        plt, _ = _importar_graficos()
+
         df = pd.DataFrame(self.historial_generaciones)
 
         # Crear figura simple
@@ -683,11 +1440,32 @@ class Calibracion:
         print('CALIBRACIÓN AUTOMÁTICA DE QUAL2K CON ALGORITMO GENÉTICO')
         print('=' * 80)
         print(f'\nNúmero de reaches: {self.n_reaches}')
-        print(f'Modo: {"PARALELO" if self.usar_paralelo else "SERIAL"}')
-        if self.usar_paralelo:
-            print(f'Workers: {self.num_workers}')
+        if len(self.campanas) > 1:
+            print(f'Campañas: {", ".join(c["nombre"] for c in self.campanas)} '
+                  f'(KGE agregado: {self.agregacion})')
+        print(f'Modo: {"DISTRIBUIDO" if self.broker else "PARALELO" if self.usar_paralelo else "SERIAL"}')
+        if self.broker:
+            print(f'Broker: {self.broker} (workers locales: {self.workers_locales})')
+        elif self.usar_paralelo:
+            print(f'Workers: {self.num_workers} (CPUs disponibles: {recursos.cpus_disponibles()}'
+                  f'{", fijados a CPU" if self.fijar_cpu else ""})')
+            if self.concurrencia_adaptativa:
+                print('Concurrencia: ajustada según el rendimiento de las primeras generaciones')
+        print(f'Workspaces: {self.workspace_root}')
+        if len(self.fidelidades) > 1:
+            niveles = ', '.join(f'{f["nombre"]} (×{c:.3f})'
+                                for f, c in zip(self.fidelidades, self._costos_nivel))
+            print(f'Multi-fidelidad: {niveles}')
+            print(f'  Cambio de nivel: rango intercuartil < {self.umbral_fidelidad}, '
+                  f'{self.paciencia_fidelidad} generaciones sin mejora o '
+                  f'{self.max_generaciones_fidelidad} generaciones en el nivel')
         if self.random_seed is not None:
             print(f'Semilla aleatoria: {self.random_seed}')
+        if self.semilla:
+            print(f'Arranque en caliente: {self.semilla} '
+                  f'(perturbación {self.perturbacion}, fracción {self.fraccion_semilla})')
+            if self.reducir_espacio:
+                print(f'Espacio de genes reducido a ±{self.reducir_espacio / 2:.0%} del rango')
 
         print(f'\n{"=" * 80}')
         print('CONFIGURACIÓN DE PARÁMETROS A CALIBRAR')
@@ -747,9 +1525,12 @@ class Calibracion:
         print(f'\nMejor KGE encontrado: {solution_fitness:.4f}')
         print(f'Total de evaluaciones: {self.contador_evaluaciones}')
         print(f'Generaciones completadas: {len(self.historial_generaciones)}')
-
-        print(f'\n{"=" * 80}')
-        print('PARÁMETROS ÓPTIMOS')
+        if self.costo_calibracion:
+            for nivel in self.costo_calibracion['por_nivel']:
+                print(f'  {nivel["nombre"]}: {nivel["simulaciones"]} simulaciones '
+                      f'(costo ×{nivel["costo_relativo"]:.3f})')
+            print(f'Costo del solucionador: ×{self.costo_calibracion["costo_relativo"]:.3f} '
+                  f'del de una calibración en fidelidad completa')
         print('=' * 80)
 
         gene_idx = 0
@@ -779,10 +1560,22 @@ class Calibracion:
             f.write('RESULTADOS GENERALES:\n')
             f.write('-' * 80 + '\n')
             f.write(f'KGE Final: {kge_final:.6f}\n')
+            if len(self.campanas) > 1:
+                f.write(f'Agregación de campañas: {self.agregacion}\n')
+                for nombre, kge in self.kge_por_campana.items():
+                    f.write(f'  KGE {nombre}: {kge:.6f}\n')
             f.write(f'Total de evaluaciones: {self.contador_evaluaciones}\n')
             f.write(f'Generaciones completadas: {len(self.historial_generaciones)}\n')
             if self.random_seed is not None:
                 f.write(f'Semilla aleatoria: {self.random_seed}\n')
+            if self.costo_calibracion:
+                f.write(f'Costo del solucionador (relativo a fidelidad completa): '
+                        f'{self.costo_calibracion["costo_relativo"]:.4f}\n')
+                for nivel in self.costo_calibracion['por_nivel']:
+                    f.write(f'  Fidelidad {nivel["nombre"]}: {nivel["simulaciones"]} simulaciones, '
+                            f'costo ×{nivel["costo_relativo"]:.4f}\n')
+                for cambio in self.costo_calibracion['cambios']:
+                    f.write(f'  Cambio a {cambio["nombre"]} en la generación {cambio["generacion"]}\n')
             f.write('\n')
 
             # Configuración del GA
@@ -832,13 +1625,33 @@ class Calibracion:
         print(f'\nResultados guardados en: {output_file}')
 
     def _simular_con_mejor_solucion(self, solution):
-        """Ejecuta una simulación final con los parámetros óptimos."""
+        """
+        Ejecuta una simulación final con los parámetros óptimos en cada campaña.
+
+        Returns:
+            KGE agregado de las campañas (el KGE de cada una queda en
+            self.kge_por_campana)
+        """
         print('\n' + '=' * 80)
         print('SIMULACIÓN FINAL CON PARÁMETROS ÓPTIMOS')
         print('=' * 80)
 
-        model_final = Q2KModel(self.filepath, self.header_dict)
-        plantilla = os.path.join(self.filepath, 'PlantillaBaseQ2K.xlsx')
+        self.kge_por_campana = {}
+        for campana in self.campanas:
+            self.kge_por_campana[campana['nombre']] = self._simular_campana(solution, campana)
+
+        kge_final = self._agregar_kge(list(self.kge_por_campana.values()))
+        if len(self.campanas) > 1:
+            for nombre, kge in self.kge_por_campana.items():
+                print(f'  {nombre}: KGE {kge:.4f}')
+            print(f'\nKGE agregado ({self.agregacion}) verificado: {kge_final:.4f}')
+
+        return kge_final
+
+    def _simular_campana(self, solution, campana: Dict[str, Any]) -> float:
+        """Simula una campaña con los parámetros óptimos y guarda sus resultados y gráficas."""
+        model_final = Q2KModel(campana['filepath'], campana['header_dict'])
+        plantilla = os.path.join(campana['filepath'], 'PlantillaBaseQ2K.xlsx')
         model_final.cargar_plantillas(plantilla)
 
         params_final = self._decodificar_solucion(solution)
@@ -856,23 +1669,12 @@ class Calibracion:
             kdt_list=params_final['kdt']
         )
 
-        model_final.configurar_modelo(reach_rates_custom=reach_rates_final, q_cabecera=self.q_cabecera)
+        model_final.configurar_modelo(reach_rates_custom=reach_rates_final,
+                                      q_cabecera=campana['q_cabecera'])
         model_final.generar_archivo_q2k()
         model_final.ejecutar_simulacion()
         model_final.analizar_resultados(generar_graficas=True)
-        resultados_final, kge_final = model_final.calcular_metricas_calibracion(pesos = {
-                "water_temp_c": 0.05,
-                "conductivity": 0.05,
-                "nitrate": 0.05,
-                "pathogen": 0.10,
-                "pH": 0.05,
-                "total_suspended_solids": 0.05,
-                "dissolved_oxygen": 0.30,
-                "carbonaceous_bod_fast": 0.30,
-                "total_kjeldahl_nitrogen": 0.02,
-                "ammonium": 0.02,
-                "total_phosphorus": 0.01
-            })
+        resultados_final, kge_final = model_final.calcular_metricas_calibracion(pesos=self.pesos)
 
         print(f'\nKGE final verificado: {kge_final:.4f}')
 
@@ -891,20 +1693,44 @@ class Calibracion:
         # Inicializar
         model_temp = self._inicializar_modelo()
         self.n_reaches = len(model_temp.data_reaches)
+        self._validar_campanas()
+        self._configurar_fidelidades(model_temp.data_reaches)
         num_genes = self._configurar_genes()
 
+        # Arranque en caliente desde una calibración anterior
+        poblacion_inicial = None
+        if self.semilla:
+            semillas = self._cargar_semillas()
+            if self.reducir_espacio:
+                self._reducir_gene_space(semillas[0])
+            poblacion_inicial = self._poblacion_inicial(semillas)
+
         self._imprimir_configuracion(num_genes)
 
-        # Crear pool de workers
-        if self.usar_paralelo:
-            self.pool = mp.Pool(processes=self.num_workers)
+        # Crear pool de workers (o broker para workers remotos)
+        if self.broker:
+            from qual2k.core.distribuido import Q2KBroker
+            from qual2k.processing.plantilla_cache import sha256_archivo
+            sha = sha256_archivo(os.path.join(self.filepath, 'PlantillaBaseQ2K.xlsx'))
+            self._broker = Q2KBroker(self.broker, self.authkey,
+                                     info={'sha256_plantilla': sha}).iniciar()
+            if self.workers_locales:
+                self._broker.iniciar_workers_locales(self.filepath, self.workers_locales,
+                                                     self.workspace_root)
+        elif self.usar_paralelo:
+            if self.fijar_cpu:
+                self.pool = mp.Pool(processes=self.num_workers,
+                                    initializer=recursos.inicializar_worker_fijado,
+                                    initargs=(mp.Value('i', 0), recursos.cpus_afinidad()))
+            else:
+                self.pool = mp.Pool(processes=self.num_workers)
             print(f'\nPool de {self.num_workers} workers creado')
 
         # Construir argumentos del GA
         ga_kwargs = {
             'num_generations': self.num_generations,
             'num_parents_mating': self.num_parents_mating,
-            'fitness_func': self._fitness_function,
+            'fitness_func': self._fitness_lote if self._en_lotes() else self._fitness_function,
             'sol_per_pop': self.population_size,
             'num_genes': num_genes,
             'gene_space': self.gene_space,
@@ -936,7 +1762,14 @@ class Calibracion:
         if self.random_seed is not None:
             ga_kwargs['random_seed'] = self.random_seed
 
-        # Configurar algoritmo genético
+        if poblacion_inicial is not None:
+            ga_kwargs['initial_population'] = poblacion_inicial
+
+        if self._en_lotes():
+            ga_kwargs['fitness_batch_size'] = self.fitness_batch_size or self.population_size
+
+        # Configurar algoritmo genético (pygad se importa solo al calibrar)
+        import pygad
         self.ga_instance = pygad.GA(**ga_kwargs)
 
         # Ejecutar calibración
@@ -947,8 +1780,18 @@ class Calibracion:
         try:
             self.ga_instance.run()
 
+            # La mejor solución se elige con todo el fitness en fidelidad completa
+            if len(self.fidelidades) > 1:
+                if self._fitness_aproximado:
+                    self._reevaluar_aproximadas(self.ga_instance)
+                if self.nivel_fidelidad < len(self.fidelidades) - 1:
+                    self.nivel_fidelidad = len(self.fidelidades) - 2
+                    self._cambiar_fidelidad(self.ga_instance, todas=True)
+                self.costo_calibracion = self._resumir_costo()
+
             # Obtener mejor solución
-            solution, solution_fitness, solution_idx = self.ga_instance.best_solution()
+            solution, solution_fitness, solution_idx = self.ga_instance.best_solution(
+                pop_fitness=self.ga_instance.last_generation_fitness)
             self.mejor_solucion = solution
 
             self._imprimir_resultados(solution, solution_fitness)
@@ -966,6 +1809,14 @@ class Calibracion:
                 self.pool.join()
                 print('Pool cerrado correctamente')
 
+            if self._broker is not None:
+                print(f'\nCerrando broker ({self._broker.estado()})...')
+                self._broker.cerrar()
+                self._broker = None
+
+            if self.store is not None:
+                self.store.flush()
+
         # Simulación final
         if solution is not None:
             kge_final = self._simular_con_mejor_solucion(solution)
@@ -1043,7 +1894,20 @@ class Calibracion:
             f.write('OTROS:\n')
             f.write(f'  random_seed = {self.random_seed}\n')
             f.write(f'  allow_duplicate_genes = {self.allow_duplicate_genes}\n')
-            f.write(f'  stop_criteria = {self.stop_criteria}\n')
+            f.write(f'  stop_criteria = {self.stop_criteria}\n\n')
+
+            f.write('ARRANQUE EN CALIENTE:\n')
+            f.write(f'  semilla = {self.semilla}\n')
+            f.write(f'  perturbacion = {self.perturbacion}\n')
+            f.write(f'  fraccion_semilla = {self.fraccion_semilla}\n')
+            f.write(f'  reducir_espacio = {self.reducir_espacio}\n\n')
+
+            f.write('MULTI-FIDELIDAD:\n')
+            for fidelidad in self.fidelidades[:-1]:
+                f.write(f'  {fidelidad["nombre"]} = { {**fidelidad["header"], **fidelidad["malla"]} }\n')
+            f.write(f'  umbral_fidelidad = {self.umbral_fidelidad}\n')
+            f.write(f'  paciencia_fidelidad = {self.paciencia_fidelidad}\n')
+            f.write(f'  max_generaciones_fidelidad = {self.max_generaciones_fidelidad}\n')
 
         print(f'Configuración exportada a: {output_path}')
 
@@ -0,0 +1,435 @@
+"""
+Evaluación distribuida de soluciones en varios nodos mediante un broker de trabajos.
+
+El coordinador (Calibracion o un script de sensibilidad) publica las soluciones
+en un broker multiprocessing.managers.BaseManager escuchando por TCP. Los
+workers remotos, cada uno con su propia copia de la plantilla, se conectan,
+toman tareas, evalúan con Calibracion._evaluar_solucion_worker y devuelven
+(eval_id, kge, perfil).
+
+Cada worker envía latidos periódicos; si un worker deja de hacerlo durante
+TIEMPO_MAX_SIN_LATIDO segundos, sus tareas en curso vuelven a la cola. Una
+tarea que tumba a MAX_INTENTOS workers se da por fallida (kge -999) para que
+no derribe uno a uno a todos los demás.
+
+Las tareas viajan serializadas con pickle: quien se conecte al broker con la
+clave puede ejecutar código en el coordinador y en los workers. Por eso el
+broker escucha por defecto solo en 127.0.0.1 y, si no se indica authkey,
+genera una clave aleatoria y la imprime una vez. Para workers remotos se
+escucha en una interfaz de la red interna con una clave propia.
+
+Uso (coordinador):
+    broker = Q2KBroker('10.0.0.5:50000', authkey=os.environ['QUAL2K_AUTHKEY'])
+    broker.iniciar()
+    resultados = broker.evaluar(lista_args)
+    broker.cerrar()
+
+Uso (cada nodo, con QUAL2K_AUTHKEY en el entorno o --authkey):
+    python -m qual2k worker 10.0.0.5:50000 --filepath data/templates/Chicamocha --procesos 8
+"""
+import collections
+import multiprocessing as mp
+import os
+import secrets
+import socket
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+PUERTO_DEFAULT = 50000
+HOST_DEFAULT = '127.0.0.1'
+
+# Variable de entorno con la clave compartida (alternativa a --authkey)
+VARIABLE_AUTHKEY = 'QUAL2K_AUTHKEY'
+
+# Latidos de los workers (s)
+INTERVALO_LATIDO = 5.0
+TIEMPO_MAX_SIN_LATIDO = 30.0
+
+# Workers caídos con una misma tarea antes de darla por fallida
+MAX_INTENTOS = 3
+
+# Espera máxima del coordinador sin recibir ningún resultado (s)
+TIMEOUT_SIN_RESULTADOS = 600.0
+
+
+def _resultado_fallido(carga: Any) -> Tuple:
+    """Resultado (eval_id, -999, None) de una tarea que no se pudo evaluar."""
+    return (carga[1] if len(carga) > 1 else None, -999, None)
+
+
+class ColaTrabajos:
+    """
+    Estado del broker: tareas pendientes, en curso, resultados y latidos.
+
+    Vive en el proceso servidor del manager; todos los métodos son seguros
+    entre hilos.
+    """
+
+    def __init__(self, tiempo_max_sin_latido: float = TIEMPO_MAX_SIN_LATIDO,
+                 info: Optional[Dict[str, Any]] = None,
+                 max_intentos: int = MAX_INTENTOS):
+        self.tiempo_max_sin_latido = tiempo_max_sin_latido
+        self.info = info or {}
+        self.max_intentos = max_intentos
+        self._condicion = threading.Condition()
+        self._pendientes = collections.deque()
+        self._en_curso: Dict[int, Tuple[str, Any]] = {}
+        self._resultados: Dict[int, Any] = {}
+        self._latidos: Dict[str, float] = {}
+        self._caidas: Dict[int, int] = {}
+        self.reencoladas = 0
+        self.fallidas = 0
+
+    def obtener_info(self) -> Dict[str, Any]:
+        """Información del trabajo publicada por el coordinador (p.ej. sha256 de la plantilla)."""
+        return self.info
+
+    def publicar(self, tareas: List[Tuple[int, Any]]) -> None:
+        """Agrega tareas (tarea_id, carga) al final de la cola."""
+        with self._condicion:
+            self._pendientes.extend(tareas)
+            self._condicion.notify_all()
+
+    def latido(self, worker_id: str) -> None:
+        """Registra que el worker sigue activo."""
+        with self._condicion:
+            self._latidos[worker_id] = time.monotonic()
+
+    def _reencolar_caidos(self) -> None:
+        """
+        Devuelve a la cola las tareas de workers sin latido reciente; tras
+        max_intentos caídas la tarea se entrega como fallida.
+        """
+        ahora = time.monotonic()
+        caidos = {w for w, t in self._latidos.items()
+                  if ahora - t > self.tiempo_max_sin_latido}
+        if not caidos:
+            return
+        for tarea_id, (worker_id, carga) in list(self._en_curso.items()):
+            if worker_id in caidos:
+                del self._en_curso[tarea_id]
+                self._caidas[tarea_id] = self._caidas.get(tarea_id, 0) + 1
+                if self._caidas[tarea_id] >= self.max_intentos:
+                    del self._caidas[tarea_id]
+                    self._resultados[tarea_id] = _resultado_fallido(carga)
+                    self.fallidas += 1
+                else:
+                    self._pendientes.appendleft((tarea_id, carga))
+                    self.reencoladas += 1
+        for worker_id in caidos:
+            del self._latidos[worker_id]
+        self._condicion.notify_all()
+
+    def obtener(self, worker_id: str, timeout: float = 1.0) -> Optional[Tuple[int, Any]]:
+        """
+        Entrega la siguiente tarea al worker.
+
+        Returns:
+            (tarea_id, carga) o None si no hubo tareas durante timeout
+        """
+        limite = time.monotonic() + timeout
+        with self._condicion:
+            self._latidos[worker_id] = time.monotonic()
+            while True:
+                self._reencolar_caidos()
+                if self._pendientes:
+                    tarea_id, carga = self._pendientes.popleft()
+                    self._en_curso[tarea_id] = (worker_id, carga)
+                    return tarea_id, carga
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return None
+                self._condicion.wait(min(restante, 1.0))
+
+    def entregar(self, worker_id: str, tarea_id: int, resultado: Any) -> None:
+        """Recibe el resultado de una tarea (los duplicados se descartan)."""
+        with self._condicion:
+            self._latidos[worker_id] = time.monotonic()
+            if tarea_id in self._resultados:
+                return
+            self._en_curso.pop(tarea_id, None)
+            self._caidas.pop(tarea_id, None)
+            # Una tarea reencolada que termina tarde ya no debe repetirse
+            self._pendientes = collections.deque(
+                t for t in self._pendientes if t[0] != tarea_id)
+            self._resultados[tarea_id] = resultado
+            self._condicion.notify_all()
+
+    def recoger(self, timeout: float = 1.0) -> List[Tuple[int, Any]]:
+        """
+        Retira los resultados disponibles (espera hasta timeout si no hay).
+
+        Returns:
+            Lista de (tarea_id, resultado)
+        """
+        limite = time.monotonic() + timeout
+        with self._condicion:
+            while not self._resultados:
+                self._reencolar_caidos()
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return []
+                self._condicion.wait(min(restante, 1.0))
+            resultados = list(self._resultados.items())
+            self._resultados.clear()
+            return resultados
+
+    def estado(self) -> Dict[str, int]:
+        """Conteo de tareas pendientes, en curso, workers activos, reencoladas y fallidas."""
+        with self._condicion:
+            return {'pendientes': len(self._pendientes),
+                    'en_curso': len(self._en_curso),
+                    'workers': len(self._latidos),
+                    'reencoladas': self.reencoladas,
+                    'fallidas': self.fallidas}
+
+
+# Instancia única de la cola en el proceso servidor del broker
+_COLA: Optional[ColaTrabajos] = None
+
+
+def _inicializar_servidor(tiempo_max_sin_latido: float, info: Dict[str, Any],
+                          max_intentos: int = MAX_INTENTOS) -> None:
+    global _COLA
+    _COLA = ColaTrabajos(tiempo_max_sin_latido, info, max_intentos)
+
+
+def _obtener_cola() -> ColaTrabajos:
+    return _COLA
+
+
+class _ManagerBroker(BaseManager):
+    pass
+
+
+_ManagerBroker.register('cola', callable=_obtener_cola)
+
+
+def _separar_direccion(direccion: str) -> Tuple[str, int]:
+    """Convierte 'host:puerto' (o 'host') en (host, puerto)."""
+    host, _, puerto = direccion.rpartition(':') if ':' in direccion else (direccion, '', '')
+    return host or HOST_DEFAULT, int(puerto or PUERTO_DEFAULT)
+
+
+def _clave(authkey: Optional[str]) -> bytes:
+    """Clave del worker: la indicada o la de QUAL2K_AUTHKEY; no hay clave por defecto."""
+    authkey = authkey or os.environ.get(VARIABLE_AUTHKEY)
+    if not authkey:
+        raise ValueError(f"Se requiere la clave del broker (authkey o la variable "
+                         f"de entorno {VARIABLE_AUTHKEY})")
+    return authkey.encode()
+
+
+class Q2KBroker:
+    """
+    Coordinador de la evaluación distribuida.
+
+    Los argumentos de cada evaluación tienen la forma de los de
+    Calibracion._evaluar_solucion_worker; filepath y workspace_root se envían
+    como None y cada worker los reemplaza por los suyos.
+    """
+
+    def __init__(self, direccion: str = f'{HOST_DEFAULT}:{PUERTO_DEFAULT}',
+                 authkey: Optional[str] = None,
+                 info: Optional[Dict[str, Any]] = None,
+                 tiempo_max_sin_latido: float = TIEMPO_MAX_SIN_LATIDO,
+                 max_intentos: int = MAX_INTENTOS):
+        """
+        Inicializa el broker (no escucha hasta llamar a iniciar).
+
+        Args:
+            direccion: 'host:puerto' donde escuchar (por defecto solo
+                       127.0.0.1; use la IP de la red interna para workers remotos)
+            authkey: Clave compartida con los workers (None = QUAL2K_AUTHKEY o,
+                     si no está definida, una clave aleatoria que se imprime)
+            info: Datos publicados para los workers (p.ej. {'sha256_plantilla': ...})
+            tiempo_max_sin_latido: Segundos sin latido para dar un worker por caído
+            max_intentos: Workers caídos con una misma tarea antes de devolverla
+                          como fallida (kge -999)
+        """
+        self.direccion = _separar_direccion(direccion)
+        authkey = authkey or os.environ.get(VARIABLE_AUTHKEY)
+        self._clave_generada = not authkey
+        self.authkey = (authkey or secrets.token_hex(16)).encode()
+        self.info = info or {}
+        self.tiempo_max_sin_latido = tiempo_max_sin_latido
+        self.max_intentos = max_intentos
+        self.manager = None
+        self.cola = None
+        self._siguiente_id = 0
+        self._procesos_locales: List[mp.Process] = []
+
+    def iniciar(self) -> 'Q2KBroker':
+        """Inicia el servidor del broker en un proceso aparte."""
+        self.manager = _ManagerBroker(address=self.direccion, authkey=self.authkey)
+        self.manager.start(_inicializar_servidor,
+                           (self.tiempo_max_sin_latido, self.info, self.max_intentos))
+        self.cola = self.manager.cola()
+        print(f'Broker escuchando en {self.direccion[0]}:{self.manager.address[1]}')
+        if self._clave_generada:
+            print(f'Clave del broker (--authkey de los workers): {self.authkey.decode()}')
+        return self
+
+    def iniciar_workers_locales(self, filepath: str, n: int,
+                                workspace_root: Optional[str] = None) -> None:
+        """
+        Lanza n workers en esta máquina conectados al broker.
+
+        Args:
+            filepath: Directorio de la plantilla local
+            n: Número de procesos worker
+            workspace_root: Raíz de los workspaces (None = automática)
+        """
+        host, puerto = self.manager.address
+        direccion = f"{'127.0.0.1' if host in ('0.0.0.0', '') else host}:{puerto}"
+        for _ in range(n):
+            proceso = mp.Process(target=ejecutar_worker, daemon=True,
+                                 args=(direccion, self.authkey.decode(), filepath,
+                                       workspace_root))
+            proceso.start()
+            self._procesos_locales.append(proceso)
+
+    def evaluar(self, lista_args: List[Tuple],
+                callback: Optional[Callable[[int, Tuple], None]] = None,
+                timeout: float = TIMEOUT_SIN_RESULTADOS) -> List[Tuple]:
+        """
+        Publica un lote de evaluaciones y espera todos sus resultados.
+
+        Args:
+            lista_args: Argumentos de _evaluar_solucion_worker de cada solución
+            callback: Función (indice, resultado) llamada al llegar cada resultado
+            timeout: Segundos máximos sin recibir ningún resultado
+
+        Returns:
+            Resultados (eval_id, kge, perfil) en el orden de lista_args
+        """
+        ids = {}
+        tareas = []
+        for i, args in enumerate(lista_args):
+            self._siguiente_id += 1
+            ids[self._siguiente_id] = i
+            args = list(args)
+            args[2] = None  # filepath del worker
+            args[7] = None  # workspace_root del worker
+            tareas.append((self._siguiente_id, tuple(args)))
+        self.cola.publicar(tareas)
+
+        resultados = [None] * len(lista_args)
+        faltantes = len(lista_args)
+        ultimo = time.monotonic()
+        while faltantes:
+            recibidos = self.cola.recoger(timeout=1.0)
+            if not recibidos:
+                if time.monotonic() - ultimo > timeout:
+                    raise TimeoutError(f"Sin resultados del broker en {timeout:.0f} s "
+                                       f"({self.cola.estado()})")
+                continue
+            ultimo = time.monotonic()
+            for tarea_id, resultado in recibidos:
+                i = ids.pop(tarea_id, None)
+                if i is None:
+                    continue
+                resultados[i] = resultado
+                faltantes -= 1
+                if callback is not None:
+                    callback(i, resultado)
+
+        return resultados
+
+    def estado(self) -> Dict[str, int]:
+        """Estado de la cola del broker."""
+        return self.cola.estado()
+
+    def cerrar(self) -> None:
+        """Detiene los workers locales y el servidor del broker."""
+        for proceso in self._procesos_locales:
+            proceso.terminate()
+            proceso.join(timeout=5)
+        self._procesos_locales = []
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def _enviar_latidos(cola, worker_id: str, detener: threading.Event,
+                    intervalo: float) -> None:
+    """Hilo que envía latidos al broker mientras el worker evalúa."""
+    while not detener.wait(intervalo):
+        try:
+            cola.latido(worker_id)
+        except Exception:
+            return
+
+
+def ejecutar_worker(direccion: str, authkey: Optional[str], filepath: str,
+                    workspace_root: Optional[str] = None,
+                    max_tareas: Optional[int] = None,
+                    intervalo_latido: float = INTERVALO_LATIDO) -> int:
+    """
+    Conecta un worker al broker y evalúa tareas hasta que el broker se cierre.
+
+    Args:
+        direccion: 'host:puerto' del broker
+        authkey: Clave compartida con el coordinador (None = QUAL2K_AUTHKEY)
+        filepath: Directorio local de la plantilla (PlantillaBaseQ2K.xlsx y ejecutable)
+        workspace_root: Raíz de los workspaces (None = automática)
+        max_tareas: Terminar tras evaluar este número de tareas (None = sin límite)
+        intervalo_latido: Segundos entre latidos
+
+    Returns:
+        Número de tareas evaluadas
+    """
+    from qual2k.core import workspace as ws
+    from qual2k.core.calibrator import Calibracion
+    from qual2k.processing.plantilla_cache import sha256_archivo
+
+    manager = _ManagerBroker(address=_separar_direccion(direccion), authkey=_clave(authkey))
+    manager.connect()
+    cola = manager.cola()
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+
+    # La plantilla local debe ser la misma que la del coordinador
+    esperado = cola.obtener_info().get('sha256_plantilla')
+    if esperado:
+        local = sha256_archivo(os.path.join(filepath, 'PlantillaBaseQ2K.xlsx'))
+        if local != esperado:
+            raise ValueError(f"La plantilla de {filepath} no coincide con la del coordinador")
+
+    workspace_root = ws.resolver_raiz_workspace(workspace_root)
+    detener = threading.Event()
+    threading.Thread(target=_enviar_latidos, daemon=True,
+                     args=(manager.cola(), worker_id, detener, intervalo_latido)).start()
+
+    evaluadas = 0
+    try:
+        while max_tareas is None or evaluadas < max_tareas:
+            try:
+                tarea = cola.obtener(worker_id, timeout=intervalo_latido)
+            except (EOFError, ConnectionError, BrokenPipeError):
+                break  # el coordinador cerró el broker
+            if tarea is None:
+                continue
+            tarea_id, args = tarea
+            args = list(args)
+            try:
+                args[2] = filepath
+                args[7] = workspace_root
+                resultado = Calibracion._evaluar_solucion_worker(tuple(args))
+            except Exception as e:
+                # Argumentos mal formados: se informa el fallo en lugar de morir
+                print(f'Error en la tarea {tarea_id}: {e}')
+                resultado = _resultado_fallido(args)
+            cola.entregar(worker_id, tarea_id, resultado)
+            evaluadas += 1
+    finally:
+        detener.set()
+
+    return evaluadas
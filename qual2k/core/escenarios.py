@@ -0,0 +1,138 @@
+import copy
+from typing import Dict, Any, List, Union
+
+from qual2k.processing.file_writer import CONSTITUYENTES_CABECERA
+
+# Bloques de q2k_data que puede modificar un escenario
+BLOQUES_ESCENARIO = ["header", "rates", "reach_rates", "point_sources", "headwaters",
+                     "reach_data"]
+
+
+def _seleccionar(elementos: List[Dict[str, Any]], clave: Union[int, str],
+                 campo_nombre: str) -> List[Dict[str, Any]]:
+    """
+    Selecciona elementos de una lista por índice (base 0), nombre o '*' (todos).
+    """
+    if clave == "*":
+        return elementos
+    if isinstance(clave, int):
+        return [elementos[clave]]
+
+    seleccion = [e for e in elementos if str(e.get(campo_nombre, "")).strip() == str(clave).strip()]
+    if not seleccion:
+        raise KeyError(f"No existe el elemento '{clave}' ({campo_nombre})")
+    return seleccion
+
+
+def _aplicar_reach_rates(reach_rates: Dict[str, Any], cambios: Dict[str, Any]) -> Dict[str, Any]:
+    """Aplica cambios a las tasas por tramo (valor único o lista por tramo)."""
+    if "reaches" in cambios:
+        return copy.deepcopy(cambios)
+
+    tramos = reach_rates["reaches"]
+    for campo, valor in cambios.items():
+        if isinstance(valor, (list, tuple)) and len(valor) != len(tramos):
+            raise ValueError(f"{campo} tiene {len(valor)} valores para {len(tramos)} tramos")
+        for i, tramo in enumerate(tramos):
+            if campo not in tramo:
+                raise KeyError(f"Tasa por tramo desconocida: {campo}")
+            tramo[campo] = valor[i] if isinstance(valor, (list, tuple)) else valor
+    return reach_rates
+
+
+def _aplicar_rates(rates_general: Dict[str, Any], cambios: Dict[str, Any]) -> None:
+    """Aplica cambios a las tasas generales."""
+    for campo, valor in cambios.items():
+        if campo not in rates_general:
+            raise KeyError(f"Tasa desconocida: {campo}")
+        rates_general[campo] = valor
+
+
+def _aplicar_reach_data(reach_data: Dict[str, Any], cambios: Dict[str, Any]) -> None:
+    """Aplica cambios a los campos de los tramos (valor único o lista por tramo) y recalcula ne."""
+    for campo, valor in cambios.items():
+        if isinstance(valor, (list, tuple)) and len(valor) != reach_data["nr"]:
+            raise ValueError(f"{campo} tiene {len(valor)} valores para {reach_data['nr']} tramos")
+        for i, tramo in enumerate(reach_data["reaches"]):
+            if campo not in tramo:
+                raise KeyError(f"Campo de tramo desconocido: {campo}")
+            tramo[campo] = valor[i] if isinstance(valor, (list, tuple)) else valor
+    reach_data["ne"] = int(sum(tramo["numElm"] for tramo in reach_data["reaches"]))
+
+
+def _aplicar_point_sources(ps_block: Dict[str, Any], cambios: Dict[Union[int, str], Dict[str, Any]]) -> None:
+    """Aplica cambios a fuentes puntuales (campos de la fuente o constituyentes)."""
+    for clave, campos in cambios.items():
+        for fuente in _seleccionar(ps_block["sources"], clave, "PtName"):
+            constituyentes = {c["name"]: c for c in fuente["constituents"]}
+            for campo, valor in campos.items():
+                if campo in constituyentes:
+                    constituyentes[campo]["mean"] = valor
+                elif campo in fuente:
+                    fuente[campo] = valor
+                else:
+                    raise KeyError(f"Campo de fuente puntual desconocido: {campo}")
+
+
+def _aplicar_headwaters(hw_block: Dict[str, Any], cambios: Dict[Union[int, str], Dict[str, Any]]) -> None:
+    """Aplica cambios a cabeceras (campos, temperatura, pH o constituyentes)."""
+    for clave, campos in cambios.items():
+        for hw in _seleccionar(hw_block["headwaters"], clave, "NameHw"):
+            for campo, valor in campos.items():
+                horario = list(valor) if isinstance(valor, (list, tuple)) else [valor] * 24
+                if campo in CONSTITUYENTES_CABECERA:
+                    hw["cHw"][CONSTITUYENTES_CABECERA.index(campo)] = horario
+                elif campo in ("TeHw", "Temp"):
+                    hw["TeHw"] = horario
+                elif campo in ("pHHw", "pH"):
+                    hw["pHHw"] = horario
+                elif campo in hw:
+                    hw[campo] = valor
+                else:
+                    raise KeyError(f"Campo de cabecera desconocido: {campo}")
+
+
+def aplicar_escenario(q2k_data: Dict[str, Any], escenario: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Genera una copia de q2k_data con las modificaciones de un escenario.
+
+    Formato del escenario (todas las claves son opcionales):
+        {
+            "header": {"tf": 10},
+            "rates": {"kn": 0.1},
+            "reach_rates": {"kn_rch": 0.2} o {"kn_rch": [0.1, 0.2, ...]},
+            "point_sources": {"PTAR": {"Qptt": 0.5, "CBODf": 30}, "*": {...}},
+            "headwaters": {0: {"QHw": 2.3, "DO": 6.5}},
+            "reach_data": {"numElm": [4, 2, 6, ...]},
+        }
+
+    Las fuentes puntuales y cabeceras se seleccionan por índice (base 0),
+    por nombre o con '*' para todas.
+
+    Args:
+        q2k_data: Diccionario base con todos los bloques del modelo
+        escenario: Diccionario de modificaciones
+
+    Returns:
+        Nuevo diccionario q2k_data (el original no se modifica)
+    """
+    desconocidos = set(escenario) - set(BLOQUES_ESCENARIO)
+    if desconocidos:
+        raise KeyError(f"Bloques de escenario no soportados: {sorted(desconocidos)}")
+
+    data = copy.deepcopy(q2k_data)
+
+    if "header" in escenario:
+        data["header"].update(escenario["header"])
+    if "rates" in escenario:
+        _aplicar_rates(data["rates_general"], escenario["rates"])
+    if "reach_rates" in escenario:
+        data["reach_rates"] = _aplicar_reach_rates(data["reach_rates"], escenario["reach_rates"])
+    if "point_sources" in escenario:
+        _aplicar_point_sources(data["point_sources"], escenario["point_sources"])
+    if "headwaters" in escenario:
+        _aplicar_headwaters(data["headwaters"], escenario["headwaters"])
+    if "reach_data" in escenario:
+        _aplicar_reach_data(data["reach_data"], escenario["reach_data"])
+
+    return data
@@ -0,0 +1,234 @@
+"""
+Estudio de convergencia de malla: número de elementos por tramo.
+
+El tiempo del solucionador crece con el número total de elementos (ne). Con
+numElm uniforme un tramo de 0.5 km recibe tantos elementos como uno de 10 km,
+así que la malla suele estar sobre-refinada en los tramos cortos.
+
+El estudio parte de la malla de referencia del modelo base y la engrosa por
+niveles: en el nivel k ningún elemento es más corto que h_k = h_0 · factor^k
+(h_0 = elemento más corto de la referencia), es decir, cada tramo recibe
+min(n_ref, ceil(L / h_k)) elementos. Todos los niveles se simulan en
+paralelo con Q2KPipeline y se recomienda el más grueso tal que él y todos
+los niveles más finos difieren de la referencia en menos de las
+tolerancias de KGE y de perfil.
+"""
+import math
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from qual2k.core.model import Q2KModel
+from qual2k.core.pipeline import Q2KPipeline
+
+COLUMNA_DISTANCIA = 'Distancia Longitudinal (km)'
+
+# Variables del perfil comparadas por defecto
+VARIABLES_MALLA = [
+    'water_temp_c', 'conductivity', 'dissolved_oxygen', 'carbonaceous_bod_fast',
+    'ammonium', 'nitrate', 'total_phosphorus', 'pH', 'pathogen',
+]
+
+
+def diferencia_perfil(perfil: pd.DataFrame, referencia: pd.DataFrame,
+                      variables: Sequence[str] = VARIABLES_MALLA) -> float:
+    """
+    Diferencia máxima entre un perfil y el de referencia.
+
+    El perfil se interpola en las distancias de la referencia; para cada
+    variable se toma la diferencia absoluta máxima dividida por el rango
+    de la variable en la referencia.
+
+    Args:
+        perfil: Perfil a comparar (procesar_out_file)
+        referencia: Perfil de referencia
+        variables: Columnas a comparar
+
+    Returns:
+        Máximo sobre las variables (NaN si ninguna es comparable)
+    """
+    ref = referencia.sort_values(COLUMNA_DISTANCIA)
+    sim = perfil.sort_values(COLUMNA_DISTANCIA)
+    diferencias = []
+    for variable in variables:
+        if variable not in ref.columns or variable not in sim.columns:
+            continue
+        y_ref = ref[variable].to_numpy(dtype=float)
+        y_sim = np.interp(ref[COLUMNA_DISTANCIA], sim[COLUMNA_DISTANCIA],
+                          sim[variable].to_numpy(dtype=float))
+        rango = np.nanmax(y_ref) - np.nanmin(y_ref)
+        escala = rango if rango > 0 else max(abs(np.nanmean(y_ref)), 1e-12)
+        diferencias.append(np.nanmax(np.abs(y_sim - y_ref)) / escala)
+    return float(max(diferencias)) if diferencias else np.nan
+
+
+class EstudioMalla:
+    """
+    Elige el número de elementos de cada tramo engrosando la malla hasta
+    alcanzar las tolerancias de KGE y de perfil.
+    """
+
+    def __init__(self, filepath: str, header_dict: Dict[str, Any],
+                 tolerancia_kge: float = 0.01,
+                 tolerancia_perfil: float = 0.05,
+                 factor: float = 2.0,
+                 n_niveles: int = 6,
+                 longitudes: Optional[Sequence[float]] = None,
+                 variables: Optional[List[str]] = None,
+                 plantilla: str = 'PlantillaBaseQ2K.xlsx',
+                 q_cabecera: float = 1.06007E-06,
+                 pesos: Optional[Dict[str, float]] = None,
+                 workspace_root: Optional[str] = None,
+                 n_simuladores: Optional[int] = None,
+                 modelo: Optional[Q2KModel] = None):
+        """
+        Inicializa el estudio.
+
+        Args:
+            filepath: Directorio con la plantilla y el ejecutable
+            header_dict: Diccionario con configuración del header
+            tolerancia_kge: Diferencia absoluta máxima del KGE global respecto
+                            a la malla de referencia
+            tolerancia_perfil: Diferencia máxima del perfil, como fracción del
+                               rango de cada variable en la referencia
+            factor: Razón entre las longitudes mínimas de elemento de dos
+                    niveles consecutivos
+            n_niveles: Número máximo de niveles de engrosamiento
+            longitudes: Longitudes mínimas de elemento (km) a probar, en lugar
+                        de la progresión geométrica
+            variables: Columnas del perfil a comparar (None = VARIABLES_MALLA)
+            plantilla: Nombre del archivo Excel
+            q_cabecera: Caudal de cabecera
+            pesos: Pesos del KGE global (None = PESOS_DEFAULT)
+            workspace_root: Raíz de los workspaces (None = automática)
+            n_simuladores: Simulaciones FORTRAN simultáneas (None = CPUs disponibles)
+            modelo: Q2KModel ya configurado cuya malla es la referencia (None =
+                    se configura con numelem_default)
+        """
+        if factor <= 1:
+            raise ValueError("factor debe ser mayor que 1")
+
+        self.tolerancia_kge = tolerancia_kge
+        self.tolerancia_perfil = tolerancia_perfil
+        self.factor = factor
+        self.n_niveles = n_niveles
+        self.longitudes = list(longitudes) if longitudes is not None else None
+        self.variables = variables or VARIABLES_MALLA
+
+        self.pipeline = Q2KPipeline(filepath, header_dict, plantilla=plantilla,
+                                    q_cabecera=q_cabecera, pesos=pesos,
+                                    workspace_root=workspace_root,
+                                    n_simuladores=n_simuladores, devolver_perfil=True,
+                                    modelo=modelo)
+
+        self.longitud_tramos: Optional[np.ndarray] = None
+        self.numelem_referencia: Optional[List[int]] = None
+        self.resultados: Optional[pd.DataFrame] = None
+        self.recomendacion: Optional[Dict[str, Any]] = None
+
+    def niveles(self) -> List[Dict[str, Any]]:
+        """
+        Mallas a evaluar, de la referencia (nivel 0) a la más gruesa.
+
+        Returns:
+            Lista de dicts con nivel, longitud_minima (km, None en la
+            referencia) y numelem (lista por tramo); las mallas repetidas se omiten
+        """
+        self.pipeline.configurar_base()
+        tramos = self.pipeline.modelo_base.q2k_data['reach_data']['reaches']
+        self.longitud_tramos = np.array([abs(t['xrup'] - t['xrdn']) for t in tramos])
+        self.numelem_referencia = [int(t['numElm']) for t in tramos]
+
+        if self.longitudes is not None:
+            longitudes = sorted(self.longitudes)
+        else:
+            h_0 = float(np.min(self.longitud_tramos / self.numelem_referencia))
+            longitudes = [h_0 * self.factor ** k for k in range(1, self.n_niveles + 1)]
+
+        niveles = [{'nivel': 0, 'longitud_minima': None, 'numelem': self.numelem_referencia}]
+        vistos = {tuple(self.numelem_referencia)}
+        for longitud in longitudes:
+            numelem = [min(n, max(1, math.ceil(round(l / longitud, 9))))
+                       for l, n in zip(self.longitud_tramos, self.numelem_referencia)]
+            if tuple(numelem) in vistos:
+                continue
+            vistos.add(tuple(numelem))
+            niveles.append({'nivel': len(niveles), 'longitud_minima': longitud,
+                            'numelem': numelem})
+            if all(n == 1 for n in numelem):
+                break
+        return niveles
+
+    def diferencia_perfil(self, perfil: pd.DataFrame, referencia: pd.DataFrame) -> float:
+        """Diferencia máxima entre un perfil y el de referencia (ver diferencia_perfil)."""
+        return diferencia_perfil(perfil, referencia, self.variables)
+
+    def ejecutar(self) -> Dict[str, Any]:
+        """
+        Simula todos los niveles en paralelo y elige la malla recomendada.
+
+        Returns:
+            Diccionario con numelem (por tramo), ne, ne_referencia, nivel,
+            longitud_minima, dif_kge, dif_perfil y aceleracion (tiempo de
+            simulación de la referencia / el de la malla recomendada)
+        """
+        print("=" * 70)
+        print('ESTUDIO DE CONVERGENCIA DE MALLA')
+        print("=" * 70)
+
+        niveles = self.niveles()
+        conjuntos = [{'reach_data': {'numElm': nivel['numelem']}} for nivel in niveles]
+        corridas = {r['indice']: r for r in self.pipeline.evaluate_many(conjuntos)}
+
+        referencia = corridas[0]
+        if referencia['error'] is not None:
+            raise RuntimeError(f"Falló la simulación de la malla de referencia: {referencia['error']}")
+
+        filas = []
+        for nivel in niveles:
+            r = corridas[nivel['nivel']]
+            fila = {
+                'nivel': nivel['nivel'],
+                'longitud_minima': nivel['longitud_minima'],
+                'ne': sum(nivel['numelem']),
+                'kge': np.nan,
+                'dif_kge': np.nan,
+                'dif_perfil': np.nan,
+                'tiempo_simulacion_s': r['tiempos'].get('simular', np.nan),
+                'error': r['error'],
+            }
+            if r['error'] is None:
+                fila['kge'] = r['kge']
+                fila['dif_kge'] = abs(r['kge'] - referencia['kge'])
+                fila['dif_perfil'] = self.diferencia_perfil(r['perfil'], referencia['perfil'])
+            fila['cumple'] = bool(fila['dif_kge'] <= self.tolerancia_kge
+                                  and fila['dif_perfil'] <= self.tolerancia_perfil)
+            filas.append(fila)
+            print(f"Nivel {fila['nivel']}: ne={fila['ne']:5d}  ΔKGE={fila['dif_kge']:.4f}  "
+                  f"Δperfil={fila['dif_perfil']:.4f}  {'✅' if fila['cumple'] else '⚠️'}")
+
+        self.resultados = pd.DataFrame(filas)
+
+        # Se engrosa mientras todos los niveles anteriores cumplan
+        elegido = 0
+        for fila in filas[1:]:
+            if not fila['cumple']:
+                break
+            elegido = fila['nivel']
+
+        mejor = filas[elegido]
+        self.recomendacion = {
+            'numelem': niveles[elegido]['numelem'],
+            'ne': mejor['ne'],
+            'ne_referencia': filas[0]['ne'],
+            'nivel': elegido,
+            'longitud_minima': mejor['longitud_minima'],
+            'dif_kge': mejor['dif_kge'],
+            'dif_perfil': mejor['dif_perfil'],
+            'aceleracion': filas[0]['tiempo_simulacion_s'] / mejor['tiempo_simulacion_s'],
+        }
+
+        print(f"✅ Malla recomendada: nivel {elegido}, ne={mejor['ne']} "
+              f"(referencia {filas[0]['ne']}), numelem={self.recomendacion['numelem']}")
+        return self.recomendacion
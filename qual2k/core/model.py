@@ -1,12 +1,60 @@
 import pandas as pd
 import os
-from typing import Dict, Any
+import re
+import weakref
+from typing import Dict, Any, Optional, List, Union
 from .config import Q2KConfig
+from qual2k.core import workspace as ws
+from qual2k.core.escenarios import aplicar_escenario
 from qual2k.processing.data_processor import Q2KDataProcessor
 from qual2k.processing.file_writer import Q2KFileWriter
-from qual2k.core.simulator import Q2KSimulator
+from qual2k.processing.file_reader import Q2KFileReader
+from qual2k.processing.plantilla_cache import leer_plantillas, HOJAS_PLANTILLA
+from qual2k.core.simulator import Q2KSimulator, Q2KAsyncRunner, ejecutar_sincrono
 from qual2k.analysis.results_analyzer import Q2KResultsAnalyzer
-from qual2k.analysis.plotter import Q2KPlotter
+
+# Pesos por defecto de cada variable en el KGE global ponderado
+PESOS_DEFAULT = {
+    "water_temp_c": 0.05,
+    "conductivity": 0.05,
+    "nitrate": 0.05,
+    "pathogen": 0.10,
+    "pH": 0.05,
+    "total_suspended_solids": 0.05,
+    "dissolved_oxygen": 0.30,
+    "carbonaceous_bod_fast": 0.30,
+    "total_kjeldahl_nitrogen": 0.02,
+    "ammonium": 0.02,
+    "total_phosphorus": 0.01
+}
+
+# Pares (columna modelada, columna observada) del KGE global
+PARES_KGE = [
+    ("water_temp_c", "water_temp_c_obs"),
+    ("conductivity", "conductivity_obs"),
+    ("nitrate", "nitrate_obs"),
+    ("pathogen", "pathogen_obs"),
+    ("pH", "pH_obs"),
+    ("total_suspended_solids", "total_suspended_solids_obs"),
+    ("dissolved_oxygen", "dissolved_oxygen_obs"),
+    ("carbonaceous_bod_fast", "carbonaceous_bod_fast_obs"),
+    ("total_kjeldahl_nitrogen", "total_kjeldahl_nitrogen_obs"),
+    ("ammonium", "ammonium_obs"),
+    ("total_phosphorus", "total_phosphorus_obs"),
+]
+
+# Pares (variable diel del .out, columna observada horaria) y sus pesos
+PARES_DIEL = [
+    ("Temp", "TEMPERATURA"),
+    ("DO", "OXIGENO_DISUELTO"),
+    ("pH", "pH"),
+]
+
+PESOS_DIEL = {
+    "Temp": 0.2,
+    "DO": 0.6,
+    "pH": 0.2
+}
 
 
 class Q2KModel:
@@ -20,15 +68,28 @@ class Q2KModel:
         model.generar_archivo_q2k()
         model.ejecutar_simulacion()
         resultados = model.analizar_resultados()
+
+    Con usar_workspace=True el workspace se elimina con liberar_workspace(), al
+    salir de un bloque with o, en último caso, cuando el modelo se recolecta o
+    termina el intérprete:
+        with Q2KModel(filepath, header_dict, usar_workspace=True) as model:
+            ...
     """
 
-    def __init__(self, filepath: str, header_dict: Dict[str, Any]):
+    def __init__(self, filepath: str, header_dict: Dict[str, Any],
+                 usar_workspace: bool = False,
+                 workspace_root: Optional[str] = None):
         """
         Inicializa el modelo Q2K.
 
         Args:
             filepath: Ruta del directorio de trabajo
             header_dict: Diccionario con configuración del header
+            usar_workspace: Si escribir el .q2k, message.DAT y las salidas en un
+                            workspace aislado en lugar de filedir (ver
+                            liberar_workspace)
+            workspace_root: Raíz de los workspaces (None = /dev/shm si está
+                            disponible, si no el directorio temporal del sistema)
         """
         self.filepath = filepath
         self.config = Q2KConfig(header_dict)
@@ -36,7 +97,7 @@ class Q2KModel:
         self.file_writer = Q2KFileWriter()
         self.simulator = Q2KSimulator()
         self.results_analyzer = Q2KResultsAnalyzer()
-        self.plotter = Q2KPlotter()
+        self._plotter = None  # matplotlib se importa al primer uso (ver plotter)
 
         # DataFrames de entrada
         self.data_reaches = None
@@ -48,39 +109,84 @@ class Q2KModel:
 
         # Resultados
         self.wq_data_model = None
+        self.wq_data_red = None
+        self.diel = None
         self.data_exp = None
-
-    def cargar_plantillas(self, archivo_excel: str = 'PlantillaBaseQ2K.xlsx'):
+        self.errores_escenarios = {}
+
+        # Workspace de simulación
+        self.usar_workspace = usar_workspace
+        self.workspace_root = workspace_root
+        self.workspace = None
+        self._filedir_original = None
+        self._finalizador_workspace = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar_workspace()
+
+    @property
+    def plotter(self):
+        """Graficador de resultados (Q2KPlotter), creado e importado al primer uso."""
+        if self._plotter is None:
+            from qual2k.analysis.plotter import Q2KPlotter
+            self._plotter = Q2KPlotter()
+        return self._plotter
+
+    @plotter.setter
+    def plotter(self, valor):
+        self._plotter = valor
+
+    def cargar_plantillas(self, archivo_excel: str = 'PlantillaBaseQ2K.xlsx',
+                          usar_cache: bool = True):
         """
         Carga las plantillas desde el archivo Excel.
 
         Args:
             archivo_excel: Nombre del archivo Excel con las plantillas
+            usar_cache: Si usar la caché binaria junto al libro (ver plantilla_cache),
+                        que se invalida sola cuando el libro cambia
         """
         ruta_completa = os.path.join(self.filepath, archivo_excel)
         print("=" * 70)
         print('CARGANDO PLANTILLAS')
         print("=" * 70)
 
-        self.data_reaches = pd.read_excel(ruta_completa, sheet_name='REACHES')
-        self.data_sources = pd.read_excel(ruta_completa, sheet_name='SOURCES')
-        self.data_wq = pd.read_excel(ruta_completa, sheet_name='WQ_DATA')
+        hojas = leer_plantillas(ruta_completa, HOJAS_PLANTILLA, usar_cache)
+        self.data_reaches = hojas['REACHES']
+        self.data_sources = hojas['SOURCES']
+        self.data_wq = hojas['WQ_DATA']
 
         print(f'✅ Plantillas cargadas satisfactoriamente')
 
     def configurar_modelo(self,
                           numelem_default: int = 10,
                           q_cabecera: float = 1.06574E-06,
-                          estacion_cabecera: str = 'CABECERA',
-                          reach_rates_custom: Dict = None):
+                          estacion_cabecera: Union[str, List[str]] = 'CABECERA',
+                          reach_rates_custom: Dict = None,
+                          longitud_elemento: Optional[float] = None,
+                          numelem: Optional[List[int]] = None):
         """
         Configura todos los componentes del modelo.
 
+        Si REACHES tiene la columna HW_ID (red con tributarios), se crea una
+        cabecera por grupo de tramos: la del cauce principal es
+        estacion_cabecera y la de cada tributario la estación aguas arriba de
+        su primer tramo (ver Q2KDataProcessor.estaciones_cabecera).
+
         Args:
             numelem_default: Número de elementos por tramo
             q_cabecera: Caudal de cabecera
-            estacion_cabecera: Nombre de la estación de cabecera
+            estacion_cabecera: Nombre de la estación de cabecera del cauce
+                               principal, o lista con una estación por cabecera
             reach_rates_custom: Diccionario personalizado para reach_rates (opcional)
+            longitud_elemento: Longitud objetivo de los elementos en km; cada
+                               tramo recibe ceil(longitud / longitud_elemento)
+                               elementos en lugar de numelem_default
+            numelem: Número de elementos de cada tramo (p.ej. el recomendado
+                     por EstudioMalla); tiene prioridad sobre lo anterior
         """
         print("=" * 70)
         print('CONFIGURANDO MODELO')
@@ -90,7 +196,9 @@ class Q2KModel:
         reach_dict = self.data_processor.crear_reach_dict(
             self.data_reaches,
             numelem_default,
-            q_cabecera
+            q_cabecera,
+            longitud_elemento,
+            numelem
         )
 
         # Procesar fuentes puntuales
@@ -98,7 +206,13 @@ class Q2KModel:
             self.data_sources
         )
 
-        # Procesar cabeceras
+        # Procesar cabeceras (una por grupo de tramos de la red)
+        if isinstance(estacion_cabecera, str):
+            estacion_cabecera = self.data_processor.estaciones_cabecera(
+                self.data_reaches, estacion_cabecera)
+        if len(estacion_cabecera) != reach_dict['nHw']:
+            raise ValueError(f"Se indicaron {len(estacion_cabecera)} estaciones de cabecera "
+                             f"para {reach_dict['nHw']} cabeceras en REACHES")
         headwaters_dict = self.data_processor.crear_headwaters_dict(
             self.data_reaches,
             self.data_wq,
@@ -146,12 +260,73 @@ class Q2KModel:
 
         print(f'✅ Modelo configurado satisfactoriamente')
 
+    def cargar_q2k(self, archivo_q2k: str, encoding: Optional[str] = None):
+        """
+        Carga q2k_data desde un archivo .q2k existente en lugar de las plantillas.
+
+        Evita la lectura del Excel y configurar_modelo(). El filedir del header
+        se conserva el de la configuración actual, de modo que el archivo se
+        regenera en el directorio (o workspace) de este modelo. Los datos
+        observados para analizar_resultados() siguen viniendo de cargar_plantillas().
+
+        Args:
+            archivo_q2k: Ruta del .q2k (relativa a filepath si no es absoluta)
+            encoding: Codificación del archivo (None = la del sistema)
+        """
+        ruta_completa = os.path.join(self.filepath, archivo_q2k)
+        print("=" * 70)
+        print('CARGANDO ARCHIVO .q2k')
+        print("=" * 70)
+
+        self.q2k_data = Q2KFileReader().read_q2k_file(ruta_completa, encoding)
+
+        header = dict(self.q2k_data["header"],
+                      filedir=self.config.header_dict['filedir'])
+        self.config.header_dict = header
+        self.q2k_data["header"] = header
+
+        print(f'✅ Archivo .q2k cargado satisfactoriamente')
+
+    def preparar_workspace(self) -> str:
+        """
+        Crea el workspace de simulación (si no existe) y redirige filedir hacia él.
+
+        Returns:
+            Ruta del workspace
+        """
+        if self.workspace is None:
+            self.workspace = ws.crear_workspace(self.filepath, self.workspace_root)
+            # Respaldo si nunca se llama a liberar_workspace (p.ej. /dev/shm ocupa RAM)
+            self._finalizador_workspace = weakref.finalize(
+                self, ws.eliminar_workspace, self.workspace)
+            self._filedir_original = self.config.header_dict['filedir']
+            self.config.header_dict = dict(self.config.header_dict,
+                                           filedir=self.workspace)
+            if self.q2k_data:
+                self.q2k_data["header"] = self.config.header_dict
+        return self.workspace
+
+    def liberar_workspace(self):
+        """Elimina el workspace de simulación y restaura filedir."""
+        if self.workspace is None:
+            return
+        self._finalizador_workspace()
+        self._finalizador_workspace = None
+        self.workspace = None
+        self.config.header_dict = dict(self.config.header_dict,
+                                       filedir=self._filedir_original)
+        if self.q2k_data:
+            self.q2k_data["header"] = self.config.header_dict
+
     def generar_archivo_q2k(self):
         """Genera el archivo .q2k y el mensaje.DAT"""
         print("=" * 70)
         print('GENERACIÓN DEL ARCHIVO .q2k')
         print("=" * 70)
 
+        if self.usar_workspace:
+            self.preparar_workspace()
+
         # Generar archivo .q2k
         ruta_q2k = os.path.join(
             self.config.header_dict['filedir'],
@@ -175,15 +350,19 @@ class Q2KModel:
             'q2kfortran2_12.exe'
         )
         self.simulator.ejecutar(exe_path)
+        self.diel = None  # la serie diel anterior ya no corresponde al .out
 
         print(f'✅ Simulación ejecutada satisfactoriamente')
 
-    def analizar_resultados(self, generar_graficas: bool = True):
+    def analizar_resultados(self, generar_graficas: bool = True,
+                            reporte: Optional[str] = None):
         """
         Analiza los resultados de la simulación.
 
         Args:
             generar_graficas: Si se deben generar las gráficas
+            reporte: 'pdf' o 'html' para generar un único reporte consolidado
+                     en lugar de una imagen por variable (None = imágenes)
 
         Returns:
             DataFrame con resultados experimentales (modelados + observados)
@@ -198,16 +377,25 @@ class Q2KModel:
             f"{self.config.header_dict['filename']}.out"
         )
 
-        # Crear carpeta de resultados
+        # Crear carpeta de resultados (fuera del workspace, que es temporal)
         resultados_dir = os.path.join(
-            self.config.header_dict['filedir'],
+            self.filepath if self.workspace else self.config.header_dict['filedir'],
             'resultados'
         )
         os.makedirs(resultados_dir, exist_ok=True)
 
-        # Procesar resultados del modelo
+        # Procesar resultados del modelo (cauce principal)
         self.wq_data_model = self.results_analyzer.procesar_out_file(filepath_out)
 
+        # En una red, perfiles de todos los cauces con su columna tributary
+        if self.q2k_data.get('headwaters', {}).get('nHw', 1) > 1:
+            self.wq_data_red = self.results_analyzer.procesar_red(filepath_out)
+            self.wq_data_red.to_csv(
+                os.path.join(resultados_dir,
+                             f"{self.config.header_dict['filename']}_tributarios.csv"),
+                index=False
+            )
+
         # Preparar datos observados
         data_obs = self.results_analyzer.preparar_datos_observados(self.data_wq)
 
@@ -224,7 +412,15 @@ class Q2KModel:
         )
 
         # Generar gráficas si se solicita
-        if generar_graficas:
+        if generar_graficas and reporte:
+            ruta_reporte = self.plotter.generar_reporte(
+                self.wq_data_model,
+                os.path.join(resultados_dir,
+                             f"{self.config.header_dict['filename']}_reporte.{reporte}"),
+                self.data_exp
+            )
+            print(f'✅ Reporte generado: {ruta_reporte}')
+        elif generar_graficas:
             self._generar_graficas(resultados_dir)
 
         print(f'✅ Resultados analizados satisfactoriamente')
@@ -257,38 +453,11 @@ class Q2KModel:
 
         # Pesos por defecto
         if pesos is None:
-            pesos = {
-                "water_temp_c": 0.05,
-                "conductivity": 0.05,
-                "nitrate": 0.05,
-                "pathogen": 0.10,
-                "pH": 0.05,
-                "total_suspended_solids": 0.05,
-                "dissolved_oxygen": 0.30,
-                "carbonaceous_bod_fast": 0.30,
-                "total_kjeldahl_nitrogen": 0.02,
-                "ammonium": 0.02,
-                "total_phosphorus": 0.01
-            }
-
-        # Pares de columnas
-        pares = [
-            ("water_temp_c", "water_temp_c_obs"),
-            ("conductivity","conductivity_obs"),
-            ("nitrate","nitrate_obs"),
-            ("pathogen", "pathogen_obs"),
-            ("pH","pH_obs"),
-            ("total_suspended_solids", "total_suspended_solids_obs"),
-            ("dissolved_oxygen", "dissolved_oxygen_obs"),
-            ("carbonaceous_bod_fast", "carbonaceous_bod_fast_obs"),
-            ("total_kjeldahl_nitrogen", "total_kjeldahl_nitrogen_obs"),
-            ("ammonium", "ammonium_obs"),
-            ("total_phosphorus", "total_phosphorus_obs"),
-        ]
+            pesos = PESOS_DEFAULT
 
         resultados, kge_global = self.results_analyzer.calcular_kge_global(
             self.data_exp,
-            pares,
+            PARES_KGE,
             pesos
         )
 
@@ -298,6 +467,166 @@ class Q2KModel:
 
         return resultados, kge_global
 
+    def extraer_diel(self) -> Dict[str, Any]:
+        """
+        Extrae los resultados subdiarios (secciones diel) del archivo .out.
+
+        Returns:
+            Diccionario de Q2KResultsAnalyzer.leer_diel, guardado en self.diel
+        """
+        filepath_out = os.path.join(
+            self.config.header_dict['filedir'],
+            f"{self.config.header_dict['filename']}.out"
+        )
+        self.diel = self.results_analyzer.leer_diel(filepath_out)
+        return self.diel
+
+    def calcular_kge_diel(self, observados: Union[pd.DataFrame, str],
+                          pesos: Dict[str, float] = None):
+        """
+        Calcula el KGE de los resultados diel contra observaciones horarias.
+
+        Args:
+            observados: DataFrame o ruta CSV con X_QUAL2K, HORA y las columnas
+                        TEMPERATURA, OXIGENO_DISUELTO y/o pH (HW_ID opcional)
+            pesos: Diccionario con pesos por variable diel (None = PESOS_DIEL)
+
+        Returns:
+            Tuple (resultados_por_variable, kge_global)
+        """
+        print("=" * 70)
+        print('CÁLCULO DE MÉTRICAS DIEL (HORARIAS)')
+        print("=" * 70)
+
+        if isinstance(observados, str):
+            observados = pd.read_csv(observados)
+        if self.diel is None:
+            self.extraer_diel()
+        if pesos is None:
+            pesos = PESOS_DIEL
+
+        resultados, kge_global = self.results_analyzer.calcular_kge_diel(
+            self.diel,
+            observados,
+            PARES_DIEL,
+            pesos
+        )
+
+        print("KGE diel por variable:", resultados)
+        print("KGE diel global ponderado:", kge_global)
+        print(f'✅ Métricas diel calculadas satisfactoriamente')
+
+        return resultados, kge_global
+
+    def _preparar_escenario(self, indice: int, nombre: str, escenario: Dict[str, Any]) -> str:
+        """
+        Escribe el .q2k y message.DAT de un escenario en un workspace aislado.
+
+        El nombre del workspace lleva el índice del escenario y una versión
+        saneada y corta de su nombre (el nombre puede contener '/' o ser largo).
+
+        Returns:
+            Ruta del workspace del escenario
+        """
+        data = aplicar_escenario(self.q2k_data, escenario)
+        slug = re.sub(r'[^A-Za-z0-9_-]+', '_', str(nombre))[:32]
+        workspace = ws.crear_workspace(self.filepath, self.workspace_root,
+                                       prefijo=f'q2k_esc_{indice}_{slug}_')
+        data["header"]["filedir"] = workspace
+
+        ruta_q2k = os.path.join(workspace, f"{data['header']['filename']}.q2k")
+        self.file_writer.create_q2k_file(ruta_q2k, data)
+        self.file_writer.create_message(data["header"])
+        return workspace
+
+    def run_scenarios(self,
+                      scenarios: Union[Dict[str, Dict[str, Any]], List[Dict[str, Any]]],
+                      max_concurrentes: Optional[int] = None,
+                      conservar_workspaces: bool = False) -> pd.DataFrame:
+        """
+        Ejecuta un lote de escenarios en paralelo a partir del modelo configurado.
+
+        Cada escenario es un diccionario de modificaciones sobre header, rates,
+        reach_rates, point_sources o headwaters (ver escenarios.aplicar_escenario).
+        Cada uno se escribe en un workspace aislado y todas las simulaciones se
+        ejecutan concurrentemente con Q2KAsyncRunner.
+
+        Ejemplo:
+            model.configurar_modelo()
+            tabla = model.run_scenarios({
+                "base": {},
+                "caudal_bajo": {"headwaters": {0: {"QHw": 0.8}}},
+            })
+
+        Args:
+            scenarios: Diccionario {nombre: escenario} o lista de escenarios
+            max_concurrentes: Simulaciones simultáneas (None = número de CPUs)
+            conservar_workspaces: Si conservar los workspaces al terminar
+
+        Returns:
+            DataFrame en formato largo con columnas escenario,
+            'Distancia Longitudinal (km)', variable y valor
+        """
+        if not self.q2k_data:
+            raise RuntimeError("Debe ejecutar configurar_modelo() antes de run_scenarios()")
+
+        if isinstance(scenarios, list):
+            scenarios = {f"escenario_{i + 1}": esc for i, esc in enumerate(scenarios)}
+
+        print("=" * 70)
+        print(f'EJECUTANDO {len(scenarios)} ESCENARIOS')
+        print("=" * 70)
+
+        workspaces = {}
+        try:
+            for indice, (nombre, escenario) in enumerate(scenarios.items()):
+                workspaces[nombre] = self._preparar_escenario(indice, nombre, escenario)
+            nombres = {w: n for n, w in workspaces.items()}
+
+            runner = Q2KAsyncRunner(max_concurrentes=max_concurrentes)
+            filename = self.config.header_dict['filename']
+            tablas = []
+            self.errores_escenarios = {}
+
+            async def _ejecutar_y_procesar():
+                async for res in runner.ejecutar_lote(workspaces.values()):
+                    nombre = nombres[res["workspace"]]
+                    if res["error"]:
+                        self.errores_escenarios[nombre] = res["error"]
+                        print(f'⚠️ Escenario {nombre}: {res["error"]}')
+                        continue
+                    ruta_out = os.path.join(res["workspace"], f"{filename}.out")
+                    try:
+                        wq = self.results_analyzer.procesar_out_file(ruta_out)
+                    except Exception as e:
+                        self.errores_escenarios[nombre] = str(e)
+                        print(f'⚠️ Escenario {nombre}: {e}')
+                        continue
+                    largo = wq.melt(id_vars='Distancia Longitudinal (km)',
+                                    var_name='variable', value_name='valor')
+                    largo.insert(0, 'escenario', nombre)
+                    tablas.append(largo)
+
+            # Funciona también dentro de un bucle de eventos activo (Jupyter)
+            ejecutar_sincrono(_ejecutar_y_procesar())
+
+        finally:
+            if not conservar_workspaces:
+                for workspace in workspaces.values():
+                    ws.eliminar_workspace(workspace)
+
+        columnas = ['escenario', 'Distancia Longitudinal (km)', 'variable', 'valor']
+        if not tablas:
+            return pd.DataFrame(columns=columnas)
+
+        orden = {n: i for i, n in enumerate(scenarios)}
+        tabla = pd.concat(tablas, ignore_index=True)
+        tabla = tabla.sort_values('escenario', key=lambda c: c.map(orden),
+                                  kind='stable').reset_index(drop=True)
+
+        print(f'✅ {tabla["escenario"].nunique()} de {len(scenarios)} escenarios completados')
+        return tabla[columnas]
+
     def ejecutar_flujo_completo(self,
                                 archivo_excel: str = 'PlantillaBaseQ2K.xlsx',
                                 **kwargs):
@@ -0,0 +1,240 @@
+"""
+Ajuste del paso de tiempo (dtuser), la duración simulada (tf) y el método de
+integración (IMeth).
+
+Los scripts fijan dtuser = 4.1667E-03 d (6 min) y tf = 5 d sin comprobar si
+el sistema llega antes al estado estacionario o admite un paso mayor. El
+ajuste simula en paralelo (Q2KPipeline) un diseño factorial de dtuser × tf ×
+IMeth, compara cada perfil y su KGE con una referencia precisa y recomienda
+la combinación más barata dentro de las tolerancias.
+
+El costo relativo de una combinación es tf / dtuser × evaluaciones por paso
+del método (ver EVALUACIONES_METODO), dividido por el de la referencia; el
+tiempo medido de cada simulación también se reporta.
+
+La recomendación se guarda junto a la plantilla en ajuste_numerico.json;
+cargar_caso (CLI) la aplica al header de los casos de ese directorio y
+aplicar_ajuste_numerico hace lo mismo desde Python.
+"""
+import itertools
+import json
+import os
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from qual2k.core.malla import VARIABLES_MALLA, diferencia_perfil
+from qual2k.core.model import Q2KModel
+from qual2k.core.pipeline import Q2KPipeline
+from qual2k.processing.file_writer import escribir_atomico
+
+# Archivo con los ajustes recomendados, junto a la plantilla
+ARCHIVO_AJUSTE = 'ajuste_numerico.json'
+
+# Claves del header que ajusta el estudio
+CLAVES_AJUSTE = ('dtuser', 'tf', 'IMeth')
+
+# Evaluaciones de las derivadas por paso de cada método de integración
+EVALUACIONES_METODO = {
+    'Euler': 1,
+    'Runge-Kutta': 4,
+}
+
+
+def cargar_ajuste_numerico(filepath: str) -> Dict[str, Any]:
+    """
+    Lee los ajustes recomendados de un directorio de plantilla.
+
+    Args:
+        filepath: Directorio de la plantilla
+
+    Returns:
+        Diccionario {dtuser, tf, IMeth} (vacío si no hay ajuste guardado)
+    """
+    ruta = os.path.join(filepath, ARCHIVO_AJUSTE)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, 'r', encoding='utf-8') as f:
+        ajuste = json.load(f)
+    return {clave: ajuste[clave] for clave in CLAVES_AJUSTE if clave in ajuste}
+
+
+def aplicar_ajuste_numerico(header_dict: Dict[str, Any], filepath: str) -> Dict[str, Any]:
+    """
+    Devuelve una copia del header con los ajustes guardados en filepath.
+
+    Args:
+        header_dict: Diccionario con configuración del header
+        filepath: Directorio de la plantilla
+
+    Returns:
+        Nuevo header_dict (igual al original si no hay ajuste guardado)
+    """
+    return {**header_dict, **cargar_ajuste_numerico(filepath)}
+
+
+class AjustePasoTiempo:
+    """
+    Recomienda dtuser, tf e IMeth comparando un diseño factorial con una referencia.
+    """
+
+    def __init__(self, filepath: str, header_dict: Dict[str, Any],
+                 dtusers: Optional[Sequence[float]] = None,
+                 tfs: Optional[Sequence[float]] = None,
+                 metodos: Sequence[str] = ('Euler', 'Runge-Kutta'),
+                 referencia: Optional[Dict[str, Any]] = None,
+                 tolerancia_kge: float = 0.01,
+                 tolerancia_perfil: float = 0.05,
+                 variables: Optional[List[str]] = None,
+                 plantilla: str = 'PlantillaBaseQ2K.xlsx',
+                 q_cabecera: float = 1.06007E-06,
+                 pesos: Optional[Dict[str, float]] = None,
+                 workspace_root: Optional[str] = None,
+                 n_simuladores: Optional[int] = None,
+                 modelo: Optional[Q2KModel] = None):
+        """
+        Inicializa el ajuste.
+
+        Args:
+            filepath: Directorio con la plantilla y el ejecutable
+            header_dict: Diccionario con configuración del header
+            dtusers: Pasos de tiempo a probar en días (None = dtuser del header
+                     × 1, 2, 4 y 8)
+            tfs: Duraciones a probar en días (None = 1, 2, 3 y el tf del header)
+            metodos: Métodos de integración (claves de EVALUACIONES_METODO)
+            referencia: {dtuser, tf, IMeth} de la simulación de referencia
+                        (None = menor dtuser, mayor tf y Runge-Kutta si está)
+            tolerancia_kge: Diferencia absoluta máxima del KGE global
+            tolerancia_perfil: Diferencia máxima del perfil, como fracción del
+                               rango de cada variable en la referencia
+            variables: Columnas del perfil a comparar (None = VARIABLES_MALLA)
+            plantilla: Nombre del archivo Excel
+            q_cabecera: Caudal de cabecera
+            pesos: Pesos del KGE global (None = PESOS_DEFAULT)
+            workspace_root: Raíz de los workspaces (None = automática)
+            n_simuladores: Simulaciones FORTRAN simultáneas (None = CPUs disponibles)
+            modelo: Q2KModel ya configurado a usar como base
+        """
+        desconocidos = set(metodos) - set(EVALUACIONES_METODO)
+        if desconocidos:
+            raise KeyError(f"Métodos de integración no soportados: {sorted(desconocidos)} "
+                           f"(use {list(EVALUACIONES_METODO)})")
+
+        self.filepath = filepath
+        dtuser = float(header_dict['dtuser'])
+        tf = float(header_dict['tf'])
+        self.dtusers = sorted(dtusers) if dtusers is not None else [dtuser * k for k in (1, 2, 4, 8)]
+        self.tfs = sorted(tfs) if tfs is not None else sorted({1.0, 2.0, 3.0, tf})
+        self.metodos = list(metodos)
+        self.referencia = referencia or {
+            'dtuser': self.dtusers[0],
+            'tf': self.tfs[-1],
+            'IMeth': 'Runge-Kutta' if 'Runge-Kutta' in self.metodos else self.metodos[0],
+        }
+        self.tolerancia_kge = tolerancia_kge
+        self.tolerancia_perfil = tolerancia_perfil
+        self.variables = variables or VARIABLES_MALLA
+
+        self.pipeline = Q2KPipeline(filepath, header_dict, plantilla=plantilla,
+                                    q_cabecera=q_cabecera, pesos=pesos,
+                                    workspace_root=workspace_root,
+                                    n_simuladores=n_simuladores, devolver_perfil=True,
+                                    modelo=modelo)
+
+        self.resultados: Optional[pd.DataFrame] = None
+        self.recomendacion: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def costo(ajuste: Dict[str, Any]) -> float:
+        """Pasos de integración × evaluaciones por paso de una combinación."""
+        return ajuste['tf'] / ajuste['dtuser'] * EVALUACIONES_METODO[ajuste['IMeth']]
+
+    def diseno(self) -> List[Dict[str, Any]]:
+        """
+        Combinaciones a simular: la referencia primero y luego el factorial
+        dtuser × tf × IMeth sin repetirla.
+
+        Returns:
+            Lista de dicts {dtuser, tf, IMeth}
+        """
+        combinaciones = [dict(self.referencia)]
+        for dtuser, tf, metodo in itertools.product(self.dtusers, self.tfs, self.metodos):
+            ajuste = {'dtuser': dtuser, 'tf': tf, 'IMeth': metodo}
+            if ajuste != combinaciones[0]:
+                combinaciones.append(ajuste)
+        return combinaciones
+
+    def ejecutar(self, guardar: bool = True) -> Dict[str, Any]:
+        """
+        Simula el diseño en paralelo y elige la combinación más barata dentro de tolerancia.
+
+        Args:
+            guardar: Si escribir la recomendación en ajuste_numerico.json
+                     junto a la plantilla
+
+        Returns:
+            Diccionario con dtuser, tf, IMeth, costo_relativo, dif_kge,
+            dif_perfil y referencia
+        """
+        print("=" * 70)
+        print('AJUSTE DE PASO DE TIEMPO, DURACIÓN Y MÉTODO DE INTEGRACIÓN')
+        print("=" * 70)
+
+        combinaciones = self.diseno()
+        corridas = {r['indice']: r for r in
+                    self.pipeline.evaluate_many({'header': c} for c in combinaciones)}
+
+        referencia = corridas[0]
+        if referencia['error'] is not None:
+            raise RuntimeError(f"Falló la simulación de referencia: {referencia['error']}")
+        costo_referencia = self.costo(self.referencia)
+
+        filas = []
+        for i, ajuste in enumerate(combinaciones):
+            r = corridas[i]
+            fila = {
+                **ajuste,
+                'costo_relativo': self.costo(ajuste) / costo_referencia,
+                'kge': np.nan,
+                'dif_kge': np.nan,
+                'dif_perfil': np.nan,
+                'tiempo_simulacion_s': r['tiempos'].get('simular', np.nan),
+                'error': r['error'],
+            }
+            if r['error'] is None:
+                fila['kge'] = r['kge']
+                fila['dif_kge'] = abs(r['kge'] - referencia['kge'])
+                fila['dif_perfil'] = diferencia_perfil(r['perfil'], referencia['perfil'],
+                                                       self.variables)
+            fila['cumple'] = bool(fila['dif_kge'] <= self.tolerancia_kge
+                                  and fila['dif_perfil'] <= self.tolerancia_perfil)
+            filas.append(fila)
+
+        self.resultados = (pd.DataFrame(filas)
+                           .sort_values(['costo_relativo', 'tiempo_simulacion_s'])
+                           .reset_index(drop=True))
+
+        # La referencia siempre cumple, así que hay al menos una candidata
+        mejor = self.resultados[self.resultados['cumple']].iloc[0]
+        self.recomendacion = {
+            'dtuser': float(mejor['dtuser']),
+            'tf': float(mejor['tf']),
+            'IMeth': mejor['IMeth'],
+            'costo_relativo': float(mejor['costo_relativo']),
+            'dif_kge': float(mejor['dif_kge']),
+            'dif_perfil': float(mejor['dif_perfil']),
+            'referencia': dict(self.referencia),
+        }
+
+        print(f"Combinaciones: {len(filas)} ({int(self.resultados['cumple'].sum())} dentro de tolerancia)")
+        print(f"✅ Recomendado: dtuser={self.recomendacion['dtuser']:.6g} d, "
+              f"tf={self.recomendacion['tf']:g} d, IMeth={self.recomendacion['IMeth']} "
+              f"(costo ×{self.recomendacion['costo_relativo']:.3f} de la referencia)")
+
+        if guardar:
+            ruta = os.path.join(self.filepath, ARCHIVO_AJUSTE)
+            escribir_atomico(ruta, json.dumps(self.recomendacion, indent=1))
+            print(f'✅ Ajuste guardado en {ruta}')
+
+        return self.recomendacion
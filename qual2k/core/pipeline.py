@@ -0,0 +1,389 @@
+"""
+Evaluación en tubería (pipeline) de muchos conjuntos de parámetros.
+
+Cada evaluación tiene tres etapas:
+    1. preparar: workspace, q2k_data con las tasas del conjunto, .q2k y message.DAT
+    2. simular:  proceso FORTRAN (no usa el GIL mientras espera)
+    3. analizar: lectura del .out y cálculo del KGE
+
+En lugar de ejecutarlas en secuencia, cada etapa tiene sus propios hilos
+conectados por colas acotadas: mientras corre la simulación N, un hilo ya
+prepara la N+1 y otro analiza la salida de la N-1. La plantilla se lee y el
+modelo base se configura una sola vez.
+
+Uso básico:
+    pipeline = Q2KPipeline(filepath, header_dict)
+    for r in pipeline.evaluate_many([{'kn': 0.1}, {'kn': 0.2, 'kdc': [0.3] * 7}]):
+        print(r['indice'], r['kge'])
+    print(pipeline.utilizacion())
+"""
+import os
+import queue
+import threading
+import time
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from qual2k.core import workspace as ws
+from qual2k.core.escenarios import aplicar_escenario, BLOQUES_ESCENARIO
+from qual2k.core.model import Q2KModel, PESOS_DEFAULT, PARES_KGE
+from qual2k.core.recursos import cpus_disponibles
+from qual2k.core.simulator import Q2KSimulator
+from qual2k.analysis.results_analyzer import Q2KResultsAnalyzer
+
+# Parámetros por tramo aceptados en cada conjunto (ver generar_reach_rates_custom)
+PARAMETROS_TRAMO = ['kaaa', 'khc', 'kdcs', 'kdc', 'khn', 'kn', 'ki', 'khp', 'kdt']
+
+ETAPAS = ['preparar', 'simular', 'analizar']
+
+_FIN = object()
+
+
+class _ErrorEntrada:
+    """Excepción del iterable de entrada, reenviada al consumidor por la cola de salida."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class Q2KPipeline:
+    """
+    Ejecutor en tubería de evaluaciones (preparar → simular → analizar).
+    """
+
+    def __init__(self, filepath: str, header_dict: Dict[str, Any],
+                 plantilla: str = 'PlantillaBaseQ2K.xlsx',
+                 q_cabecera: float = 1.06007E-06,
+                 pesos: Optional[Dict[str, float]] = None,
+                 workspace_root: Optional[str] = None,
+                 n_simuladores: Optional[int] = None,
+                 n_preparadores: int = 1,
+                 n_analizadores: int = 1,
+                 devolver_perfil: bool = False,
+                 modelo: Optional[Q2KModel] = None):
+        """
+        Inicializa el pipeline (el modelo base se configura en la primera evaluación).
+
+        Args:
+            filepath: Directorio con la plantilla y el ejecutable
+            header_dict: Diccionario con configuración del header
+            plantilla: Nombre del archivo Excel
+            q_cabecera: Caudal de cabecera
+            pesos: Pesos del KGE global (None = PESOS_DEFAULT)
+            workspace_root: Raíz de los workspaces (None = automática)
+            n_simuladores: Simulaciones FORTRAN simultáneas (None = CPUs disponibles)
+            n_preparadores: Hilos de preparación
+            n_analizadores: Hilos de análisis
+            devolver_perfil: Si incluir el perfil longitudinal en cada resultado
+            modelo: Q2KModel ya configurado a usar como base (None = se carga
+                    la plantilla y se configura con q_cabecera)
+        """
+        self.filepath = filepath
+        self.header_dict = header_dict
+        self.plantilla = plantilla
+        self.q_cabecera = q_cabecera
+        self.pesos = pesos or PESOS_DEFAULT
+        self.workspace_root = ws.resolver_raiz_workspace(workspace_root)
+        self.n_simuladores = n_simuladores or cpus_disponibles()
+        self.n_preparadores = n_preparadores
+        self.n_analizadores = n_analizadores
+        self.devolver_perfil = devolver_perfil
+
+        self.modelo_base = modelo
+        self.data_obs = None
+        self.simulator = Q2KSimulator()
+
+        # Estadísticas de la última ejecución
+        self.tiempo_ocupado = dict.fromkeys(ETAPAS, 0.0)
+        self.duracion = 0.0
+        self.evaluaciones = 0
+        self._lock_estadisticas = threading.Lock()
+
+    def configurar_base(self) -> None:
+        """Carga la plantilla y configura el modelo base una sola vez."""
+        if self.modelo_base is None:
+            model = Q2KModel(self.filepath, dict(self.header_dict))
+            model.cargar_plantillas(self.plantilla)
+            model.configurar_modelo(q_cabecera=self.q_cabecera)
+            self.modelo_base = model
+        if self.data_obs is None:
+            self.data_obs = self.modelo_base.results_analyzer.preparar_datos_observados(
+                self.modelo_base.data_wq)
+
+    def construir_datos(self, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Construye el q2k_data de un conjunto a partir del modelo base.
+
+        Las claves de PARAMETROS_TRAMO (valor global o lista por tramo) generan
+        un bloque reach_rates nuevo; las de BLOQUES_ESCENARIO se aplican con
+        escenarios.aplicar_escenario.
+
+        Args:
+            parametros: Conjunto de parámetros y/o modificaciones de escenario
+
+        Returns:
+            Nuevo diccionario q2k_data
+        """
+        base = self.modelo_base.q2k_data
+        desconocidos = set(parametros) - set(PARAMETROS_TRAMO) - set(BLOQUES_ESCENARIO)
+        if desconocidos:
+            raise KeyError(f"Parámetros no soportados: {sorted(desconocidos)}")
+
+        escenario = {k: v for k, v in parametros.items() if k in BLOQUES_ESCENARIO}
+        data = aplicar_escenario(base, escenario) if escenario else dict(base)
+
+        tasas = {k: v for k, v in parametros.items() if k in PARAMETROS_TRAMO}
+        if tasas:
+            n = base['reach_data']['nr']
+            listas = {f'{nombre}_list': (list(valor) if isinstance(valor, (list, tuple))
+                                         else [valor] * n)
+                      for nombre, valor in tasas.items()}
+            data['reach_rates'] = self.modelo_base.config.generar_reach_rates_custom(n=n, **listas)
+        return data
+
+    def preparar(self, indice: int, parametros: Dict[str, Any]) -> str:
+        """
+        Etapa 1: crea el workspace y escribe el .q2k y message.DAT del conjunto.
+
+        Returns:
+            Ruta del workspace
+        """
+        base = self.modelo_base
+        workspace = ws.crear_workspace(self.filepath, self.workspace_root,
+                                       prefijo=f'q2k_pipe_{indice}_')
+        try:
+            data = self.construir_datos(parametros)
+            header = dict(data['header'], filedir=workspace)
+            data['header'] = header
+
+            ruta_q2k = os.path.join(workspace, f"{header['filename']}.q2k")
+            base.file_writer.create_q2k_file(ruta_q2k, data)
+            base.file_writer.create_message(header)
+        except BaseException:
+            ws.eliminar_workspace(workspace)
+            raise
+        return workspace
+
+    def simular(self, workspace: str) -> None:
+        """Etapa 2: ejecuta el FORTRAN en el workspace."""
+        self.simulator.ejecutar(os.path.join(workspace, ws.EJECUTABLE), cwd=workspace)
+
+    def analizar(self, workspace: str, analizador: Q2KResultsAnalyzer) -> Dict[str, Any]:
+        """
+        Etapa 3: lee el .out y calcula el KGE global.
+
+        Returns:
+            Diccionario con kge, kge_por_variable y perfil
+        """
+        ruta_out = os.path.join(workspace, f"{self.header_dict['filename']}.out")
+        perfil = analizador.procesar_out_file(ruta_out)
+        data_exp = analizador.combinar_modelados_observados(perfil, self.data_obs)
+        resultados, kge = analizador.calcular_kge_global(data_exp, PARES_KGE, self.pesos)
+        return {'kge': kge, 'kge_por_variable': resultados, 'perfil': perfil}
+
+    def _medir(self, etapa: str, funcion, *args):
+        """Ejecuta una etapa acumulando su tiempo ocupado."""
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args)
+        finally:
+            with self._lock_estadisticas:
+                self.tiempo_ocupado[etapa] += time.perf_counter() - inicio
+
+    @staticmethod
+    def _poner(cola: queue.Queue, item, detener: threading.Event) -> bool:
+        """Pone un elemento en una cola acotada sin bloquear si se pidió detener."""
+        while not detener.is_set():
+            try:
+                cola.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _obtener(cola: queue.Queue, detener: threading.Event):
+        """Obtiene un elemento de una cola; devuelve el marcador de fin si se pidió detener."""
+        while not detener.is_set():
+            try:
+                return cola.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _FIN
+
+    def evaluate_many(self, conjuntos: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Evalúa conjuntos de parámetros en tubería y entrega los resultados a medida
+        que terminan (orden de finalización).
+
+        Args:
+            conjuntos: Iterable de {parametro: valor global o lista por tramo}
+                       con parametro en PARAMETROS_TRAMO, y/o bloques de escenario
+                       (ver construir_datos); se consume de forma perezosa
+
+        Yields:
+            Diccionario con indice, parametros, kge, kge_por_variable, perfil
+            (si devolver_perfil), tiempos por etapa (s) y error (o None)
+
+        Raises:
+            Exception: La que lance el iterable de entrada, tras detener los hilos
+        """
+        self.configurar_base()
+        self.tiempo_ocupado = dict.fromkeys(ETAPAS, 0.0)
+        self.evaluaciones = 0
+
+        # Colas acotadas: la preparación se adelanta como mucho una ronda
+        cola_sim = queue.Queue(maxsize=self.n_simuladores)
+        cola_ana = queue.Queue(maxsize=self.n_simuladores)
+        salida = queue.Queue()
+        detener = threading.Event()
+
+        entrada = enumerate(conjuntos)
+        lock_entrada = threading.Lock()
+        activos = {'preparar': self.n_preparadores, 'simular': self.n_simuladores,
+                   'analizar': self.n_analizadores}
+        lock_activos = threading.Lock()
+
+        def _terminar(etapa, cola, n_siguientes):
+            # El último hilo de la etapa avisa el fin a la siguiente
+            with lock_activos:
+                activos[etapa] -= 1
+                ultimo = activos[etapa] == 0
+            if ultimo:
+                for _ in range(n_siguientes):
+                    self._poner(cola, _FIN, detener)
+
+        def _fallo(item, etapa, error):
+            item['error'] = f'{etapa}: {type(error).__name__}: {error}'
+            item['kge'] = -999
+            if item.get('workspace'):
+                ws.eliminar_workspace(item['workspace'])
+            salida.put(item)
+
+        # Cada etapa avisa su fin en un finally: si un hilo muere, las
+        # siguientes etapas y el consumidor no quedan esperando para siempre
+        def _preparador():
+            try:
+                while not detener.is_set():
+                    try:
+                        with lock_entrada:
+                            siguiente = next(entrada, None)
+                    except Exception as e:
+                        # Falla del iterable de entrada: se relanza en el consumidor
+                        salida.put(_ErrorEntrada(e))
+                        break
+                    if siguiente is None:
+                        break
+                    indice, parametros = siguiente
+                    item = {'indice': indice, 'parametros': parametros, 'tiempos': {}}
+                    inicio = time.perf_counter()
+                    try:
+                        item['workspace'] = self._medir('preparar', self.preparar, indice, parametros)
+                    except Exception as e:
+                        _fallo(item, 'preparar', e)
+                        continue
+                    item['tiempos']['preparar'] = time.perf_counter() - inicio
+                    if not self._poner(cola_sim, item, detener):
+                        ws.eliminar_workspace(item['workspace'])
+            finally:
+                _terminar('preparar', cola_sim, self.n_simuladores)
+
+        def _simulador():
+            try:
+                while True:
+                    item = self._obtener(cola_sim, detener)
+                    if item is _FIN:
+                        break
+                    inicio = time.perf_counter()
+                    try:
+                        self._medir('simular', self.simular, item['workspace'])
+                    except Exception as e:
+                        _fallo(item, 'simular', e)
+                        continue
+                    item['tiempos']['simular'] = time.perf_counter() - inicio
+                    if not self._poner(cola_ana, item, detener):
+                        ws.eliminar_workspace(item['workspace'])
+            finally:
+                _terminar('simular', cola_ana, self.n_analizadores)
+
+        def _analizador():
+            try:
+                analizador = Q2KResultsAnalyzer()
+                while True:
+                    item = self._obtener(cola_ana, detener)
+                    if item is _FIN:
+                        break
+                    inicio = time.perf_counter()
+                    try:
+                        item.update(self._medir('analizar', self.analizar, item['workspace'], analizador))
+                    except Exception as e:
+                        _fallo(item, 'analizar', e)
+                        continue
+                    item['tiempos']['analizar'] = time.perf_counter() - inicio
+                    ws.eliminar_workspace(item['workspace'])
+                    item['error'] = None
+                    salida.put(item)
+            finally:
+                _terminar('analizar', salida, 1)
+
+        hilos = ([threading.Thread(target=_preparador, daemon=True) for _ in range(self.n_preparadores)]
+                 + [threading.Thread(target=_simulador, daemon=True) for _ in range(self.n_simuladores)]
+                 + [threading.Thread(target=_analizador, daemon=True) for _ in range(self.n_analizadores)])
+
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        try:
+            while True:
+                item = salida.get()
+                if item is _FIN:
+                    break
+                if isinstance(item, _ErrorEntrada):
+                    raise item.error
+                item.pop('workspace', None)
+                if not self.devolver_perfil:
+                    item.pop('perfil', None)
+                self.evaluaciones += 1
+                yield item
+        finally:
+            # Si el consumidor deja de iterar, los hilos terminan su trabajo en curso
+            detener.set()
+            for hilo in hilos:
+                hilo.join()
+            # Workspaces preparados o simulados que quedaron sin analizar
+            for cola in (cola_sim, cola_ana):
+                while not cola.empty():
+                    item = cola.get_nowait()
+                    if item is not _FIN:
+                        ws.eliminar_workspace(item['workspace'])
+            self.duracion = time.perf_counter() - inicio
+
+    def evaluar(self, conjuntos: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Versión no perezosa de evaluate_many, con los resultados en el orden de entrada."""
+        return sorted(self.evaluate_many(conjuntos), key=lambda r: r['indice'])
+
+    def utilizacion(self) -> Dict[str, Any]:
+        """
+        Utilización de cada etapa en la última ejecución.
+
+        La utilización es el tiempo ocupado de la etapa dividido por
+        (duración × hilos de la etapa); la etapa de simulación cercana a 1
+        indica que el FORTRAN nunca espera a Python.
+
+        Returns:
+            Diccionario con duracion_s, evaluaciones, evaluaciones_por_s y,
+            por etapa, ocupado_s, hilos y utilizacion
+        """
+        hilos = {'preparar': self.n_preparadores, 'simular': self.n_simuladores,
+                 'analizar': self.n_analizadores}
+        duracion = max(self.duracion, 1e-9)
+        return {
+            'duracion_s': self.duracion,
+            'evaluaciones': self.evaluaciones,
+            'evaluaciones_por_s': self.evaluaciones / duracion,
+            'etapas': {
+                etapa: {'ocupado_s': self.tiempo_ocupado[etapa],
+                        'hilos': hilos[etapa],
+                        'utilizacion': self.tiempo_ocupado[etapa] / (duracion * hilos[etapa])}
+                for etapa in ETAPAS
+            },
+        }
@@ -0,0 +1,154 @@
+import math
+import os
+from typing import List, Optional
+
+# Archivos de cuota de CPU de cgroups (v2 y v1)
+CGROUP_V2_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+CGROUP_V1_QUOTA = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
+CGROUP_V1_PERIODO = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
+
+# Una concurrencia se considera equivalente a la mejor si alcanza esta fracción
+# de su rendimiento (se prefiere la menor para no saturar la máquina)
+TOLERANCIA_RENDIMIENTO = 0.95
+
+
+def cpus_afinidad() -> List[int]:
+    """
+    CPUs en las que el proceso actual puede ejecutarse.
+
+    Returns:
+        Lista ordenada de índices de CPU (afinidad del proceso si el sistema la
+        expone, si no todas las CPUs)
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cuota_cgroup() -> Optional[float]:
+    """
+    Cuota de CPU del contenedor según cgroups (cpu.max o cfs_quota_us).
+
+    Returns:
+        Número de CPUs (fraccionario) permitido o None si no hay límite
+    """
+    try:
+        with open(CGROUP_V2_CPU_MAX) as f:
+            quota, periodo = f.read().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(periodo)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open(CGROUP_V1_QUOTA) as f:
+            quota = int(f.read())
+        with open(CGROUP_V1_PERIODO) as f:
+            periodo = int(f.read())
+        if quota > 0 and periodo > 0:
+            return quota / periodo
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def cpus_disponibles() -> int:
+    """
+    CPUs utilizables: mínimo entre la afinidad del proceso y la cuota del cgroup.
+
+    Returns:
+        Número de CPUs (al menos 1)
+    """
+    n = len(cpus_afinidad())
+    cuota = cuota_cgroup()
+    if cuota is not None:
+        n = min(n, math.ceil(cuota))
+    return max(1, n)
+
+
+def workers_recomendados(maximo: Optional[int] = None) -> int:
+    """
+    Número de workers de simulación recomendado.
+
+    Cada worker pasa la mayor parte del tiempo esperando a su proceso FORTRAN,
+    de modo que worker y ejecutable comparten una CPU: se usa un worker por CPU
+    disponible.
+
+    Args:
+        maximo: Límite superior opcional
+
+    Returns:
+        Número de workers (al menos 1)
+    """
+    n = cpus_disponibles()
+    if maximo is not None:
+        n = min(n, maximo)
+    return max(1, n)
+
+
+def fijar_cpu(cpu: int) -> bool:
+    """
+    Fija el proceso actual a una CPU. Los procesos hijos (el ejecutable FORTRAN)
+    heredan la afinidad.
+
+    Args:
+        cpu: Índice de la CPU
+
+    Returns:
+        True si se pudo fijar la afinidad
+    """
+    if not hasattr(os, 'sched_setaffinity'):
+        return False
+    try:
+        os.sched_setaffinity(0, {cpu})
+        return True
+    except OSError:
+        return False
+
+
+def inicializar_worker_fijado(contador, cpus: List[int]) -> None:
+    """
+    Inicializador de multiprocessing.Pool que fija cada worker a una CPU distinta.
+
+    Args:
+        contador: multiprocessing.Value('i') compartido para repartir las CPUs
+        cpus: CPUs disponibles (en orden de asignación)
+    """
+    with contador.get_lock():
+        indice = contador.value
+        contador.value += 1
+    fijar_cpu(cpus[indice % len(cpus)])
+
+
+def elegir_concurrencia(rendimientos: dict,
+                        tolerancia: float = TOLERANCIA_RENDIMIENTO) -> int:
+    """
+    Elige la concurrencia a partir del rendimiento medido de cada nivel.
+
+    Args:
+        rendimientos: {concurrencia: simulaciones por segundo}
+        tolerancia: Fracción del mejor rendimiento considerada equivalente
+
+    Returns:
+        Menor concurrencia cuyo rendimiento alcanza tolerancia * el mejor
+    """
+    mejor = max(rendimientos.values())
+    return min(n for n, r in rendimientos.items() if r >= tolerancia * mejor)
+
+
+def niveles_concurrencia(maximo: int) -> List[int]:
+    """
+    Niveles de concurrencia a medir: potencias de 2 hasta el máximo, y el máximo.
+
+    Args:
+        maximo: Número de workers del pool
+
+    Returns:
+        Lista creciente de niveles
+    """
+    niveles = [2 ** i for i in range(int(math.log2(max(1, maximo))) + 1)]
+    if niveles[-1] != maximo:
+        niveles.append(maximo)
+    # Con muchos workers se descartan los niveles más bajos (poco informativos)
+    return [n for n in niveles if n >= maximo // 8] or [maximo]
@@ -0,0 +1,397 @@
+"""
+Optimización de reducción de cargas de vertimientos (tipo TMDL).
+
+Pregunta: ¿cuál es la menor reducción de la carga de DBO5 y/o nitrógeno
+amoniacal de cada vertimiento que mantiene el oxígeno disuelto por encima de
+un estándar en todo el perfil?
+
+Variables de decisión: fracción de reducción r de cada (fuente, contaminante),
+aplicada como multiplicador (1 - r) a las concentraciones de point_sources.
+Objetivo: minimizar el costo total = Σ r · carga actual (kg/d) · costo por kg/d.
+Restricción: OD(x) >= od_minimo en todo el perfil de procesar_out_file.
+
+La búsqueda usa un algoritmo genético (pygad) con las reglas de factibilidad
+de Deb: toda solución factible supera a toda infactible, las factibles se
+ordenan por costo y las infactibles por déficit de OD. Cada generación se
+evalúa como un lote en paralelo con Q2KPipeline, y la mejor solución factible
+se pule al final reduciendo de a un paso cada variable mientras siga siendo
+factible.
+"""
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from qual2k.core.escenarios import _seleccionar
+from qual2k.core.model import Q2KModel
+from qual2k.core.pipeline import Q2KPipeline
+
+# Contaminante de la hoja SOURCES -> (campos de point_sources que escala,
+# campo usado para la carga, factor Q[m3/s]·C -> kg/d según las unidades del campo)
+CONTAMINANTES = {
+    'DBO5': (['CBODf', 'CBODs'], 'CBODf', 86.4),            # mg/L
+    'NITROGENO_AMONIACAL': (['NH4'], 'NH4', 0.0864),        # µgN/L
+}
+
+COLUMNA_DISTANCIA = 'Distancia Longitudinal (km)'
+COLUMNA_OD = 'dissolved_oxygen'
+
+# Aptitud de una simulación fallida (peor que cualquier infactible)
+APTITUD_FALLIDA = -1e12
+
+
+class OptimizadorCargas:
+    """
+    Busca la asignación de reducciones de carga más barata que cumple el OD mínimo.
+    """
+
+    def __init__(self, filepath: str, header_dict: Dict[str, Any],
+                 od_minimo: float = 4.0,
+                 contaminantes: Sequence[str] = ('DBO5', 'NITROGENO_AMONIACAL'),
+                 fuentes: Optional[List[Union[int, str]]] = None,
+                 reduccion_maxima: float = 0.9,
+                 resolucion: float = 0.05,
+                 costos: Optional[Dict[str, float]] = None,
+                 rango_distancias: Optional[Tuple[float, float]] = None,
+                 num_generations: int = 30,
+                 population_size: int = 20,
+                 num_parents_mating: int = 8,
+                 keep_elitism: int = 2,
+                 mutation_probability: float = 0.2,
+                 random_seed: Optional[int] = None,
+                 pulir: bool = True,
+                 plantilla: str = 'PlantillaBaseQ2K.xlsx',
+                 q_cabecera: float = 1.06007E-06,
+                 workspace_root: Optional[str] = None,
+                 n_simuladores: Optional[int] = None,
+                 modelo: Optional[Q2KModel] = None):
+        """
+        Inicializa el optimizador.
+
+        Args:
+            filepath: Directorio con la plantilla y el ejecutable
+            header_dict: Diccionario con configuración del header
+            od_minimo: Estándar de oxígeno disuelto (mg/L)
+            contaminantes: Columnas de la hoja SOURCES a reducir (ver CONTAMINANTES)
+            fuentes: Índices (base 0) o nombres de las fuentes a considerar
+                     (None = todos los vertimientos con carga)
+            reduccion_maxima: Reducción máxima permitida por variable (0-1)
+            resolucion: Paso de las reducciones (0.05 = múltiplos de 5 %)
+            costos: Costo por kg/d removido de cada contaminante (defecto 1)
+            rango_distancias: (km mínimo, km máximo) donde se exige el estándar
+                              (None = todo el perfil)
+            num_generations: Generaciones del algoritmo genético
+            population_size: Soluciones por generación (tamaño del lote paralelo)
+            num_parents_mating: Padres por generación
+            keep_elitism: Soluciones élite conservadas
+            mutation_probability: Probabilidad de mutación por gen
+            random_seed: Semilla aleatoria
+            pulir: Si aplicar la búsqueda local final
+            plantilla: Nombre del archivo Excel
+            q_cabecera: Caudal de cabecera
+            workspace_root: Raíz de los workspaces (None = automática)
+            n_simuladores: Simulaciones FORTRAN simultáneas (None = CPUs disponibles)
+            modelo: Q2KModel ya configurado a usar como base
+        """
+        desconocidos = set(contaminantes) - set(CONTAMINANTES)
+        if desconocidos:
+            raise KeyError(f"Contaminantes no soportados: {sorted(desconocidos)} "
+                           f"(use {list(CONTAMINANTES)})")
+        if not 0 < reduccion_maxima <= 1:
+            raise ValueError("reduccion_maxima debe estar en (0, 1]")
+
+        self.od_minimo = od_minimo
+        self.contaminantes = list(contaminantes)
+        self.fuentes = fuentes
+        self.reduccion_maxima = reduccion_maxima
+        self.resolucion = resolucion
+        self.costos = {c: 1.0 for c in self.contaminantes}
+        self.costos.update(costos or {})
+        self.rango_distancias = rango_distancias
+
+        self.num_generations = num_generations
+        self.population_size = population_size
+        self.num_parents_mating = num_parents_mating
+        self.keep_elitism = keep_elitism
+        self.mutation_probability = mutation_probability
+        self.random_seed = random_seed
+        self.pulir = pulir
+
+        self.pipeline = Q2KPipeline(filepath, header_dict, plantilla=plantilla,
+                                    q_cabecera=q_cabecera, workspace_root=workspace_root,
+                                    n_simuladores=n_simuladores, devolver_perfil=True,
+                                    modelo=modelo)
+
+        self.variables = []     # (índice de fuente, nombre, contaminante, carga kg/d)
+        self.evaluaciones = {}  # reducciones (tupla) -> resultado
+        self.historial = []
+        self.mejor = None
+
+    def _seleccionar_variables(self) -> None:
+        """Define una variable por (fuente, contaminante) con carga positiva."""
+        fuentes = self.pipeline.modelo_base.q2k_data['point_sources']['sources']
+        if self.fuentes is None:
+            seleccion = [f for f in fuentes if f['Qptt'] > 0]
+        else:
+            seleccion = [f for clave in self.fuentes
+                         for f in _seleccionar(fuentes, clave, 'PtName')]
+        indices = [next(i for i, f in enumerate(fuentes) if f is s) for s in seleccion]
+
+        self.variables = []
+        for i in dict.fromkeys(indices):
+            fuente = fuentes[i]
+            medias = {c['name']: c['mean'] for c in fuente['constituents']}
+            for contaminante in self.contaminantes:
+                _, campo_carga, factor = CONTAMINANTES[contaminante]
+                carga = fuente['Qptt'] * medias.get(campo_carga, 0) * factor
+                if carga > 0:
+                    self.variables.append((i, str(fuente['PtName']).strip(), contaminante, carga))
+
+        if not self.variables:
+            raise ValueError("Ninguna fuente seleccionada tiene carga de los contaminantes indicados")
+
+    def _costo(self, reducciones: np.ndarray) -> float:
+        """Costo de una asignación: Σ r · carga · costo unitario."""
+        return float(sum(r * carga * self.costos[contaminante]
+                         for r, (_, _, contaminante, carga) in zip(reducciones, self.variables)))
+
+    def construir_escenario(self, reducciones: Sequence[float]) -> Dict[str, Any]:
+        """
+        Escenario de point_sources para una asignación de reducciones.
+
+        Args:
+            reducciones: Fracción de reducción de cada variable
+
+        Returns:
+            Diccionario {'point_sources': {índice: {campo: valor}}}
+        """
+        fuentes = self.pipeline.modelo_base.q2k_data['point_sources']['sources']
+        cambios = {}
+        for r, (i, _, contaminante, _) in zip(reducciones, self.variables):
+            medias = {c['name']: c['mean'] for c in fuentes[i]['constituents']}
+            for campo in CONTAMINANTES[contaminante][0]:
+                cambios.setdefault(i, {})[campo] = medias[campo] * (1 - float(r))
+        return {'point_sources': cambios}
+
+    def _deficit(self, perfil: pd.DataFrame) -> Tuple[float, float]:
+        """Déficit acumulado de OD respecto al estándar y OD mínimo en el rango exigido."""
+        od = perfil[COLUMNA_OD]
+        if self.rango_distancias is not None:
+            x = perfil[COLUMNA_DISTANCIA]
+            od = od[(x >= min(self.rango_distancias)) & (x <= max(self.rango_distancias))]
+        od = od.dropna()
+        if od.empty:
+            return np.inf, np.nan
+        return float(np.maximum(self.od_minimo - od, 0).sum()), float(od.min())
+
+    def _clave(self, reducciones) -> tuple:
+        """Clave de caché: reducciones redondeadas a la resolución."""
+        return tuple(float(v) for v in self._ajustar(reducciones))
+
+    def _ajustar(self, reducciones) -> np.ndarray:
+        """Lleva las reducciones a la malla de resolución dentro de [0, reduccion_maxima]."""
+        r = np.clip(np.asarray(reducciones, dtype=float), 0, self.reduccion_maxima)
+        if self.resolucion:
+            r = np.round(np.round(r / self.resolucion) * self.resolucion, 10)
+            r = np.minimum(r, self.reduccion_maxima)
+        return r
+
+    def evaluar_lote(self, soluciones: Sequence[Sequence[float]]) -> List[Dict[str, Any]]:
+        """
+        Evalúa un lote de asignaciones en paralelo (con caché de repetidas).
+
+        Args:
+            soluciones: Lista de vectores de reducción
+
+        Returns:
+            Lista de resultados (reducciones, costo, deficit, od_min, factible, error)
+        """
+        claves = [self._clave(s) for s in soluciones]
+        pendientes = list(dict.fromkeys(c for c in claves if c not in self.evaluaciones))
+
+        if pendientes:
+            conjuntos = (self.construir_escenario(c) for c in pendientes)
+            for r in self.pipeline.evaluate_many(conjuntos):
+                clave = pendientes[r['indice']]
+                if r['error'] is None:
+                    deficit, od_min = self._deficit(r['perfil'])
+                else:
+                    deficit, od_min = np.inf, np.nan
+                self.evaluaciones[clave] = {
+                    'reducciones': np.array(clave),
+                    'costo': self._costo(clave),
+                    'deficit': deficit,
+                    'od_min': od_min,
+                    'factible': deficit == 0,
+                    'error': r['error'],
+                }
+                self._actualizar_mejor(self.evaluaciones[clave])
+
+        return [self.evaluaciones[c] for c in claves]
+
+    def _actualizar_mejor(self, resultado: Dict[str, Any]) -> None:
+        """Conserva la mejor solución según las reglas de factibilidad."""
+        if self.mejor is None or self._aptitud(resultado) > self._aptitud(self.mejor):
+            self.mejor = resultado
+
+    def _aptitud(self, resultado: Dict[str, Any]) -> float:
+        """
+        Aptitud con reglas de factibilidad de Deb en un solo escalar.
+
+        Factibles: -costo (en [-costo_max, 0]). Infactibles: por debajo de
+        -costo_max y ordenadas por déficit de OD, sin importar el costo.
+        """
+        if resultado['error'] is not None or not np.isfinite(resultado['deficit']):
+            return APTITUD_FALLIDA
+        if resultado['factible']:
+            return -resultado['costo']
+        return -self._costo_maximo * (1 + resultado['deficit']) - 1
+
+    def _fitness_lote(self, ga, soluciones, indices) -> List[float]:
+        """Función de aptitud por lotes para pygad."""
+        return [self._aptitud(r) for r in self.evaluar_lote(soluciones)]
+
+    def _on_generation(self, ga) -> None:
+        """Registra el avance de cada generación."""
+        mejor = self.mejor
+        self.historial.append({
+            'generacion': ga.generations_completed,
+            'costo': mejor['costo'] if mejor['factible'] else np.nan,
+            'od_min': mejor['od_min'],
+            'factible': mejor['factible'],
+            'simulaciones': len(self.evaluaciones),
+        })
+        estado = (f"costo={mejor['costo']:.2f}" if mejor['factible']
+                  else f"sin solución factible (déficit={mejor['deficit']:.3f})")
+        print(f"Generación {ga.generations_completed}/{self.num_generations}: {estado}, "
+              f"OD mín={mejor['od_min']:.2f} mg/L, {len(self.evaluaciones)} simulaciones")
+
+    def _pulir(self) -> None:
+        """
+        Búsqueda local: en cada ronda se prueba bajar un paso cada variable con
+        reducción (un lote paralelo) y se acepta el cambio factible que más
+        ahorra, hasta que ninguno lo sea.
+        """
+        paso = self.resolucion or self.reduccion_maxima / 20
+        actual = self.mejor
+        while True:
+            candidatos = []
+            for j in np.flatnonzero(actual['reducciones'] > 0):
+                r = actual['reducciones'].copy()
+                r[j] = max(0.0, r[j] - paso)
+                candidatos.append(r)
+            if not candidatos:
+                break
+
+            factibles = [c for c in self.evaluar_lote(candidatos) if c['factible']]
+            if not factibles:
+                break
+            actual = min(factibles, key=lambda c: c['costo'])
+            print(f"Pulido: costo={actual['costo']:.2f}, OD mín={actual['od_min']:.2f} mg/L")
+        self.mejor = actual
+
+    def optimizar(self) -> Optional[Dict[str, Any]]:
+        """
+        Ejecuta la optimización.
+
+        Primero evalúa los extremos (sin reducción y reducción máxima): si sin
+        reducción ya se cumple el estándar, o si ni la reducción máxima lo
+        cumple, se informa sin ejecutar el algoritmo genético.
+
+        Returns:
+            Mejor resultado (reducciones, costo, deficit, od_min, factible) o
+            None si ninguna simulación terminó
+        """
+        import pygad
+
+        print("=" * 70)
+        print(f'OPTIMIZACIÓN DE REDUCCIÓN DE CARGAS (OD >= {self.od_minimo} mg/L)')
+        print("=" * 70)
+
+        self.pipeline.configurar_base()
+        self._seleccionar_variables()
+        n = len(self.variables)
+        self._costo_maximo = self._costo(np.full(n, self.reduccion_maxima))
+        print(f'Variables de decisión: {n} '
+              f'({len({v[0] for v in self.variables})} fuentes × {self.contaminantes})')
+
+        sin_reduccion, maxima = self.evaluar_lote([np.zeros(n), np.full(n, self.reduccion_maxima)])
+        if sin_reduccion['factible']:
+            print(f"✅ Sin reducciones el OD mínimo es {sin_reduccion['od_min']:.2f} mg/L: "
+                  f"no se requiere reducir cargas")
+            self.mejor = sin_reduccion
+            return self.mejor
+        if not maxima['factible']:
+            print(f"⚠️ Ni con la reducción máxima ({self.reduccion_maxima:.0%}) se cumple "
+                  f"el estándar (OD mín = {maxima['od_min']:.2f} mg/L)")
+            return self.mejor if self.mejor['error'] is None else None
+
+        gene_space = {'low': 0.0, 'high': self.reduccion_maxima}
+        if self.resolucion:
+            gene_space['step'] = self.resolucion
+
+        # Población inicial: la reducción máxima (factible) y reducciones uniformes
+        rng = np.random.default_rng(self.random_seed)
+        poblacion = self._ajustar(rng.uniform(0, self.reduccion_maxima,
+                                              (self.population_size, n)))
+        poblacion[0] = maxima['reducciones']
+        uniformes = np.linspace(self.reduccion_maxima, 0, min(self.population_size - 1, 5) + 1)[1:-1]
+        for k, nivel in enumerate(uniformes, start=1):
+            poblacion[k] = self._ajustar(np.full(n, nivel))
+
+        ga = pygad.GA(
+            num_generations=self.num_generations,
+            num_parents_mating=min(self.num_parents_mating, self.population_size),
+            fitness_func=self._fitness_lote,
+            fitness_batch_size=self.population_size,
+            initial_population=poblacion,
+            gene_space=gene_space,
+            parent_selection_type='tournament',
+            K_tournament=3,
+            crossover_type='uniform',
+            mutation_type='random',
+            mutation_probability=self.mutation_probability,
+            mutation_by_replacement=True,
+            keep_elitism=self.keep_elitism,
+            random_seed=self.random_seed,
+            on_generation=self._on_generation,
+            suppress_warnings=True,
+        )
+        try:
+            ga.run()
+        except KeyboardInterrupt:
+            print('\n¡OPTIMIZACIÓN INTERRUMPIDA POR USUARIO!\n')
+
+        if self.pulir and self.mejor['factible']:
+            self._pulir()
+
+        mejor = self.mejor
+        print("=" * 70)
+        print(f"✅ Mejor asignación factible: costo={mejor['costo']:.2f}, "
+              f"OD mín={mejor['od_min']:.2f} mg/L, {len(self.evaluaciones)} simulaciones")
+        print("=" * 70)
+        return mejor
+
+    def reporte(self) -> pd.DataFrame:
+        """
+        Asignación de la mejor solución por fuente y contaminante.
+
+        Returns:
+            DataFrame con fuente, indice, contaminante, carga_actual_kg_d,
+            reduccion_pct, carga_permitida_kg_d y costo
+        """
+        if self.mejor is None:
+            raise RuntimeError("Debe ejecutar optimizar() antes de reporte()")
+
+        filas = []
+        for r, (i, nombre, contaminante, carga) in zip(self.mejor['reducciones'], self.variables):
+            filas.append({
+                'fuente': nombre,
+                'indice': i,
+                'contaminante': contaminante,
+                'carga_actual_kg_d': carga,
+                'reduccion_pct': 100 * r,
+                'carga_permitida_kg_d': carga * (1 - r),
+                'costo': r * carga * self.costos[contaminante],
+            })
+        return pd.DataFrame(filas)
@@ -1,5 +1,33 @@
+import asyncio
+import concurrent.futures
 import subprocess
 import os
+import time
+from typing import Optional, Dict, Any, List, Iterable, AsyncIterator
+from qual2k.core.workspace import EJECUTABLE
+from qual2k.core.recursos import cpus_disponibles
+
+
+def ejecutar_sincrono(corrutina):
+    """
+    Ejecuta una corrutina hasta terminar desde código no asíncrono.
+
+    asyncio.run falla si el hilo ya tiene un bucle de eventos activo (p.ej. en
+    Jupyter); en ese caso la corrutina se ejecuta en un hilo aparte con su
+    propio bucle.
+
+    Args:
+        corrutina: Corrutina a ejecutar
+
+    Returns:
+        Resultado de la corrutina
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(corrutina)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ejecutor:
+        return ejecutor.submit(asyncio.run, corrutina).result()
 
 
 class Q2KSimulator:
@@ -8,15 +36,148 @@ class Q2KSimulator:
     """
 
     @staticmethod
-    def ejecutar(exe_path: str) -> None:
+    def ejecutar(exe_path: str, cwd: Optional[str] = None) -> None:
         """
         Ejecuta el ejecutable FORTRAN de QUAL2K.
 
         Args:
             exe_path: Ruta del ejecutable q2kfortran2_12.exe
+            cwd: Directorio de trabajo (workspace) donde se encuentra message.DAT
+                 (None = directorio del ejecutable)
         """
         if not os.path.exists(exe_path):
             raise FileNotFoundError(f"No se encontró el ejecutable: {exe_path}")
 
-        folder = os.path.dirname(exe_path)
-        subprocess.run([exe_path], cwd=folder, check=True)
\ No newline at end of file
+        folder = cwd or os.path.dirname(exe_path)
+        subprocess.run([exe_path], cwd=folder, check=True)
+
+
+class Q2KAsyncRunner:
+    """
+    Ejecuta muchas simulaciones FORTRAN de QUAL2K de forma concurrente desde un
+    solo proceso Python usando asyncio.
+
+    Cada workspace debe estar preparado previamente (message.DAT, .q2k y el
+    ejecutable o una ruta común al ejecutable). La concurrencia se limita con
+    un semáforo, de modo que nunca hay más de max_concurrentes procesos FORTRAN
+    activos.
+
+    Uso básico:
+        runner = Q2KAsyncRunner(max_concurrentes=8)
+        resultados = runner.ejecutar_lote_sync(workspaces)
+    """
+
+    def __init__(self, max_concurrentes: Optional[int] = None,
+                 exe_path: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        """
+        Inicializa el ejecutor asíncrono.
+
+        Args:
+            max_concurrentes: Número máximo de simulaciones simultáneas
+                              (None = CPUs disponibles para el proceso)
+            exe_path: Ejecutable común a usar cuando el workspace no contiene
+                      su propio q2kfortran2_12.exe
+            timeout: Tiempo máximo por simulación en segundos (None = sin límite)
+        """
+        self.max_concurrentes = max(1, max_concurrentes or cpus_disponibles())
+        self.exe_path = exe_path
+        self.timeout = timeout
+
+    def _resolver_ejecutable(self, workspace: str) -> str:
+        """Obtiene la ruta del ejecutable a usar para un workspace."""
+        exe_local = os.path.join(workspace, EJECUTABLE)
+        if os.path.exists(exe_local):
+            return exe_local
+        if self.exe_path and os.path.exists(self.exe_path):
+            return self.exe_path
+        raise FileNotFoundError(f"No se encontró el ejecutable para: {workspace}")
+
+    async def ejecutar(self, workspace: str) -> Dict[str, Any]:
+        """
+        Ejecuta una simulación en un workspace.
+
+        Args:
+            workspace: Directorio de trabajo preparado
+
+        Returns:
+            Diccionario con workspace, returncode, duracion (s) y error (o None)
+        """
+        inicio = time.perf_counter()
+        resultado = {"workspace": workspace, "returncode": None,
+                     "duracion": 0.0, "error": None}
+
+        try:
+            exe_path = self._resolver_ejecutable(workspace)
+            proceso = await asyncio.create_subprocess_exec(
+                exe_path,
+                cwd=workspace,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                _, stderr = await asyncio.wait_for(proceso.communicate(),
+                                                   timeout=self.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Simulación excedió {self.timeout} s")
+            finally:
+                # Timeout o cancelación (Ctrl-C, lote cancelado): el FORTRAN no
+                # debe seguir escribiendo en un workspace que se va a borrar
+                if proceso.returncode is None:
+                    try:
+                        proceso.kill()
+                    except ProcessLookupError:
+                        pass
+                    await proceso.wait()
+
+            resultado["returncode"] = proceso.returncode
+            if proceso.returncode != 0:
+                detalle = stderr.decode(errors="ignore").strip()[-500:]
+                resultado["error"] = f"Código de salida {proceso.returncode}: {detalle}"
+
+        except Exception as e:
+            resultado["error"] = str(e)
+
+        resultado["duracion"] = time.perf_counter() - inicio
+        return resultado
+
+    async def ejecutar_lote(self, workspaces: Iterable[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Ejecuta un lote de workspaces y entrega los resultados a medida que terminan.
+
+        Args:
+            workspaces: Directorios de trabajo preparados
+
+        Yields:
+            Diccionario de resultado de cada simulación (orden de finalización)
+        """
+        semaforo = asyncio.Semaphore(self.max_concurrentes)
+
+        async def _limitado(workspace: str) -> Dict[str, Any]:
+            async with semaforo:
+                return await self.ejecutar(workspace)
+
+        tareas = [asyncio.ensure_future(_limitado(w)) for w in workspaces]
+        try:
+            for tarea in asyncio.as_completed(tareas):
+                yield await tarea
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            # Esperar a que las tareas canceladas maten sus procesos
+            await asyncio.gather(*tareas, return_exceptions=True)
+
+    def ejecutar_lote_sync(self, workspaces: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Versión bloqueante de ejecutar_lote para código no asíncrono.
+
+        Args:
+            workspaces: Directorios de trabajo preparados
+
+        Returns:
+            Lista de resultados en orden de finalización
+        """
+        async def _recolectar() -> List[Dict[str, Any]]:
+            return [r async for r in self.ejecutar_lote(workspaces)]
+
+        return ejecutar_sincrono(_recolectar())
@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+# Raíz preferida: sistema de archivos en RAM (tmpfs) disponible en Linux
+RAIZ_TMPFS = '/dev/shm'
+
+# Espacio libre mínimo requerido en la raíz del workspace (MB)
+ESPACIO_MINIMO_MB = 64
+
+# Ejecutable FORTRAN que debe estar presente en cada workspace
+EJECUTABLE = 'q2kfortran2_12.exe'
+
+
+def espacio_libre_mb(ruta: str) -> float:
+    """
+    Calcula el espacio libre disponible en el sistema de archivos de una ruta.
+
+    Args:
+        ruta: Ruta de un directorio existente
+
+    Returns:
+        Espacio libre en MB
+    """
+    return shutil.disk_usage(ruta).free / (1024 * 1024)
+
+
+def _raiz_valida(ruta: str, espacio_minimo_mb: float) -> bool:
+    """Verifica que la raíz exista, sea escribible y tenga espacio suficiente."""
+    if not ruta or not os.path.isdir(ruta) or not os.access(ruta, os.W_OK):
+        return False
+    try:
+        return espacio_libre_mb(ruta) >= espacio_minimo_mb
+    except OSError:
+        return False
+
+
+def resolver_raiz_workspace(raiz: Optional[str] = None,
+                            espacio_minimo_mb: float = ESPACIO_MINIMO_MB) -> str:
+    """
+    Determina el directorio raíz donde se crearán los workspaces de simulación.
+
+    Orden de preferencia: la raíz indicada por el usuario, /dev/shm (RAM) y
+    finalmente el directorio temporal del sistema.
+
+    Args:
+        raiz: Raíz solicitada (None = automática)
+        espacio_minimo_mb: Espacio libre mínimo requerido en MB
+
+    Returns:
+        Ruta de la raíz seleccionada
+    """
+    candidatos = [raiz] if raiz else []
+    candidatos += [RAIZ_TMPFS, tempfile.gettempdir()]
+
+    for candidato in candidatos:
+        if _raiz_valida(candidato, espacio_minimo_mb):
+            if raiz and candidato != raiz:
+                print(f'⚠️ Raíz de workspace no disponible ({raiz}), usando {candidato}')
+            return candidato
+
+    # Último recurso: el directorio temporal aunque no cumpla el espacio mínimo
+    return tempfile.gettempdir()
+
+
+def vincular_archivo(origen: str, destino: str) -> None:
+    """
+    Hace disponible un archivo en otro directorio sin duplicarlo cuando es posible.
+
+    Intenta, en orden, un enlace duro, un enlace simbólico y una copia.
+
+    Args:
+        origen: Ruta del archivo original
+        destino: Ruta de destino
+    """
+    try:
+        os.link(origen, destino)
+        return
+    except OSError:
+        pass
+    try:
+        os.symlink(os.path.abspath(origen), destino)
+        return
+    except OSError:
+        pass
+    shutil.copy2(origen, destino)
+
+
+def crear_workspace(filepath: str,
+                    raiz: Optional[str] = None,
+                    prefijo: str = 'q2k_',
+                    archivos: Optional[List[str]] = None,
+                    espacio_minimo_mb: float = ESPACIO_MINIMO_MB) -> str:
+    """
+    Crea un directorio de trabajo aislado para una simulación.
+
+    El workspace contiene el ejecutable FORTRAN (enlazado o copiado) y los
+    archivos adicionales solicitados; el .q2k, message.DAT y las salidas se
+    escriben allí durante la ejecución.
+
+    Args:
+        filepath: Directorio de la plantilla que contiene el ejecutable
+        raiz: Raíz donde crear el workspace (None = automática)
+        prefijo: Prefijo del nombre del directorio
+        archivos: Nombres de archivos adicionales de filepath a incluir
+        espacio_minimo_mb: Espacio libre mínimo requerido en MB
+
+    Returns:
+        Ruta del workspace creado
+    """
+    raiz_final = resolver_raiz_workspace(raiz, espacio_minimo_mb)
+    workspace = tempfile.mkdtemp(prefix=prefijo, dir=raiz_final)
+
+    for nombre in [EJECUTABLE] + list(archivos or []):
+        origen = os.path.join(filepath, nombre)
+        if os.path.isfile(origen):
+            vincular_archivo(origen, os.path.join(workspace, nombre))
+
+    return workspace
+
+
+def eliminar_workspace(workspace: str) -> None:
+    """
+    Elimina un workspace y todo su contenido.
+
+    Args:
+        workspace: Ruta del workspace
+    """
+    shutil.rmtree(workspace, ignore_errors=True)
@@ -1,6 +1,58 @@
+import math
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Sequence, Union
+
+# Columna opcional de las hojas REACHES, SOURCES y WQ_DATA con el número de
+# cabecera (1 = cauce principal, 2.. = tributarios). Sin la columna todo es 1.
+COLUMNA_HW = 'HW_ID'
+
+# Columna opcional de REACHES con el número de elementos de cada tramo
+COLUMNA_ELEMENTOS = 'NUM_ELEMENTOS'
+
+
+def hw_ids(df: pd.DataFrame) -> List[int]:
+    """
+    Número de cabecera (HW_ID) de cada fila de una hoja.
+
+    Args:
+        df: DataFrame de REACHES, SOURCES o WQ_DATA
+
+    Returns:
+        Lista de enteros (1 si la hoja no tiene la columna o está vacía)
+    """
+    if COLUMNA_HW not in df.columns:
+        return [1] * len(df)
+    return [int(v) if pd.notna(v) else 1 for v in df[COLUMNA_HW]]
+
+
+def elementos_por_tramo(df: pd.DataFrame, numElem_default: int = 20,
+                        longitud_elemento: Optional[float] = None) -> List[int]:
+    """
+    Número de elementos (numElm) de cada tramo.
+
+    Con longitud_elemento cada tramo recibe ceil(longitud / longitud_elemento)
+    elementos (al menos 1); sin ella, numElem_default. Los valores de la
+    columna NUM_ELEMENTOS de REACHES, si existe, tienen prioridad.
+
+    Args:
+        df: DataFrame de REACHES
+        numElem_default: Elementos por tramo sin longitud_elemento
+        longitud_elemento: Longitud objetivo de cada elemento (km)
+
+    Returns:
+        Lista de enteros, uno por tramo
+    """
+    if longitud_elemento is not None:
+        longitudes = (df["X_QUAL2K_ARRIBA"] - df["X_QUAL2K_ABAJO"]).abs()
+        elementos = [max(1, math.ceil(round(l / longitud_elemento, 9))) for l in longitudes]
+    else:
+        elementos = [int(numElem_default)] * len(df)
+
+    if COLUMNA_ELEMENTOS in df.columns:
+        elementos = [int(v) if pd.notna(v) else e
+                     for v, e in zip(df[COLUMNA_ELEMENTOS], elementos)]
+    return elementos
 
 
 class Q2KDataProcessor:
@@ -19,6 +71,7 @@ class Q2KDataProcessor:
         Returns:
             Diccionario de fuentes puntuales
         """
+        ids_hw = hw_ids(df)
         df = df.fillna(0)
 
         # Cálculos auxiliares
@@ -74,7 +127,7 @@ class Q2KDataProcessor:
         # Construcción del diccionario
         sources_list = []
 
-        for i, row in df.iterrows():
+        for (i, row), hw_id in zip(df.iterrows(), ids_hw):
             constituents = [
                 {"name": "Cond", "mean": row.get("Cond", 0), "amp": 0, "maxtime": 0},
                 {"name": "ISS", "mean": row.get("ISS", 0), "amp": 0, "maxtime": 0},
@@ -100,7 +153,7 @@ class Q2KDataProcessor:
 
             source = {
                 "PtName": row.get("PtName", f"Vert_{i + 1}"),
-                "PtHwID": 1,
+                "PtHwID": hw_id,
                 "xptt": row.get("xptt", 0),
                 "Qptta": row.get("Qptta", 0),
                 "Qptt": row.get("Qptt", 0),
@@ -119,33 +172,48 @@ class Q2KDataProcessor:
 
     def crear_reach_dict(self, df: pd.DataFrame,
                          numElem_default: int = 20,
-                         Qcabecera: float = 1.06574E-06) -> Dict[str, Any]:
+                         Qcabecera: float = 1.06574E-06,
+                         longitud_elemento: Optional[float] = None,
+                         numelem: Optional[Sequence[int]] = None) -> Dict[str, Any]:
         """
         Crea el diccionario de tramos desde el DataFrame.
 
+        Con la columna HW_ID los tramos de cada cabecera deben ser consecutivos
+        y estar ordenados por cabecera (1 = cauce principal primero); nHw es
+        el número de cabeceras.
+
         Args:
             df: DataFrame con datos de tramos
             numElem_default: Número de elementos por tramo
             Qcabecera: Caudal de cabecera
+            longitud_elemento: Longitud objetivo de los elementos en km (ver
+                               elementos_por_tramo); None = numElem_default
+            numelem: Número de elementos de cada tramo (tiene prioridad)
 
         Returns:
-            Diccionario de tramos
+            Diccionario de tramos (ne = suma de numElm)
         """
+        if numelem is None:
+            numelem = elementos_por_tramo(df, numElem_default, longitud_elemento)
+        elif len(numelem) != len(df):
+            raise ValueError(f"numelem tiene {len(numelem)} valores para {len(df)} tramos")
+
+        grupos = self.grupos_tributarios(df)
         reach_dict = {
             "nr": len(df),
-            "nHw": 1,
-            "ne": int(numElem_default * len(df)),
+            "nHw": len(grupos),
+            "ne": int(sum(numelem)),
             "reaches": []
         }
 
-        for _, row in df.iterrows():
+        for (_, row), n_elementos in zip(df.iterrows(), numelem):
             tramo = {
                 "rlab1": str(row["EST_ARRIBA"]),
                 "rlab2": str(row["EST_ABAJO"]),
                 "rname": str(row["NOMBRE_TRAMO"]),
                 "xrup": float(row["X_QUAL2K_ARRIBA"]),
                 "xrdn": float(row["X_QUAL2K_ABAJO"]),
-                "numElm": int(numElem_default),
+                "numElm": int(n_elementos),
                 "elev1": float(row["ELEV_ARRIBA"]),
                 "elev2": float(row["ELEV_ABAJO"]),
                 "latd": 0, "latm": 0, "lats": 0,
@@ -166,22 +234,96 @@ class Q2KDataProcessor:
 
         return reach_dict
 
+    @staticmethod
+    def grupos_tributarios(df_tramo: pd.DataFrame) -> Dict[int, List[int]]:
+        """
+        Agrupa los tramos por cabecera (columna HW_ID).
+
+        Args:
+            df_tramo: DataFrame con datos de tramos
+
+        Returns:
+            Diccionario {HW_ID: posiciones (base 0) de sus tramos}, ordenado por HW_ID
+
+        Raises:
+            ValueError: Si los tramos de una cabecera no son consecutivos o
+                        las cabeceras no están numeradas 1..nHw en orden
+        """
+        ids = hw_ids(df_tramo)
+        grupos: Dict[int, List[int]] = {}
+        for posicion, hw_id in enumerate(ids):
+            if hw_id in grupos and grupos[hw_id][-1] != posicion - 1:
+                raise ValueError(f"Los tramos de la cabecera {hw_id} no son consecutivos en REACHES")
+            grupos.setdefault(hw_id, []).append(posicion)
+
+        if list(grupos) != list(range(1, len(grupos) + 1)):
+            raise ValueError(f"Las cabeceras de REACHES deben numerarse 1..{len(grupos)} "
+                             f"en orden (encontradas: {list(grupos)})")
+        return grupos
+
+    def estaciones_cabecera(self, df_tramo: pd.DataFrame,
+                            principal: str = 'CABECERA') -> List[str]:
+        """
+        Estación de cabecera de cada grupo de tramos.
+
+        La del cauce principal es `principal`; la de cada tributario es la
+        estación aguas arriba (EST_ARRIBA) de su primer tramo.
+
+        Args:
+            df_tramo: DataFrame con datos de tramos
+            principal: Estación de cabecera del cauce principal
+
+        Returns:
+            Lista de estaciones ordenada por HW_ID
+        """
+        grupos = self.grupos_tributarios(df_tramo)
+        return [principal if hw_id == 1 else str(df_tramo['EST_ARRIBA'].iloc[posiciones[0]])
+                for hw_id, posiciones in grupos.items()]
+
     def crear_headwaters_dict(self, df_tramo: pd.DataFrame,
                               df_calidad: pd.DataFrame,
-                              estacion: str) -> Dict[str, Any]:
+                              estacion: Union[str, List[str]]) -> Dict[str, Any]:
         """
         Crea el diccionario de cabeceras.
 
         Args:
             df_tramo: DataFrame con datos de tramos
             df_calidad: DataFrame con datos de calidad de agua
-            estacion: Nombre de la estación de cabecera
+            estacion: Nombre de la estación de cabecera, o lista con una
+                      estación por cabecera (ver estaciones_cabecera)
 
         Returns:
             Diccionario de cabeceras
         """
+        estaciones = [estacion] if isinstance(estacion, str) else list(estacion)
+        headwaters = [self._crear_headwater(df_tramo, df_calidad, e) for e in estaciones]
+
+        return {
+            "nHw": len(headwaters),
+            "headwaters": headwaters
+        }
+
+    def _crear_headwater(self, df_tramo: pd.DataFrame,
+                         df_calidad: pd.DataFrame,
+                         estacion: str) -> Dict[str, Any]:
+        """
+        Crea el diccionario de una cabecera.
+
+        Args:
+            df_tramo: DataFrame con datos de tramos
+            df_calidad: DataFrame con datos de calidad de agua
+            estacion: Nombre de la estación de cabecera
+
+        Returns:
+            Diccionario de la cabecera (begRch = primer tramo, base 1)
+        """
         tramo = df_tramo[df_tramo['EST_ARRIBA'] == estacion].fillna(0)
         cal = df_calidad[df_calidad['NOMBRE_ESTACIONES'] == estacion].fillna(0)
+        if tramo.empty:
+            raise KeyError(f"Ningún tramo de REACHES comienza en la estación de cabecera '{estacion}'")
+        if cal.empty:
+            raise KeyError(f"La estación de cabecera '{estacion}' no está en WQ_DATA")
+        begRch = df_tramo.index.get_loc(tramo.index[0]) + 1
 
         # Cálculos derivados
         cal['S_INORG'] = cal['SST'] * 0.15
@@ -226,7 +368,7 @@ class Q2KDataProcessor:
 
         # Diccionario final de la cabecera
         headwater = {
-            "begRch": 1,
+            "begRch": int(begRch),
             "NameHw": str(cal['NOMBRE_ESTACIONES'].values[0]),
             "QHw": float(cal.get("CAUDAL", 0)),
             "elevHw": float(tramo.get("ELEV_ARRIBA", 0)),
@@ -244,10 +386,7 @@ class Q2KDataProcessor:
             "pHHw": pHHw
         }
 
-        return {
-            "nHw": 1,
-            "headwaters": [headwater]
-        }
+        return headwater
 
     def crear_met_data_dict(self, df: pd.DataFrame) -> Dict[str, Any]:
         """
@@ -285,9 +424,9 @@ class Q2KDataProcessor:
             Diccionario de datos de temperatura
         """
         data_list = []
-        for _, row in df.iterrows():
+        for (_, row), hw_id in zip(df.iterrows(), hw_ids(df)):
             data = {
-                "tedaHwID": 1,
+                "tedaHwID": hw_id,
                 "xteda": float(row.get("X_QUAL2K", 0)),
                 "tedaav": float(row.get("TEMPERATURA", 0)),
                 "tedamn": None,
@@ -327,6 +466,7 @@ class Q2KDataProcessor:
         df['TN'] = df['N_ORG'] + df['NITROGENO_AMONIACAL'] + df['NO3']
         df['TP'] = df['P_ORG'] + df['ORTOFOSFATOS']
 
+        ids_hw = hw_ids(df)
         df = df.replace(np.nan, -99999)
 
         # Definición de campos QUAL2K
@@ -362,7 +502,7 @@ class Q2KDataProcessor:
 
         # Construcción del diccionario
         stations = []
-        for _, row in df.iterrows():
+        for (_, row), hw_id in zip(df.iterrows(), ids_hw):
             cons_dict = {k: -99999 for k in constituyentes_base}
 
             for col, key in mapeo.items():
@@ -377,7 +517,7 @@ class Q2KDataProcessor:
             cons_dict["TKN"] = float(row.get("TKN", cons_dict["TKN"]))
 
             station = {
-                "cwqHwID": 1,
+                "cwqHwID": hw_id,
                 "dist": float(row.get("X_QUAL2K", 0)),
                 "constituents": cons_dict
             }
@@ -0,0 +1,362 @@
+import csv
+import locale
+import math
+from typing import Dict, Any, Iterator, List, Optional
+
+from qual2k.processing.file_writer import (CONSTITUYENTES_CABECERA, REACH_RATE_KEYS,
+                                          WQ_CONSTITUENT_ORDER)
+
+# Campos de cada tramo en el bloque reach_data (orden de write_reach_data)
+REACH_FIELDS = [
+    "rlab1", "rlab2", "rname", "xrup", "xrdn", "numElm",
+    "elev1", "elev2", "latd", "latm", "lats", "lond", "lonm", "lons",
+    "Q", "BB", "SS1", "SS2", "s", "nm", "alp1", "bet1", "alp2", "bet2",
+    "Ediff", "Frsed", "Frsod", "SODspec", "JCH4spec", "JNH4spec", "JSRPspec",
+    "weirType", "Hweir", "Bweir", "adam", "bdam", "evap"
+]
+REACH_TEXT_FIELDS = {"rlab1", "rlab2", "rname", "weirType"}
+
+# Campos de la línea principal de cada cabecera (orden de write_headwaters_q2k)
+HEADWATER_FIELDS = [
+    "begRch", "NameHw", "QHw", "elevHw", "weirTypeHw", "HweirHw", "BweirHw",
+    "alp1Hw", "bet1Hw", "alp2Hw", "bet2Hw", "sHw", "nmHw", "bbHw", "ss1Hw",
+    "ss2Hw", "ediffHw", "adamHw", "bdamHw"
+]
+HEADWATER_TEXT_FIELDS = {"NameHw", "weirTypeHw"}
+
+# Líneas numéricas del bloque rates_general (orden de write_rates_general)
+RATES_LINES = [
+    ["vss", "mgC", "mgN", "mgP", "mgD", "mgA"],
+    ["tka", "roc", "ron"],
+    ["Ksocf", "Ksona", "Ksodn", "Ksop", "Ksob", "khc", "tkhc", "kdcs",
+     "tkdcs", "kdc", "tkdc", "khn", "tkhn", "von"],
+    ["kn", "tkn", "ki", "tki", "vdi", "tvdi", "khp", "tkhp", "vop", "vip",
+     "kspi", "Kdpi"],
+    ["kga", "tkga", "krea", "tkrea", "kexa", "tkexa", "kdea", "tkdea", "ksn",
+     "ksp", "ksc", "Isat"],
+    ["khnx", "va", "typeF", "kgaF", "tkgaF", "kreaF", "tkreaF", "kexaF",
+     "tkexaF", "kdeaF", "abmax"],
+    ["tkdeaF", "ksnF", "kspF", "kscF", "Isatf", "khnxF", "kdt", "tkdt",
+     "ffast", "vdt"],
+]
+
+# Constituyentes de fuentes puntuales y cabeceras (19 + pH en fuentes)
+POINT_SOURCE_CONSTITUENTS = CONSTITUYENTES_CABECERA + ["pH"]
+
+METEO_VARS = ["shadeHH", "TaHH", "TdHH", "UwHH", "ccHH"]
+
+# Valor que el escritor usa para los datos faltantes
+VALOR_FALTANTE = -99999
+
+
+class Q2KFileReader:
+    """
+    Lee un archivo .q2k y reconstruye el diccionario q2k_data por bloques.
+
+    Es la operación inversa de Q2KFileWriter: el diccionario obtenido puede
+    pasarse directamente a create_q2k_file. Los números conservan su tipo
+    (enteros sin punto decimal, flotantes con '.', 'E'), de modo que un
+    archivo generado por el escritor se reproduce byte a byte.
+    """
+
+    @staticmethod
+    def parse_number(token: str) -> Any:
+        """
+        Convierte un campo numérico del archivo a int o float.
+
+        Args:
+            token: Texto del campo
+
+        Returns:
+            int, float o None si el campo está vacío
+        """
+        token = token.strip()
+        if token == "":
+            return None
+        if any(c in token for c in ".eEnN"):
+            return float(token)
+        return int(token)
+
+    @staticmethod
+    def _siguiente(filas: Iterator[List[str]], bloque: str) -> List[str]:
+        """Devuelve la siguiente fila o falla indicando el bloque incompleto."""
+        try:
+            return next(filas)
+        except StopIteration:
+            raise ValueError(f"Archivo .q2k incompleto: falta el bloque '{bloque}'") from None
+
+    def _numeros(self, filas: Iterator[List[str]], bloque: str) -> List[Any]:
+        """Lee una fila completa de valores numéricos."""
+        return [self.parse_number(t) for t in self._siguiente(filas, bloque)]
+
+    def _campos(self, fila: List[str], nombres: List[str], texto: set) -> Dict[str, Any]:
+        """Asocia los campos de una fila a sus nombres según su tipo."""
+        if len(fila) < len(nombres):
+            raise ValueError(f"Se esperaban {len(nombres)} campos y se leyeron {len(fila)}: {fila}")
+        return {n: (v if n in texto else self.parse_number(v))
+                for n, v in zip(nombres, fila)}
+
+    @staticmethod
+    def _ron_desde_archivo(valor: float) -> float:
+        """
+        Convierte ron (escrito como ron*1000) a su valor original.
+
+        Se busca el flotante más cercano a valor/1000 cuyo producto por 1000
+        reproduzca exactamente el valor leído, para que la reescritura sea idéntica.
+        """
+        ron = valor / 1000
+        candidato = ron
+        for _ in range(4):
+            if candidato * 1000 == valor:
+                return candidato
+            candidato = math.nextafter(candidato, math.inf if candidato * 1000 < valor else -math.inf)
+        return ron
+
+    def read_header(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el encabezado del archivo .q2k"""
+        version = self._siguiente(filas, "header")[0]
+        rivname, filename, filedir, applabel = self._siguiente(filas, "header")[:4]
+        xmon, xday, xyear = self._numeros(filas, "header")[:3]
+        fila = self._siguiente(filas, "header")
+        tz, pco2, dtuser, tf = (self.parse_number(t) for t in fila[:4])
+
+        return {
+            "version": version, "rivname": rivname, "filename": filename,
+            "filedir": filedir, "applabel": applabel,
+            "xmon": xmon, "xday": xday, "xyear": xyear,
+            "timezonehour": tz, "pco2": pco2, "dtuser": dtuser, "tf": tf,
+            "IMeth": fila[4], "IMethpH": fila[5],
+        }
+
+    def read_reach_data(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el bloque de datos de tramos"""
+        nr, nHw, ne = self._numeros(filas, "reach_data")[:3]
+        reaches = [self._campos(self._siguiente(filas, "reach_data"),
+                                REACH_FIELDS, REACH_TEXT_FIELDS)
+                   for _ in range(nr)]
+        return {"nr": nr, "nHw": nHw, "ne": ne, "reaches": reaches}
+
+    def read_light_data(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el bloque de datos de luz y sedimentos"""
+        light = dict(zip(["PAR", "kep", "kela", "kenla", "kess", "kepom"],
+                         self._numeros(filas, "light_data")))
+
+        fila = self._siguiente(filas, "light_data")
+        light.update({
+            "solarMethod": fila[0],
+            "nfacBras": self.parse_number(fila[1]),
+            "atcRyanStolz": self.parse_number(fila[2]),
+            "longatMethod": fila[3],
+            "fUwMethod": fila[4],
+        })
+
+        light.update(zip(["Hsed", "alphas", "rhos", "rhow", "Cps", "Cpw"],
+                         self._numeros(filas, "light_data")))
+        light["SedComp"] = self._siguiente(filas, "light_data")[0]
+        return light
+
+    def read_point_sources(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el bloque de fuentes puntuales"""
+        npt = self._numeros(filas, "point_sources")[0]
+        sources = []
+
+        for _ in range(npt):
+            fila = self._siguiente(filas, "point_sources")
+            src = self._campos(fila, ["PtName", "PtHwID", "xptt", "Qptta", "Qptt",
+                                      "TepttMean", "TepttAmp", "TepttMaxTime"],
+                               {"PtName"})
+            src["PtHwID"] += 1
+
+            src["constituents"] = []
+            for nombre in POINT_SOURCE_CONSTITUENTS:
+                mean, amp, maxtime = self._numeros(filas, "point_sources")[:3]
+                src["constituents"].append({"name": nombre, "mean": mean,
+                                            "amp": amp, "maxtime": maxtime})
+            sources.append(src)
+
+        return {"npt": npt, "sources": sources}
+
+    def read_diffuse_sources(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el bloque de fuentes difusas"""
+        ndiff = self._numeros(filas, "diffuse_sources")[0]
+        sources = []
+
+        for _ in range(ndiff):
+            fila = self._siguiente(filas, "diffuse_sources")
+            src = self._campos(fila, ["DiffName", "DiffHwID", "xdup", "xddn",
+                                      "Qdifa", "Qdif", "Tedif"],
+                               {"DiffName"})
+            src["DiffHwID"] += 1
+            src["constituents"] = [
+                {"name": nombre, "value": self._numeros(filas, "diffuse_sources")[0]}
+                for nombre in CONSTITUYENTES_CABECERA
+            ]
+            src["pHind"] = self._numeros(filas, "diffuse_sources")[0]
+            sources.append(src)
+
+        return {"ndiff": ndiff, "sources": sources}
+
+    def read_rates_general(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el bloque de tasas cinéticas generales"""
+        r = {}
+        for nombres in RATES_LINES:
+            r.update(self._campos(self._siguiente(filas, "rates_general"),
+                                  nombres, {"typeF"}))
+        r["ron"] = self._ron_desde_archivo(r["ron"])
+
+        r["xdum"] = self._numeros(filas, "rates_general")
+
+        extras = self._numeros(filas, "rates_general")
+        r["kai"], r["kawindmethod"], r["rea_extras"] = extras[0], extras[1], extras[2:]
+
+        r.update(zip(["NINpmin", "NIPpmin", "NINpupmax", "NIPpupmax"],
+                     self._numeros(filas, "rates_general")))
+
+        r["consts"] = [dict(zip(["kconst", "tkconst", "vconst"],
+                                self._numeros(filas, "rates_general")))
+                       for _ in range(3)]
+
+        r["saturation_types"] = self._siguiente(filas, "rates_general")
+        r["reaeration_methods"] = self._siguiente(filas, "rates_general")
+        r.update(zip(["reaa", "reab", "reac"], self._numeros(filas, "rates_general")))
+        return r
+
+    def read_reach_rates(self, filas: Iterator[List[str]], nr: int) -> Dict[str, Any]:
+        """Lee el bloque de tasas por tramo (-99999 se interpreta como sin definir)"""
+        reaches = []
+        for _ in range(nr):
+            valores = self._numeros(filas, "reach_rates")
+            reaches.append({k: (None if v == VALOR_FALTANTE else v)
+                            for k, v in zip(REACH_RATE_KEYS, valores)})
+        return {"nr": nr, "reaches": reaches}
+
+    def read_boundary_data(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el bloque de datos de frontera"""
+        dlstime = self._numeros(filas, "boundary_data")[0]
+        bandera = self._siguiente(filas, "boundary_data")[0].strip().upper()
+        return {"dlstime": dlstime, "DownstreamBoundary": bandera == ".TRUE.",
+                "nHw": 0, "headwaters": []}
+
+    def _serie_horaria(self, filas: Iterator[List[str]], bloque: str) -> List[Any]:
+        """Lee una fila de 24 valores horarios terminada en \"\"."""
+        return [self.parse_number(t) for t in self._siguiente(filas, bloque)[:-1]]
+
+    def read_headwaters(self, filas: Iterator[List[str]], nHw: int) -> Dict[str, Any]:
+        """Lee el bloque de cabeceras"""
+        headwaters = []
+        for _ in range(nHw):
+            hw = self._campos(self._siguiente(filas, "headwaters"),
+                              HEADWATER_FIELDS, HEADWATER_TEXT_FIELDS)
+            hw["TeHw"] = self._serie_horaria(filas, "headwaters")
+            hw["cHw"] = [self._serie_horaria(filas, "headwaters")
+                         for _ in CONSTITUYENTES_CABECERA]
+            hw["pHHw"] = self._serie_horaria(filas, "headwaters")
+            headwaters.append(hw)
+        return {"nHw": nHw, "headwaters": headwaters}
+
+    def read_meteorological(self, filas: Iterator[List[str]], nr: int) -> Dict[str, Any]:
+        """Lee los datos meteorológicos"""
+        meteo = {"nr": nr}
+        for var_name in METEO_VARS:
+            meteo[var_name] = [self._serie_horaria(filas, "meteorological")
+                               for _ in range(nr)]
+        return meteo
+
+    def read_temperature_data(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el bloque de datos de temperatura observados"""
+        nteda = self._numeros(filas, "temperature_data")[0]
+        data = []
+        for _ in range(nteda):
+            row = dict(zip(["tedaHwID", "xteda", "tedaav", "tedamn", "tedamx"],
+                           self._numeros(filas, "temperature_data")))
+            row["tedaHwID"] += 1
+            data.append(row)
+        return {"nteda": nteda, "data": data}
+
+    def read_hydraulics_data(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el bloque de datos hidráulicos observados"""
+        nhydda = self._numeros(filas, "hydraulics_data")[0]
+        data = []
+        for _ in range(nhydda):
+            row = dict(zip(["hyddaHwID", "xhydda", "Qdata", "Hdata", "Udata", "Travdata"],
+                           self._numeros(filas, "hydraulics_data")))
+            row["hyddaHwID"] += 1
+            data.append(row)
+        return {"nhydda": nhydda, "data": data}
+
+    def read_wq_data(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el bloque de datos de calidad de agua observados"""
+        fila = self._siguiente(filas, "wq_data")
+        sheet_name, nwqd = fila[0], self.parse_number(fila[1])
+
+        stations = []
+        for _ in range(nwqd):
+            hw_id, dist = self._numeros(filas, "wq_data")[:2]
+            valores = []
+            while len(valores) < len(WQ_CONSTITUENT_ORDER):
+                valores.extend(self._numeros(filas, "wq_data"))
+            stations.append({"cwqHwID": hw_id + 1, "dist": dist,
+                             "constituents": dict(zip(WQ_CONSTITUENT_ORDER, valores))})
+
+        # "WQ Data Min" y "WQ Data Max" (siempre vacíos)
+        self._siguiente(filas, "wq_data")
+        self._siguiente(filas, "wq_data")
+        return {"sheet_name": sheet_name, "nwqd": nwqd, "stations": stations}
+
+    def read_diel(self, filas: Iterator[List[str]]) -> Dict[str, Any]:
+        """Lee el bloque de simulación diurna"""
+        ndiel, idiel = self._numeros(filas, "diel")[:2]
+        ndielstat = self._numeros(filas, "diel")[0]
+        self._siguiente(filas, "diel")  # "MULTSTATION DIEL"
+
+        stations = []
+        for fila in filas:
+            if fila and fila[0] == "END MULTSTATION DIEL":
+                break
+            stations.append(self.parse_number(fila[1]))
+
+        return {"ndiel": ndiel, "idiel": idiel, "ndielstat": ndielstat,
+                "stations": stations}
+
+    def parse_q2k(self, texto: str) -> Dict[str, Any]:
+        """
+        Reconstruye el diccionario q2k_data a partir del contenido de un .q2k.
+
+        Args:
+            texto: Contenido completo del archivo
+
+        Returns:
+            Diccionario con todos los datos organizados por bloques
+        """
+        filas = (fila for fila in csv.reader(texto.splitlines()) if fila)
+
+        data = {"header": self.read_header(filas)}
+        data["reach_data"] = self.read_reach_data(filas)
+        data["light_data"] = self.read_light_data(filas)
+        data["point_sources"] = self.read_point_sources(filas)
+        data["diffuse_sources"] = self.read_diffuse_sources(filas)
+        data["rates_general"] = self.read_rates_general(filas)
+        data["reach_rates"] = self.read_reach_rates(filas, data["reach_data"]["nr"])
+        data["boundary_data"] = self.read_boundary_data(filas)
+        data["headwaters"] = self.read_headwaters(filas, data["reach_data"]["nHw"])
+        data["meteorological"] = self.read_meteorological(filas, data["reach_data"]["nr"])
+        data["temperature_data"] = self.read_temperature_data(filas)
+        data["hydraulics_data"] = self.read_hydraulics_data(filas)
+        data["wq_data"] = self.read_wq_data(filas)
+        data["diel"] = self.read_diel(filas)
+        return data
+
+    def read_q2k_file(self, filepath: str, encoding: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Lee un archivo QUAL2K completo (.q2k).
+
+        Args:
+            filepath: Ruta del archivo .q2k
+            encoding: Codificación (None = la del sistema, como create_q2k_file)
+
+        Returns:
+            Diccionario con todos los datos organizados por bloques
+        """
+        encoding = encoding or locale.getpreferredencoding(False)
+        with open(filepath, encoding=encoding, newline='') as f:
+            return self.parse_q2k(f.read())
@@ -1,5 +1,74 @@
+import io
+import locale
 import os
-from typing import Dict, Any, List, Union
+import uuid
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
+
+
+# Cachés de valores ya formateados, indexadas por (tipo, valor[, preserve_empty]).
+# El tipo forma parte de la clave porque 1, 1.0 y True formatean distinto.
+_CACHE_NUMEROS: Dict[Tuple[type, Any], str] = {}
+_CACHE_VALORES: Dict[Tuple[type, Any, bool], str] = {}
+TAMANO_MAX_CACHE = 65536
+
+# Orden de las tasas por tramo en el bloque reach_rates
+REACH_RATE_KEYS = [
+    "kaaa", "vss_rch", "khc_rch", "kdcs_rch", "kdc_rch",
+    "khn_rch", "von_rch", "kn_rch", "ki_rch", "vdi_rch",
+    "khp_rch", "vop_rch", "vip_rch", "kga_rch", "krea_rch",
+    "kexa_rch", "kdea_rch", "va_rch", "kgaF_rch", "kreaF_rch",
+    "kexaF_rch", "kdeaF_rch", "kdt_rch", "vdt_rch", "ffast_rch"
+]
+
+# Orden de los constituyentes observados en el bloque wq_data
+WQ_CONSTITUENT_ORDER = [
+    "Cond", "ISS", "DO", "CBODs", "CBODf", "Norg", "NH4", "NO3",
+    "Porg", "Inorg_P", "Phyto", "Detr", "Pathogens", "Alk",
+    "Constituent_i", "Constituent_ii", "Constituent_iii", "pH",
+    "Bot_Alg", "TN", "TP", "TSS", "NH3", "Sat_data", "SOD_data",
+    "Sediment_1", "Sediment_2", "Sediment_3", "CBODu", "TOC", "TKN"
+]
+
+# Orden de los 19 constituyentes de cabecera (cHw) en el archivo .q2k
+CONSTITUYENTES_CABECERA = [
+    "Cond", "ISS", "DO", "CBODs", "CBODf", "Norg", "NH4", "NO3", "Porg",
+    "Inorg_P", "Phyto", "IntN", "IntP", "Detr", "Pathogens", "Alk",
+    "Constituent_i", "Constituent_ii", "Constituent_iii"
+]
+
+
+def escribir_atomico(ruta: str, texto: str) -> None:
+    """
+    Escribe un archivo de texto de forma atómica con una sola escritura.
+
+    El contenido se escribe en un archivo temporal del mismo directorio y luego
+    se reemplaza el destino con os.replace, de modo que nunca queda un archivo
+    a medio escribir. Se usa modo texto con la codificación y los saltos de
+    línea por defecto del sistema, igual que open(ruta, 'w').
+
+    Args:
+        ruta: Ruta del archivo destino
+        texto: Contenido completo
+    """
+    directorio, nombre = os.path.split(os.path.abspath(ruta))
+    temporal = os.path.join(directorio, f'.{nombre}.{uuid.uuid4().hex[:8]}.tmp')
+    try:
+        # Modo 'x': respeta la umask (mkstemp crearía el archivo con permisos 0600)
+        with open(temporal, 'x') as f:
+            f.write(texto)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def _guardar_en_cache(cache: Dict, clave: Tuple, texto: str) -> str:
+    """Guarda un valor formateado, vaciando la caché si alcanza el tamaño máximo."""
+    if len(cache) >= TAMANO_MAX_CACHE:
+        cache.clear()
+    cache[clave] = texto
+    return texto
 
 
 class Q2KFileWriter:
@@ -7,25 +76,44 @@ class Q2KFileWriter:
     Escribe archivos .q2k en el formato requerido por QUAL2K.
     """
 
+    @staticmethod
+    def _format_number(value: Union[float, int, str]) -> str:
+        """Formatea un número sin caché (ver format_number)."""
+        s = str(value).replace('e', 'E')
+
+        if s.startswith('0.'):
+            s = s[1:]
+        elif s.startswith('-0.'):
+            s = '-' + s[2:]
+
+        return s
+
     @staticmethod
     def format_number(value: Union[float, int, str]) -> str:
         """
         Convierte un número a formato FORTRAN/VBA compatible con QUAL2K.
 
+        Los resultados se guardan en caché, ya que un archivo repite muchas
+        veces los mismos valores (0, -99999, constantes de fuentes...).
+
         Args:
             value: Valor numérico a formatear
 
         Returns:
             str: Número formateado
         """
-        s = str(value).replace('e', 'E')
-
-        if s.startswith('0.'):
-            s = s[1:]
-        elif s.startswith('-0.'):
-            s = '-' + s[2:]
-
-        return s
+        tipo = value.__class__
+        try:
+            # 0.0 y -0.0 son iguales como clave pero formatean distinto
+            if tipo is not int and value == 0:
+                return Q2KFileWriter._format_number(value)
+            clave = (tipo, value)
+            return _CACHE_NUMEROS[clave]
+        except KeyError:
+            return _guardar_en_cache(_CACHE_NUMEROS, clave,
+                                     Q2KFileWriter._format_number(value))
+        except (TypeError, ValueError):  # valor no hashable o no comparable
+            return Q2KFileWriter._format_number(value)
 
     @staticmethod
     def safe_value(value: Any, default: Union[int, str] = -99999,
@@ -67,6 +155,40 @@ class Q2KFileWriter:
         Returns:
             str: Valor formateado
         """
+        tipo = value.__class__
+        try:
+            # 0.0 y -0.0 son iguales como clave pero formatean distinto
+            if tipo is not int and value == 0:
+                return Q2KFileWriter._format_value(value, preserve_empty)
+            clave = (tipo, value, preserve_empty)
+            return _CACHE_VALORES[clave]
+        except KeyError:
+            return _guardar_en_cache(_CACHE_VALORES, clave,
+                                     Q2KFileWriter._format_value(value, preserve_empty))
+        except (TypeError, ValueError):  # valor no hashable o no comparable
+            return Q2KFileWriter._format_value(value, preserve_empty)
+
+    @staticmethod
+    def format_values(values: Sequence[Any], preserve_empty: bool = False) -> List[str]:
+        """
+        Formatea una secuencia de valores de una vez (equivale a aplicar
+        format_value a cada elemento).
+
+        Las series horarias se repiten entre evaluaciones, así que la caché de
+        format_value resulta más rápida que convertir en bloque con NumPy.
+
+        Args:
+            values: Secuencia o arreglo de valores
+            preserve_empty: Si mantener valores vacíos
+
+        Returns:
+            Lista de valores formateados
+        """
+        return [Q2KFileWriter.format_value(v, preserve_empty) for v in values]
+
+    @staticmethod
+    def _format_value(value: Any, preserve_empty: bool = False) -> str:
+        """Formatea un valor sin caché (ver format_value)."""
         val = Q2KFileWriter.safe_value(value, preserve_empty=preserve_empty)
 
         if val == "":
@@ -259,16 +381,8 @@ class Q2KFileWriter:
 
     def write_reach_rates(self, f, reach_rates: Dict[str, Any]) -> None:
         """Escribe el bloque de tasas específicas por tramo"""
-        rate_keys = [
-            "kaaa", "vss_rch", "khc_rch", "kdcs_rch", "kdc_rch",
-            "khn_rch", "von_rch", "kn_rch", "ki_rch", "vdi_rch",
-            "khp_rch", "vop_rch", "vip_rch", "kga_rch", "krea_rch",
-            "kexa_rch", "kdea_rch", "va_rch", "kgaF_rch", "kreaF_rch",
-            "kexaF_rch", "kdeaF_rch", "kdt_rch", "vdt_rch", "ffast_rch"
-        ]
-
         for r in reach_rates["reaches"]:
-            values = [self.format_number(self.safe_value(r.get(k))) for k in rate_keys]
+            values = [self.format_number(self.safe_value(r.get(k))) for k in REACH_RATE_KEYS]
             f.write(",".join(values) + "\n")
 
     def write_boundary_data(self, f, b: Dict[str, Any]) -> None:
@@ -312,16 +426,16 @@ class Q2KFileWriter:
             f.write(",".join(str(p) for p in line_parts) + "\n")
 
             # Temperatura
-            temp_values = [self.format_value(v, True) for v in hw["TeHw"]]
+            temp_values = self.format_values(hw["TeHw"], True)
             f.write(",".join(temp_values) + ",\"\"\n")
 
             # 19 constituyentes
             for c in hw["cHw"]:
-                const_values = [self.format_value(v, True) for v in c]
+                const_values = self.format_values(c, True)
                 f.write(",".join(const_values) + ",\"\"\n")
 
             # pH
-            ph_values = [self.format_value(v, True) for v in hw["pHHw"]]
+            ph_values = self.format_values(hw["pHHw"], True)
             f.write(",".join(ph_values) + ",\"\"\n")
 
     def write_meteorological_data_q2k(self, f, meteo: Dict[str, Any]) -> None:
@@ -331,7 +445,7 @@ class Q2KFileWriter:
 
         for var_name in met_vars:
             for i in range(nr):
-                values = [self.format_value(v) for v in meteo[var_name][i]]
+                values = self.format_values(meteo[var_name][i])
                 f.write(",".join(values) + ",\"\"\n")
 
     def write_temperature_data_q2k(self, f, temp_data: Dict[str, Any]) -> None:
@@ -367,21 +481,13 @@ class Q2KFileWriter:
 
     def write_wqdata_q2k(self, f, wqdata: Dict[str, Any]) -> None:
         """Escribe el bloque de datos de calidad de agua observados"""
-        CONSTITUENT_ORDER = [
-            "Cond", "ISS", "DO", "CBODs", "CBODf", "Norg", "NH4", "NO3",
-            "Porg", "Inorg_P", "Phyto", "Detr", "Pathogens", "Alk",
-            "Constituent_i", "Constituent_ii", "Constituent_iii", "pH",
-            "Bot_Alg", "TN", "TP", "TSS", "NH3", "Sat_data", "SOD_data",
-            "Sediment_1", "Sediment_2", "Sediment_3", "CBODu", "TOC", "TKN"
-        ]
-
         f.write(f"\"{wqdata['sheet_name']}\",{wqdata['nwqd']}\n")
 
         for st in wqdata.get("stations", []):
             f.write(f"{int(st['cwqHwID']) - 1},{self.format_value(st['dist'])}\n")
 
             values = [self.format_value(st["constituents"].get(c, -99999))
-                      for c in CONSTITUENT_ORDER]
+                      for c in WQ_CONSTITUENT_ORDER]
 
             self.write_line_segments(f, values, items_per_line=10)
 
@@ -407,43 +513,108 @@ class Q2KFileWriter:
 
         f.write("\"END MULTSTATION DIEL\"\n")
 
+    def write_q2k(self, f, data: Dict[str, Any]) -> None:
+        """
+        Escribe todos los bloques presentes en data en un objeto tipo archivo.
+
+        Args:
+            f: Objeto con método write (archivo abierto, io.StringIO...)
+            data: Diccionario con todos los datos organizados por bloques
+        """
+        if 'header' in data:
+            self.write_header(f, data['header'])
+        if 'reach_data' in data:
+            self.write_reach_data(f, data['reach_data'])
+        if 'light_data' in data:
+            self.write_light_data(f, data['light_data'])
+        if 'point_sources' in data:
+            self.write_point_sources(f, data['point_sources'])
+        if 'diffuse_sources' in data:
+            self.write_diffuse_sources(f, data['diffuse_sources'])
+        if 'rates_general' in data:
+            self.write_rates_general(f, data['rates_general'])
+        if 'reach_rates' in data:
+            self.write_reach_rates(f, data['reach_rates'])
+        if 'boundary_data' in data:
+            self.write_boundary_data(f, data['boundary_data'])
+        if 'headwaters' in data:
+            self.write_headwaters_q2k(f, data['headwaters'])
+        if 'meteorological' in data:
+            self.write_meteorological_data_q2k(f, data['meteorological'])
+        if 'temperature_data' in data:
+            self.write_temperature_data_q2k(f, data['temperature_data'])
+        if 'hydraulics_data' in data:
+            self.write_hydraulics_data_q2k(f, data['hydraulics_data'])
+        if 'wq_data' in data:
+            self.write_wqdata_q2k(f, data['wq_data'])
+        if 'diel' in data:
+            self.write_diel_block_q2k(f, data['diel'])
+
+    def render_q2k(self, data: Dict[str, Any]) -> str:
+        """
+        Genera el contenido completo del archivo .q2k en memoria.
+
+        Args:
+            data: Diccionario con todos los datos organizados por bloques
+
+        Returns:
+            Texto del archivo (saltos de línea '\\n')
+        """
+        buffer = io.StringIO()
+        self.write_q2k(buffer, data)
+        return buffer.getvalue()
+
+    def render_q2k_bytes(self, data: Dict[str, Any],
+                         encoding: Optional[str] = None,
+                         newline: Optional[str] = None) -> bytes:
+        """
+        Genera el archivo .q2k como bytes, idénticos a los que escribe create_q2k_file.
+
+        Útil para calcular hashes, comparar o comprimir sin tocar el disco.
+
+        Args:
+            data: Diccionario con todos los datos organizados por bloques
+            encoding: Codificación (None = la del sistema, como open())
+            newline: Salto de línea (None = os.linesep, como open())
+
+        Returns:
+            Contenido del archivo en bytes
+        """
+        texto = self.render_q2k(data)
+        newline = os.linesep if newline is None else newline
+        if newline != '\n':
+            texto = texto.replace('\n', newline)
+        return texto.encode(encoding or locale.getpreferredencoding(False))
+
     def create_q2k_file(self, filepath: str, data: Dict[str, Any]) -> None:
         """
         Crea un archivo QUAL2K completo (.q2k).
 
+        El contenido se genera en memoria y se escribe de forma atómica.
+
         Args:
             filepath: Ruta del archivo a crear
             data: Diccionario con todos los datos organizados por bloques
         """
-        with open(filepath, 'w') as f:
-            if 'header' in data:
-                self.write_header(f, data['header'])
-            if 'reach_data' in data:
-                self.write_reach_data(f, data['reach_data'])
-            if 'light_data' in data:
-                self.write_light_data(f, data['light_data'])
-            if 'point_sources' in data:
-                self.write_point_sources(f, data['point_sources'])
-            if 'diffuse_sources' in data:
-                self.write_diffuse_sources(f, data['diffuse_sources'])
-            if 'rates_general' in data:
-                self.write_rates_general(f, data['rates_general'])
-            if 'reach_rates' in data:
-                self.write_reach_rates(f, data['reach_rates'])
-            if 'boundary_data' in data:
-                self.write_boundary_data(f, data['boundary_data'])
-            if 'headwaters' in data:
-                self.write_headwaters_q2k(f, data['headwaters'])
-            if 'meteorological' in data:
-                self.write_meteorological_data_q2k(f, data['meteorological'])
-            if 'temperature_data' in data:
-                self.write_temperature_data_q2k(f, data['temperature_data'])
-            if 'hydraulics_data' in data:
-                self.write_hydraulics_data_q2k(f, data['hydraulics_data'])
-            if 'wq_data' in data:
-                self.write_wqdata_q2k(f, data['wq_data'])
-            if 'diel' in data:
-                self.write_diel_block_q2k(f, data['diel'])
+        escribir_atomico(filepath, self.render_q2k(data))
+
+    @staticmethod
+    def render_message(header_dict: Dict[str, Any],
+                       directorio: Optional[str] = None) -> str:
+        """
+        Genera el contenido de message.DAT.
+
+        Args:
+            header_dict: Diccionario con datos del header
+            directorio: Directorio del .q2k y .out (None = header_dict['filedir'])
+
+        Returns:
+            Texto de message.DAT
+        """
+        directorio = directorio or header_dict["filedir"]
+        q2k_path = os.path.join(directorio, f"{header_dict['filename']}.q2k")
+        out_path = os.path.join(directorio, f"{header_dict['filename']}.out")
+        return f"\"{q2k_path}\"\n\"{out_path}\"\n"
 
     @staticmethod
     def create_message(header_dict: Dict[str, Any]) -> None:
@@ -453,14 +624,8 @@ class Q2KFileWriter:
         Args:
             header_dict: Diccionario con datos del header
         """
-        q2k_path = os.path.join(header_dict["filedir"],
-                                f"{header_dict['filename']}.q2k")
-        out_path = os.path.join(header_dict["filedir"],
-                                f"{header_dict['filename']}.out")
         dat_path = os.path.join(header_dict["filedir"], "message.DAT")
 
         os.makedirs(os.path.dirname(dat_path), exist_ok=True)
 
-        with open(dat_path, "w") as f:
-            f.write(f"\"{q2k_path}\"\n")
-            f.write(f"\"{out_path}\"\n")
\ No newline at end of file
+        escribir_atomico(dat_path, Q2KFileWriter.render_message(header_dict))
@@ -0,0 +1,217 @@
+"""
+Caché binaria de las hojas de la plantilla Excel.
+
+Leer PlantillaBaseQ2K.xlsx con openpyxl es la operación de E/S más lenta del
+flujo y se repite en cada script y en cada proceso de calibración. La primera
+lectura guarda las hojas en formato Feather (pickle si pyarrow no está
+disponible o no puede representar la hoja) en un directorio oculto junto al
+libro; las siguientes lecturas cargan la caché en milisegundos. pyarrow es
+opcional: sin él todas las hojas se guardan en pickle.
+
+Estructura en disco:
+    .PlantillaBaseQ2K.xlsx.cache/meta.json       (mtime, tamaño, sha256, hojas)
+    .PlantillaBaseQ2K.xlsx.cache/REACHES.feather
+    ...
+
+La caché es válida si el mtime y el tamaño del libro coinciden; si cambian se
+compara el sha256 (un libro copiado o "tocado" sin cambios sigue siendo
+válido) y, si también cambia, se reconstruye.
+"""
+import hashlib
+import json
+import os
+import uuid
+from typing import Dict, Optional, Sequence
+
+import pandas as pd
+
+HOJAS_PLANTILLA = ['REACHES', 'SOURCES', 'WQ_DATA']
+VERSION_CACHE = 1
+
+
+def _directorio_cache(ruta_excel: str) -> str:
+    """Directorio de la caché de un libro (oculto, junto al libro)."""
+    directorio, nombre = os.path.split(os.path.abspath(ruta_excel))
+    return os.path.join(directorio, f'.{nombre}.cache')
+
+
+def sha256_archivo(ruta: str) -> str:
+    """Calcula el sha256 de un archivo por bloques."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _reemplazar_atomico(ruta: str, escribir) -> None:
+    """Escribe ruta con escribir(ruta_temporal) y la reemplaza de forma atómica."""
+    temporal = f'{ruta}.{uuid.uuid4().hex[:8]}.tmp'
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def _guardar_hoja(df: pd.DataFrame, base: str) -> str:
+    """
+    Guarda una hoja en Feather si la lectura la reproduce exactamente, si no en pickle.
+
+    Returns:
+        Nombre del archivo escrito (relativo al directorio de la caché)
+    """
+    try:
+        import pyarrow  # noqa: F401
+        _reemplazar_atomico(f'{base}.feather', df.to_feather)
+        if pd.read_feather(f'{base}.feather').equals(df):
+            return os.path.basename(f'{base}.feather')
+        os.remove(f'{base}.feather')
+    except Exception:
+        # Sin pyarrow, o ArrowException con columnas de tipos mezclados
+        if os.path.exists(f'{base}.feather'):
+            os.remove(f'{base}.feather')
+
+    _reemplazar_atomico(f'{base}.pkl', df.to_pickle)
+    return os.path.basename(f'{base}.pkl')
+
+
+def _leer_hoja(ruta: str) -> pd.DataFrame:
+    """Lee una hoja de la caché según su extensión."""
+    if ruta.endswith('.feather'):
+        return pd.read_feather(ruta)
+    return pd.read_pickle(ruta)
+
+
+def _meta_valida(ruta_excel: str, meta: Dict, hojas: Sequence[str]) -> bool:
+    """Indica si la caché corresponde al libro actual (actualiza mtime si solo cambió)."""
+    if meta.get('version') != VERSION_CACHE or not set(hojas) <= set(meta.get('hojas', {})):
+        return False
+
+    estado = os.stat(ruta_excel)
+    if meta['mtime_ns'] == estado.st_mtime_ns and meta['tamano'] == estado.st_size:
+        return True
+    if meta['tamano'] != estado.st_size or meta['sha256'] != sha256_archivo(ruta_excel):
+        return False
+
+    # Mismo contenido con otro mtime: se actualiza para no volver a calcular el hash
+    meta['mtime_ns'] = estado.st_mtime_ns
+    try:
+        _escribir_meta(_directorio_cache(ruta_excel), meta)
+    except OSError:
+        pass
+    return True
+
+
+def _escribir_meta(directorio: str, meta: Dict) -> None:
+    """Escribe meta.json de forma atómica (se escribe al final, tras las hojas)."""
+    def escribir(temporal):
+        with open(temporal, 'x', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+    _reemplazar_atomico(os.path.join(directorio, 'meta.json'), escribir)
+
+
+def leer_cache(ruta_excel: str,
+               hojas: Sequence[str] = HOJAS_PLANTILLA) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    Lee las hojas desde la caché si es válida.
+
+    Args:
+        ruta_excel: Ruta del libro Excel
+        hojas: Nombres de las hojas
+
+    Cualquier error al leer la caché (archivo truncado o corrupto, pickle de
+    otra versión de pandas, Feather sin pyarrow) se trata como caché inválida:
+    el libro se vuelve a leer y la caché se reescribe.
+
+    Returns:
+        Diccionario {hoja: DataFrame} o None si no hay caché válida
+    """
+    directorio = _directorio_cache(ruta_excel)
+    try:
+        with open(os.path.join(directorio, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if not _meta_valida(ruta_excel, meta, hojas):
+            return None
+        return {hoja: _leer_hoja(os.path.join(directorio, meta['hojas'][hoja]))
+                for hoja in hojas}
+    except Exception:
+        return None
+
+
+def _firma(ruta_excel: str) -> Dict:
+    """mtime, tamaño y sha256 del libro."""
+    estado = os.stat(ruta_excel)
+    return {'mtime_ns': estado.st_mtime_ns, 'tamano': estado.st_size,
+            'sha256': sha256_archivo(ruta_excel)}
+
+
+def guardar_cache(ruta_excel: str, datos: Dict[str, pd.DataFrame],
+                  firma: Optional[Dict] = None) -> None:
+    """
+    Guarda las hojas en la caché junto al libro.
+
+    Args:
+        ruta_excel: Ruta del libro Excel
+        datos: Diccionario {hoja: DataFrame}
+        firma: mtime/tamaño/sha256 del libro tomados ANTES de leerlo
+               (None = calcularlos ahora)
+    """
+    firma = firma or _firma(ruta_excel)
+    directorio = _directorio_cache(ruta_excel)
+    os.makedirs(directorio, exist_ok=True)
+
+    archivos = {hoja: _guardar_hoja(df, os.path.join(directorio, hoja))
+                for hoja, df in datos.items()}
+
+    _escribir_meta(directorio, dict(firma, version=VERSION_CACHE, hojas=archivos))
+
+
+def leer_plantillas(ruta_excel: str,
+                    hojas: Sequence[str] = HOJAS_PLANTILLA,
+                    usar_cache: bool = True) -> Dict[str, pd.DataFrame]:
+    """
+    Lee las hojas de la plantilla, usando la caché binaria si es válida.
+
+    Sin caché válida el libro se lee una sola vez (todas las hojas juntas) y,
+    si usar_cache, se guarda la caché. Si el directorio no admite escritura
+    se continúa sin caché.
+
+    Args:
+        ruta_excel: Ruta del libro Excel
+        hojas: Nombres de las hojas
+        usar_cache: Si leer/escribir la caché
+
+    Returns:
+        Diccionario {hoja: DataFrame}
+    """
+    hojas = list(hojas)
+    if usar_cache:
+        datos = leer_cache(ruta_excel, hojas)
+        if datos is not None:
+            return datos
+
+    # La firma se toma antes de leer: si el libro cambia durante la lectura,
+    # la caché queda desactualizada y se reconstruye en la siguiente carga
+    firma = _firma(ruta_excel) if usar_cache else None
+    datos = pd.read_excel(ruta_excel, sheet_name=hojas)
+
+    if usar_cache:
+        try:
+            guardar_cache(ruta_excel, datos, firma)
+        except OSError as e:
+            print(f'⚠️ No se pudo guardar la caché de la plantilla: {e}')
+
+    return datos
+
+
+def limpiar_cache(ruta_excel: str) -> None:
+    """Elimina la caché de un libro (si existe)."""
+    directorio = _directorio_cache(ruta_excel)
+    if not os.path.isdir(directorio):
+        return
+    for nombre in os.listdir(directorio):
+        os.remove(os.path.join(directorio, nombre))
+    os.rmdir(directorio)
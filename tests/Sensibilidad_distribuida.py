@@ -0,0 +1,75 @@
+"""
+Análisis de sensibilidad de Sobol evaluado en varios nodos.
+
+El script publica las muestras en un broker; cada nodo ejecuta
+    python -m qual2k worker <host>:50000 --filepath <copia de la plantilla> --procesos N
+con la misma clave en QUAL2K_AUTHKEY (aquí se lanzan además 2 workers locales para poder probarlo en una sola máquina).
+"""
+from SALib.sample import saltelli
+from SALib.analyze import sobol
+import numpy as np
+from pathlib import Path
+import warnings
+
+from qual2k.core.calibrator import Calibracion
+from qual2k.core.distribuido import Q2KBroker
+from qual2k.processing.plantilla_cache import _sha256
+
+warnings.filterwarnings('ignore')
+
+base = Path(__file__).parent.parent
+filepath = f'{base}/data/templates/Chicamocha'
+
+header_dict = {
+    "version": "v2.12",
+    "rivname": "Chicamocha",
+    "filename": "Chicamocha",
+    "filedir": filepath,
+    "applabel": "Chicamocha (6/27/2012)",
+    "xmon": 6,
+    "xday": 27,
+    "xyear": 2012,
+    "timezonehour": -6,
+    "pco2": 0.000347,
+    "dtuser": 4.16666666666667E-03,
+    "tf": 5,
+    "IMeth": "Euler",
+    "IMethpH": "Brent"
+}
+n_reaches = 7
+
+problem = {
+    'num_vars': 4,
+    'names': ['kaaa', 'kdc', 'kn', 'kdt'],
+    'bounds': [[0.1, 2], [0.05, 5], [1, 10], [0.05, 5]]
+}
+param_values = saltelli.sample(problem, 64)
+print(f"Total simulaciones: {len(param_values)}")
+
+# Cada muestra es una "solución" con un gen global por parámetro
+param_map = [(nombre, None) for nombre in problem['names']]
+lista_args = [
+    Calibracion.argumentos_worker(params, i + 1, filepath, header_dict, param_map, n_reaches)
+    for i, params in enumerate(param_values)
+]
+
+info = {'sha256_plantilla': _sha256(f'{filepath}/PlantillaBaseQ2K.xlsx')}
+# Solo local (127.0.0.1) con clave aleatoria; para nodos remotos use la IP de
+# la red interna y una clave compartida en QUAL2K_AUTHKEY
+with Q2KBroker('127.0.0.1:50000', info=info) as broker:
+    broker.iniciar_workers_locales(filepath, 2)
+    resultados = broker.evaluar(
+        lista_args,
+        callback=lambda i, r: print(f"Simulación {r[0]}: KGE {r[1]:.4f}") if r[0] % 100 == 0 else None
+    )
+
+Y = np.array([kge for _, kge, _ in resultados], dtype=float)
+Y[Y <= -999] = np.nan
+Y[np.isnan(Y)] = np.nanmean(Y)
+Si = sobol.analyze(problem, Y)
+
+print("\n" + "=" * 50)
+print("RESULTADOS ANÁLISIS DE SENSIBILIDAD")
+print("=" * 50)
+for i, name in enumerate(problem['names']):
+    print(f"  {name:8s}: S1={Si['S1'][i]:7.4f}  ST={Si['ST'][i]:7.4f}")
@@ -0,0 +1,40 @@
+"""
+Ajuste numérico: busca el paso de tiempo, la duración simulada y el método de
+integración más baratos que reproducen la simulación de referencia del caso
+Chicamocha, y los guarda en ajuste_numerico.json para las corridas siguientes.
+"""
+from pathlib import Path
+import warnings
+
+from qual2k.core.paso_tiempo import AjustePasoTiempo, aplicar_ajuste_numerico
+
+warnings.filterwarnings('ignore')
+
+base = Path(__file__).parent.parent
+filepath = f'{base}/data/templates/Chicamocha'
+
+header_dict = {
+    "version": "v2.12",
+    "rivname": "Chicamocha",
+    "filename": "Chicamocha",
+    "filedir": filepath,
+    "applabel": "Chicamocha (6/27/2012)",
+    "xmon": 6,
+    "xday": 27,
+    "xyear": 2012,
+    "timezonehour": -6,
+    "pco2": 0.000347,
+    "dtuser": 4.16666666666667E-03,
+    "tf": 5,
+    "IMeth": "Euler",
+    "IMethpH": "Brent"
+}
+
+ajuste = AjustePasoTiempo(filepath, header_dict, tfs=[1, 2, 3, 5],
+                          tolerancia_kge=0.01, tolerancia_perfil=0.05)
+ajuste.ejecutar(guardar=True)
+print(ajuste.resultados[['dtuser', 'tf', 'IMeth', 'costo_relativo',
+                         'dif_kge', 'dif_perfil', 'cumple']].head(10))
+
+# Las corridas siguientes parten del header ajustado
+print(aplicar_ajuste_numerico(header_dict, filepath))
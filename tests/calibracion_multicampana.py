@@ -0,0 +1,67 @@
+"""
+Calibración conjunta de varias campañas: un mismo juego de tasas debe
+reproducir todas las campañas; el fitness de cada cromosoma es el KGE
+agregado de las campañas, evaluadas en paralelo.
+
+Cada campaña es un directorio con su PlantillaBaseQ2K.xlsx y el ejecutable;
+las campañas sin directorio se omiten.
+"""
+import os
+from pathlib import Path
+import warnings
+
+from qual2k.core.calibrator import Calibracion
+
+warnings.filterwarnings('ignore')
+
+base = Path(__file__).parent.parent
+filepath = f'{base}/data/templates/Chicamocha'
+
+header_dict = {
+    "version": "v2.12",
+    "rivname": "Chicamocha",
+    "filename": "Chicamocha",
+    "filedir": filepath,
+    "applabel": "Chicamocha (6/27/2012)",
+    "xmon": 6,
+    "xday": 27,
+    "xyear": 2012,
+    "timezonehour": -6,
+    "pco2": 0.000347,
+    "dtuser": 4.16666666666667E-03,
+    "tf": 5,
+    "IMeth": "Euler",
+    "IMethpH": "Brent"
+}
+
+parametros = {
+    'kaaa': (0.1, 3, False),
+    'kn': (0.0005, 0.05, False),
+    'kdc': (0.05, 1.5, False),
+}
+
+# Campañas adicionales: directorio y fecha de muestreo
+campanas = [filepath] + [
+    {'filepath': f'{base}/data/templates/{nombre}', 'header_dict': fecha}
+    for nombre, fecha in [
+        ('Chicamocha_2013', {'xmon': 2, 'xday': 14, 'xyear': 2013}),
+        ('Chicamocha_2014', {'xmon': 9, 'xday': 3, 'xyear': 2014}),
+    ]
+    if os.path.isdir(f'{base}/data/templates/{nombre}')
+]
+
+if __name__ == '__main__':
+    calibracion = Calibracion(
+        filepath, header_dict, parametros,
+        num_generations=20,
+        population_size=20,
+        num_parents_mating=8,
+        random_seed=42,
+        campanas=campanas,
+        agregacion='media',
+    )
+    resultado = calibracion.ejecutar(generar_graficas=False)
+    if resultado is not None:
+        print(f'KGE agregado: {resultado[1]:.4f}')
+        for nombre, kge in calibracion.kge_por_campana.items():
+            print(f'  {nombre}: {kge:.4f}')
@@ -0,0 +1,68 @@
+"""
+Calibración multi-fidelidad: las primeras generaciones se evalúan con una
+malla gruesa y una simulación más corta, y la calibración pasa a fidelidad
+completa a medida que la población converge (la élite se reevalúa en cada
+cambio de nivel).
+
+Si existe ajuste_numerico.json (AjustePasoTiempo) sus dtuser, tf e IMeth
+definen el nivel intermedio.
+"""
+from pathlib import Path
+import warnings
+
+from qual2k.core.calibrator import Calibracion
+from qual2k.core.paso_tiempo import cargar_ajuste_numerico
+
+warnings.filterwarnings('ignore')
+
+base = Path(__file__).parent.parent
+filepath = f'{base}/data/templates/Chicamocha'
+
+header_dict = {
+    "version": "v2.12",
+    "rivname": "Chicamocha",
+    "filename": "Chicamocha",
+    "filedir": filepath,
+    "applabel": "Chicamocha (6/27/2012)",
+    "xmon": 6,
+    "xday": 27,
+    "xyear": 2012,
+    "timezonehour": -6,
+    "pco2": 0.000347,
+    "dtuser": 4.16666666666667E-03,
+    "tf": 5,
+    "IMeth": "Euler",
+    "IMethpH": "Brent"
+}
+
+parametros = {
+    'kaaa': (0.1, 3, False),
+    'kn': (0.0005, 0.05, False),
+    'kdc': (0.05, 1.5, False),
+}
+
+fidelidades = [
+    {'nombre': 'gruesa', 'numelem': 2, 'tf': 2, 'dtuser': 1.66666666666667E-02},
+    {'nombre': 'media', 'numelem': 5,
+     **(cargar_ajuste_numerico(filepath) or {'tf': 3, 'dtuser': 8.33333333333333E-03})},
+]
+
+if __name__ == '__main__':
+    calibracion = Calibracion(
+        filepath, header_dict, parametros,
+        num_generations=40,
+        population_size=20,
+        num_parents_mating=8,
+        random_seed=42,
+        fidelidades=fidelidades,
+        umbral_fidelidad=0.02,
+        paciencia_fidelidad=5,
+    )
+    resultado = calibracion.ejecutar(generar_graficas=False)
+    if resultado is not None:
+        print(f'KGE final: {resultado[1]:.4f}')
+        for cambio in calibracion.cambios_fidelidad:
+            print(f"Generación {cambio['generacion']}: → {cambio['nombre']} "
+                  f"(mejor KGE reevaluado {cambio['mejor_kge']:.4f})")
+        print(f"Costo del solucionador: ×{calibracion.costo_calibracion['costo_relativo']:.3f} "
+              f"del de una calibración en fidelidad completa")
@@ -0,0 +1,47 @@
+"""
+Convergencia de malla: engrosa la malla del caso Chicamocha por niveles y
+recomienda el número de elementos de cada tramo que mantiene el KGE y el
+perfil dentro de las tolerancias respecto a la malla de referencia.
+"""
+from pathlib import Path
+import warnings
+
+from qual2k.core.malla import EstudioMalla
+from qual2k.core.model import Q2KModel
+
+warnings.filterwarnings('ignore')
+
+base = Path(__file__).parent.parent
+filepath = f'{base}/data/templates/Chicamocha'
+
+header_dict = {
+    "version": "v2.12",
+    "rivname": "Chicamocha",
+    "filename": "Chicamocha",
+    "filedir": filepath,
+    "applabel": "Chicamocha (6/27/2012)",
+    "xmon": 6,
+    "xday": 27,
+    "xyear": 2012,
+    "timezonehour": -6,
+    "pco2": 0.000347,
+    "dtuser": 4.16666666666667E-03,
+    "tf": 5,
+    "IMeth": "Euler",
+    "IMethpH": "Brent"
+}
+
+# Referencia fina: elementos de 1 km
+modelo = Q2KModel(filepath, header_dict)
+modelo.cargar_plantillas()
+modelo.configurar_modelo(longitud_elemento=1.0)
+
+estudio = EstudioMalla(filepath, header_dict, tolerancia_kge=0.01,
+                       tolerancia_perfil=0.05, modelo=modelo)
+recomendacion = estudio.ejecutar()
+
+print(estudio.resultados[['nivel', 'ne', 'kge', 'dif_kge', 'dif_perfil',
+                          'tiempo_simulacion_s', 'cumple']])
+print(f"\nElementos por tramo: {recomendacion['numelem']}")
+print(f"ne: {recomendacion['ne']} (referencia {recomendacion['ne_referencia']}), "
+      f"aceleración ×{recomendacion['aceleracion']:.1f}")
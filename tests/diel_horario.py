@@ -0,0 +1,53 @@
+"""
+Resultados diel: ejecuta el caso Chicamocha, extrae la serie subdiaria como
+arreglo (tiempo, elemento, variable) y calcula el KGE contra observaciones
+horarias (CSV con X_QUAL2K, HORA, TEMPERATURA, OXIGENO_DISUELTO, pH).
+"""
+import os
+from pathlib import Path
+import warnings
+
+from qual2k.core.model import Q2KModel
+
+warnings.filterwarnings('ignore')
+
+base = Path(__file__).parent.parent
+filepath = f'{base}/data/templates/Chicamocha'
+
+header_dict = {
+    "version": "v2.12",
+    "rivname": "Chicamocha",
+    "filename": "Chicamocha",
+    "filedir": filepath,
+    "applabel": "Chicamocha (6/27/2012)",
+    "xmon": 6,
+    "xday": 27,
+    "xyear": 2012,
+    "timezonehour": -6,
+    "pco2": 0.000347,
+    "dtuser": 4.16666666666667E-03,
+    "tf": 5,
+    "IMeth": "Euler",
+    "IMethpH": "Brent"
+}
+
+model = Q2KModel(filepath, header_dict)
+model.cargar_plantillas()
+model.configurar_modelo()
+model.generar_archivo_q2k()
+model.ejecutar_simulacion()
+
+diel = model.extraer_diel()
+print(f"Serie diel: {diel['valores'].shape} (tiempo, elemento, variable)")
+print(f"Variables: {diel['variables']}")
+
+# Amplitud diaria de cada variable en el último elemento
+ultimo = diel['valores'][:, -1, :]
+for i, variable in enumerate(diel['variables']):
+    print(f"  {variable:6s} mín={ultimo[:, i].min():8.3f}  máx={ultimo[:, i].max():8.3f}")
+
+ruta_obs = os.path.join(filepath, 'observados_horarios.csv')
+if os.path.exists(ruta_obs):
+    model.calcular_kge_diel(ruta_obs)
+else:
+    print(f"Sin observaciones horarias ({ruta_obs}); se omite el KGE diel")
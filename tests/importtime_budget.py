@@ -0,0 +1,68 @@
+"""
+Presupuesto de tiempo de importación de qual2k.core.model.
+
+Ejecuta `python -X importtime -c "import qual2k.core.model"` en un proceso
+limpio, muestra los módulos más costosos y verifica que:
+    - el tiempo acumulado no supere el presupuesto (ms)
+    - no se carguen módulos pesados que deben importarse bajo demanda
+
+Uso:
+    python tests/importtime_budget.py [presupuesto_ms] [modulo]
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PRESUPUESTO_MS = 800
+MODULO = 'qual2k.core.model'
+
+# Módulos que solo deben cargarse al graficar o calibrar
+PROHIBIDOS = ['matplotlib', 'pygad', 'seaborn']
+
+
+def medir(modulo: str):
+    """Devuelve [(modulo, propio_us, acumulado_us)] de python -X importtime."""
+    base = Path(__file__).parent.parent
+    env = dict(os.environ, PYTHONPATH=str(base))
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        capture_output=True, text=True, env=env, check=True
+    )
+
+    registros = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, nombre = linea[len('import time:'):].split('|')
+        registros.append((nombre.strip(), int(propio), int(acumulado)))
+    return registros
+
+
+presupuesto_ms = float(sys.argv[1]) if len(sys.argv) > 1 else PRESUPUESTO_MS
+modulo = sys.argv[2] if len(sys.argv) > 2 else MODULO
+
+registros = medir(modulo)
+total_ms = next(a for n, _, a in registros if n == modulo) / 1000
+cargados = {n.split('.')[0] for n, _, _ in registros}
+
+print("=" * 70)
+print(f'TIEMPO DE IMPORTACIÓN: {modulo}')
+print("=" * 70)
+for nombre, _, acumulado in sorted(registros, key=lambda r: -r[2])[:10]:
+    print(f'  {acumulado / 1000:9.1f} ms  {nombre}')
+print(f'\nTotal: {total_ms:.1f} ms (presupuesto {presupuesto_ms:.0f} ms)')
+
+errores = []
+if total_ms > presupuesto_ms:
+    errores.append(f'Se excedió el presupuesto: {total_ms:.1f} ms > {presupuesto_ms:.0f} ms')
+for prohibido in PROHIBIDOS:
+    if prohibido in cargados:
+        errores.append(f'Módulo cargado en la importación: {prohibido}')
+
+for error in errores:
+    print(f'⚠️ {error}')
+if errores:
+    sys.exit(1)
+
+print('✅ Importación dentro del presupuesto')
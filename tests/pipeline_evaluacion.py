@@ -0,0 +1,62 @@
+"""
+Evaluación en tubería: compara la ejecución secuencial (un simulador, sin
+solapamiento efectivo) con el pipeline y muestra la utilización por etapa.
+
+Una utilización de 'simular' cercana a 1 indica que el FORTRAN nunca espera
+a la preparación ni al análisis.
+"""
+import numpy as np
+from pathlib import Path
+import warnings
+
+from qual2k.core.pipeline import Q2KPipeline
+from qual2k.core.recursos import cpus_disponibles
+
+warnings.filterwarnings('ignore')
+
+base = Path(__file__).parent.parent
+filepath = f'{base}/data/templates/Chicamocha'
+
+header_dict = {
+    "version": "v2.12",
+    "rivname": "Chicamocha",
+    "filename": "Chicamocha",
+    "filedir": filepath,
+    "applabel": "Chicamocha (6/27/2012)",
+    "xmon": 6,
+    "xday": 27,
+    "xyear": 2012,
+    "timezonehour": -6,
+    "pco2": 0.000347,
+    "dtuser": 4.16666666666667E-03,
+    "tf": 5,
+    "IMeth": "Euler",
+    "IMethpH": "Brent"
+}
+
+rng = np.random.default_rng(0)
+conjuntos = [{'kn': float(kn), 'kdc': float(kdc)}
+             for kn, kdc in rng.uniform([0.01, 0.05], [1.0, 1.0], size=(20, 2))]
+
+
+def reportar(nombre, pipeline):
+    u = pipeline.utilizacion()
+    print(f"\n{nombre}: {u['evaluaciones']} evaluaciones en {u['duracion_s']:.1f} s "
+          f"({u['evaluaciones_por_s']:.2f} eval/s)")
+    for etapa, datos in u['etapas'].items():
+        print(f"  {etapa:9s} hilos={datos['hilos']}  ocupado={datos['ocupado_s']:6.1f} s  "
+              f"utilización={datos['utilizacion']:.0%}")
+
+
+secuencial = Q2KPipeline(filepath, header_dict, n_simuladores=1)
+resultados = secuencial.evaluar(conjuntos)
+reportar('Un simulador', secuencial)
+
+pipeline = Q2KPipeline(filepath, header_dict, n_simuladores=cpus_disponibles())
+for r in pipeline.evaluate_many(conjuntos):
+    if r['error']:
+        print(f"⚠️ Evaluación {r['indice']}: {r['error']}")
+reportar(f'Pipeline ({cpus_disponibles()} simuladores)', pipeline)
+
+mejor = max(resultados, key=lambda r: r['kge'])
+print(f"\n✅ Mejor conjunto: {mejor['parametros']} (KGE = {mejor['kge']:.4f})")
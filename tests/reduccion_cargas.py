@@ -0,0 +1,54 @@
+"""
+Reducción de cargas de vertimientos para cumplir un OD mínimo (tipo TMDL).
+
+Busca la asignación de reducciones de DBO5 y nitrógeno amoniacal más barata
+que mantiene el oxígeno disuelto por encima de 4 mg/L en todo el perfil.
+"""
+from pathlib import Path
+import warnings
+
+from qual2k.core.reduccion_cargas import OptimizadorCargas
+
+warnings.filterwarnings('ignore')
+
+base = Path(__file__).parent.parent
+filepath = f'{base}/data/templates/Chicamocha'
+
+header_dict = {
+    "version": "v2.12",
+    "rivname": "Chicamocha",
+    "filename": "Chicamocha",
+    "filedir": filepath,
+    "applabel": "Chicamocha (6/27/2012)",
+    "xmon": 6,
+    "xday": 27,
+    "xyear": 2012,
+    "timezonehour": -6,
+    "pco2": 0.000347,
+    "dtuser": 4.16666666666667E-03,
+    "tf": 5,
+    "IMeth": "Euler",
+    "IMethpH": "Brent"
+}
+
+optimizador = OptimizadorCargas(
+    filepath, header_dict,
+    od_minimo=4.0,
+    contaminantes=['DBO5', 'NITROGENO_AMONIACAL'],
+    reduccion_maxima=0.9,
+    resolucion=0.05,
+    # La remoción de nitrógeno amoniacal es más costosa que la de DBO5
+    costos={'DBO5': 1.0, 'NITROGENO_AMONIACAL': 3.0},
+    num_generations=40,
+    population_size=24,
+    random_seed=42,
+)
+mejor = optimizador.optimizar()
+
+if mejor is not None:
+    asignacion = optimizador.reporte()
+    asignacion.to_csv('reduccion_cargas.csv', index=False)
+    print(asignacion[asignacion['reduccion_pct'] > 0].to_string(index=False))
+    estado = 'factible' if mejor['factible'] else 'NO factible'
+    print(f"\nAsignación {estado}: OD mínimo = {mejor['od_min']:.2f} mg/L, "
+          f"costo = {mejor['costo']:.1f}")
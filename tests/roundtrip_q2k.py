@@ -0,0 +1,53 @@
+"""
+Prueba de ida y vuelta del lector de archivos .q2k.
+
+Para cada .q2k de data/templates verifica que:
+    - leer -> escribir -> leer produce el mismo diccionario q2k_data
+    - el texto generado por el escritor se reproduce byte a byte
+      (leer -> escribir sobre su propia salida)
+
+Los .q2k de las plantillas fueron generados con Excel/VBA y formatean algunos
+números distinto (p.ej. 4.16666666666667E-03), por eso la comparación con el
+archivo original es semántica y la comparación byte a byte se hace sobre la
+salida del escritor.
+
+Uso:
+    python tests/roundtrip_q2k.py [archivo.q2k ...]
+"""
+import sys
+from pathlib import Path
+
+from qual2k.processing.file_reader import Q2KFileReader
+from qual2k.processing.file_writer import Q2KFileWriter
+
+base = Path(__file__).parent.parent
+archivos = sys.argv[1:] or sorted(str(p) for p in (base / 'data' / 'templates').rglob('*.q2k'))
+
+reader = Q2KFileReader()
+writer = Q2KFileWriter()
+
+print("=" * 70)
+print('IDA Y VUELTA DE ARCHIVOS .q2k')
+print("=" * 70)
+
+errores = []
+for archivo in archivos:
+    datos = reader.read_q2k_file(archivo, encoding='latin-1')
+    texto = writer.render_q2k(datos)
+    datos_2 = reader.parse_q2k(texto)
+
+    if datos_2 != datos:
+        errores.append(f'{archivo}: el diccionario cambia al reescribir')
+    elif writer.render_q2k(datos_2) != texto:
+        errores.append(f'{archivo}: la reescritura no es idéntica byte a byte')
+    else:
+        print(f'  {archivo}: {datos["reach_data"]["nr"]} tramos, '
+              f'{datos["point_sources"]["npt"]} fuentes, '
+              f'{datos["wq_data"]["nwqd"]} estaciones')
+
+for error in errores:
+    print(f'⚠️ {error}')
+if errores:
+    sys.exit(1)
+
+print(f'✅ {len(archivos)} archivos .q2k leídos y reescritos sin diferencias')